@@ -1,36 +1,58 @@
 
-from database import get_db_connection, dict_from_row, json_dumps
+from database import get_db_connection, get_read_connection, mark_write, json_dumps, prepared_statement, prepared_cursor
+from rowmap import RowMapper, to_float, to_str, isoformat
 from auth import verify_token
 import json
+from datetime import datetime
 from decimal import Decimal
 
+# Artwork rows as sent to the frontend (id as string, price as number)
+ARTWORK_ROW = RowMapper({
+    'id': ('id', to_str),
+    'price': ('price', to_float)
+})
+
+# A single artwork also reports whether a checkout currently holds it, and for whom
+ARTWORK_DETAIL_ROW = RowMapper({
+    'id': ('id', to_str),
+    'price': ('price', to_float),
+    'hold_expires_at': ('holdExpiresAt', isoformat),
+    'hold_user_id': ('holdUserId', to_str),
+    'hold_order_id': ('heldOrderId', to_str),
+    'hold_order_amount': ('heldOrderAmount', to_float)
+})
+
+ALL_ARTWORKS_QUERY = prepared_statement("""
+    SELECT id, title, artist, description, price, image_url, 
+           dimensions, medium, year, status
+    FROM artworks
+    ORDER BY created_at DESC
+""")
+
+# Include any live checkout lock so the frontend can avoid starting a payment that would fail
+ARTWORK_QUERY = prepared_statement("""
+    SELECT a.id, a.title, a.artist, a.description, a.price, a.image_url, 
+           a.dimensions, a.medium, a.year, a.status, h.expires_at AS hold_expires_at,
+           o.user_id AS hold_user_id, o.id AS hold_order_id, o.total_amount AS hold_order_amount
+    FROM artworks a
+    LEFT JOIN artwork_holds h ON h.artwork_id = a.id AND h.expires_at > %s
+    LEFT JOIN artwork_orders o ON o.id = h.order_id
+    WHERE a.id = %s
+""")
+
 def get_all_artworks():
     """Get all artworks from the database"""
-    connection = get_db_connection()
+    connection = get_read_connection()
     if connection is None:
         return {"error": "Database connection failed"}
     
-    cursor = connection.cursor()
+    cursor = prepared_cursor(connection, ALL_ARTWORKS_QUERY)
     
     try:
-        query = """
-        SELECT id, title, artist, description, price, image_url, 
-               dimensions, medium, year, status
-        FROM artworks
-        ORDER BY created_at DESC
-        """
-        cursor.execute(query)
+        cursor.execute(ALL_ARTWORKS_QUERY)
         rows = cursor.fetchall()
         
-        artworks = []
-        for row in rows:
-            artwork = dict_from_row(row, cursor)
-            
-            # Convert id to string to match frontend expectations
-            artwork['id'] = str(artwork['id'])
-            artworks.append(artwork)
-        
-        return {"artworks": artworks}
+        return {"artworks": ARTWORK_ROW.all(cursor, rows)}
     except Exception as e:
         print(f"Error getting artworks: {e}")
         return {"error": str(e)}
@@ -39,30 +61,35 @@ def get_all_artworks():
             cursor.close()
             connection.close()
 
-def get_artwork(artwork_id):
-    """Get a specific artwork by ID"""
-    connection = get_db_connection()
+def get_artwork(artwork_id, user_id=None):
+    """Get a specific artwork by ID.
+    
+    When user_id holds the artwork for one of their orders, the response
+    says so (heldByMe) and names the order, so the buyer can retry its
+    payment; everyone else only sees that the artwork is on hold.
+    """
+    connection = get_read_connection()
     if connection is None:
         return {"error": "Database connection failed"}
     
-    cursor = connection.cursor()
+    cursor = prepared_cursor(connection, ARTWORK_QUERY)
     
     try:
-        query = """
-        SELECT id, title, artist, description, price, image_url, 
-               dimensions, medium, year, status
-        FROM artworks
-        WHERE id = %s
-        """
-        cursor.execute(query, (artwork_id,))
+        cursor.execute(ARTWORK_QUERY, (datetime.now(), artwork_id))
         row = cursor.fetchone()
         
         if not row:
             return {"error": "Artwork not found"}
         
-        artwork = dict_from_row(row, cursor)
-        # Convert id to string to match frontend expectations
-        artwork['id'] = str(artwork['id'])
+        artwork = ARTWORK_DETAIL_ROW.one(cursor, row)
+        holder = artwork.pop('holdUserId')
+        held_order_id = artwork.pop('heldOrderId')
+        held_order_amount = artwork.pop('heldOrderAmount')
+        artwork['onHold'] = artwork['holdExpiresAt'] is not None
+        artwork['heldByMe'] = user_id is not None and holder == str(user_id)
+        if artwork['heldByMe']:
+            artwork['heldOrderId'] = held_order_id
+            artwork['heldOrderAmount'] = held_order_amount
         
         return artwork
     except Exception as e:
@@ -77,7 +104,6 @@ def create_artwork(auth_header, artwork_data):
     """Create a new artwork (admin only)"""
     print(f"\n--- Create Artwork Request ---")
     print(f"Auth Header: {auth_header}")
-    print(f"Artwork Data: {artwork_data}")
     
     if not auth_header:
         print("ERROR: Authentication header missing")
@@ -130,7 +156,6 @@ def create_artwork(auth_header, artwork_data):
                 print(f"ERROR: Failed to parse artwork data: {e}")
                 return {"error": f"Invalid artwork data format: {str(e)}"}
         
-        print(f"Inserting artwork data: {artwork_data}")
         query = """
         INSERT INTO artworks (title, artist, description, price, image_url,
                            dimensions, medium, year, status)
@@ -148,6 +173,7 @@ def create_artwork(auth_header, artwork_data):
             artwork_data.get("status", "available")
         ))
         connection.commit()
+        mark_write()
         
         # Return the newly created artwork
         new_artwork_id = cursor.lastrowid
@@ -225,6 +251,7 @@ def update_artwork(auth_header, artwork_id, artwork_data):
             artwork_id
         ))
         connection.commit()
+        mark_write()
         
         # Check if artwork was found and updated
         if cursor.rowcount == 0:
@@ -277,6 +304,7 @@ def delete_artwork(auth_header, artwork_id):
         query = "DELETE FROM artworks WHERE id = %s"
         cursor.execute(query, (artwork_id,))
         connection.commit()
+        mark_write()
         
         # Check if artwork was found and deleted
         if cursor.rowcount == 0:
@@ -1,12 +1,16 @@
 import hashlib
 import secrets
-from database import get_db_connection, json_dumps
+from database import get_db_connection, json_dumps, prepared_statement, prepared_cursor
 import jwt
 import datetime
 from decimal import Decimal
+from config import CONFIG
 
-# Secret key for JWT token generation - replace with a secure random string
-SECRET_KEY = "your_secret_key_replace_this_with_a_secure_random_string"
+# Secret key for JWT tokens, shared by every module that issues or checks them
+SECRET_KEY = CONFIG.auth.secret_key
+
+USER_LOGIN_QUERY = prepared_statement("SELECT id, name FROM users WHERE email = %s AND password = %s")
+ADMIN_LOGIN_QUERY = prepared_statement("SELECT id, name FROM admins WHERE email = %s AND password = %s")
 
 def hash_password(password):
     """Hash a password using SHA-256"""
@@ -60,13 +64,12 @@ def login_user(email, password):
     if connection is None:
         return {"error": "Database connection failed"}
     
-    cursor = connection.cursor()
+    cursor = prepared_cursor(connection, USER_LOGIN_QUERY)
     hashed_password = hash_password(password)
     
     try:
         # Check user credentials
-        query = "SELECT id, name FROM users WHERE email = %s AND password = %s"
-        cursor.execute(query, (email, hashed_password))
+        cursor.execute(USER_LOGIN_QUERY, (email, hashed_password))
         user = cursor.fetchone()
         
         if not user:
@@ -95,13 +98,12 @@ def login_admin(email, password):
     if connection is None:
         return {"error": "Database connection failed"}
     
-    cursor = connection.cursor()
+    cursor = prepared_cursor(connection, ADMIN_LOGIN_QUERY)
     hashed_password = hash_password(password)
     
     try:
         # Check admin credentials
-        query = "SELECT id, name FROM admins WHERE email = %s AND password = %s"
-        cursor.execute(query, (email, hashed_password))
+        cursor.execute(ADMIN_LOGIN_QUERY, (email, hashed_password))
         admin = cursor.fetchone()
         
         if not admin:
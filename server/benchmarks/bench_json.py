@@ -0,0 +1,77 @@
+"""Benchmark JSON encoding of API responses.
+
+Compares the previous json.dumps(cls=DecimalEncoder).encode() path with
+serializer.dumps using the stdlib backend and, when installed, orjson.
+Payloads are built the same way the /artworks and /exhibitions handlers
+build them, plus contact messages straight from dict_from_row (datetime
+values, no renaming).
+
+    python benchmarks/bench_json.py [rows] [repeat]
+"""
+import os
+import sys
+import json
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import serializer
+from bench_rowmap import FakeCursor, EXHIBITION_COLUMNS, ARTWORK_COLUMNS, exhibition_rows, artwork_rows
+from exhibition import EXHIBITION_ROW
+from artwork import ARTWORK_ROW
+
+class LegacyDecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        return super().default(obj)
+
+def legacy_dumps(data):
+    return json.dumps(data, cls=LegacyDecimalEncoder).encode()
+
+def contact_messages(count):
+    start = datetime(2025, 1, 1, 9, 0)
+    return {"messages": [
+        {"id": i, "name": f"Visitor {i}", "email": f"visitor{i}@example.com", "phone": "0712345678",
+         "message": "I would like to know more about the upcoming exhibition.",
+         "date": start + timedelta(minutes=i), "status": "new", "source": "contact_form"}
+        for i in range(count)
+    ]}
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+
+    payloads = [
+        ("artworks", {"artworks": ARTWORK_ROW.all(FakeCursor(ARTWORK_COLUMNS), artwork_rows(count))}),
+        ("exhibitions", {"exhibitions": EXHIBITION_ROW.all(FakeCursor(EXHIBITION_COLUMNS), exhibition_rows(count))}),
+        ("contact messages", contact_messages(count)),
+        ("single artwork", ARTWORK_ROW.all(FakeCursor(ARTWORK_COLUMNS), artwork_rows(1))[0]),
+    ]
+
+    encoders = [("json + DecimalEncoder", legacy_dumps), ("serializer (stdlib)", serializer._stdlib_dumps)]
+    if serializer.orjson is not None:
+        encoders.append(("serializer (orjson)", serializer._orjson_dumps))
+    else:
+        print("orjson not installed; skipping the orjson backend\n")
+
+    for name, payload in payloads:
+        # Single objects are tiny, so time many encodes per sample
+        number = 1 if len(payload) == 1 else 10000
+        baseline = json.loads(legacy_dumps(payload))
+        print(f"{name} ({count if number == 1 else 1} rows, {number} encode(s) per sample, best of {repeat})")
+
+        legacy = None
+        for label, encode in encoders:
+            assert json.loads(encode(payload)) == baseline, f"{label}: output differs"
+            best = min(timeit.repeat(lambda: encode(payload), number=number, repeat=repeat)) / number
+            legacy = legacy or best
+            print(f"  {label:<24} {best * 1e6:10.1f} us  {legacy / best:5.2f}x")
+        print()
+
+if __name__ == "__main__":
+    main()
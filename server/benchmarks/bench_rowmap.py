@@ -0,0 +1,110 @@
+"""Benchmark row materialization for large catalogues.
+
+Compares the previous dict_from_row + per-row key renaming with the
+compiled RowMapper used by artwork.py and exhibition.py, on synthetic
+result sets shaped like the real catalogue queries.
+
+    python benchmarks/bench_rowmap.py [rows] [repeat]
+"""
+import os
+import sys
+import timeit
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# artwork.py and exhibition.py import database.py, which picks its backend on
+# import; use the embedded one so no MySQL driver is needed
+os.environ.setdefault('AFRIART_DB_BACKEND', 'sqlite')
+if 'AFRIART_SQLITE_PATH' not in os.environ:
+    os.environ['AFRIART_SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='afriart-rowmap-'), 'rowmap.db')
+os.environ.setdefault('AFRIART_MPESA_ENABLED', '0')
+
+from rowmap import RowMapper
+from exhibition import EXHIBITION_ROW
+from artwork import ARTWORK_ROW
+
+class FakeCursor:
+    """Just enough of a DB-API cursor for the mapping code"""
+
+    def __init__(self, column_names):
+        self.column_names = column_names
+
+EXHIBITION_COLUMNS = ('id', 'title', 'description', 'location', 'start_date', 'end_date',
+                      'ticket_price', 'image_url', 'total_slots', 'available_slots', 'status')
+ARTWORK_COLUMNS = ('id', 'title', 'artist', 'description', 'price', 'image_url',
+                   'dimensions', 'medium', 'year', 'status')
+
+def exhibition_rows(count):
+    start = date(2025, 1, 1)
+    return [
+        (i, f"Exhibition {i}", "A showcase of contemporary East African art", "Nairobi National Museum",
+         start + timedelta(days=i % 365), start + timedelta(days=i % 365 + 30),
+         Decimal('1500.00'), f"/uploads/exhibition-{i}.jpg", 200, 200 - i % 200, 'upcoming')
+        for i in range(count)
+    ]
+
+def artwork_rows(count):
+    return [
+        (i, f"Artwork {i}", f"Artist {i % 50}", "Acrylic on canvas", Decimal('25000.00'),
+         f"/uploads/artwork-{i}.jpg", "60x90 cm", "Acrylic", 2020 + i % 5, 'available')
+        for i in range(count)
+    ]
+
+def legacy_dict_from_row(row, cursor):
+    result = {cursor.column_names[i]: value for i, value in enumerate(row)}
+    for key, value in result.items():
+        if isinstance(value, Decimal):
+            result[key] = float(value)
+    return result
+
+def legacy_exhibitions(cursor, rows):
+    exhibitions = []
+    for row in rows:
+        exhibition = legacy_dict_from_row(row, cursor)
+        exhibition['id'] = str(exhibition['id'])
+        exhibition['startDate'] = exhibition.pop('start_date').isoformat()
+        exhibition['endDate'] = exhibition.pop('end_date').isoformat()
+        exhibition['ticketPrice'] = exhibition.pop('ticket_price')
+        exhibition['imageUrl'] = exhibition.pop('image_url')
+        exhibition['totalSlots'] = exhibition.pop('total_slots')
+        exhibition['availableSlots'] = exhibition.pop('available_slots')
+        exhibitions.append(exhibition)
+    return exhibitions
+
+def legacy_artworks(cursor, rows):
+    artworks = []
+    for row in rows:
+        artwork = legacy_dict_from_row(row, cursor)
+        artwork['id'] = str(artwork['id'])
+        artworks.append(artwork)
+    return artworks
+
+def run(label, func, repeat):
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"  {label:<28} {best * 1000:9.2f} ms")
+    return best
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+
+    cases = [
+        ("exhibitions", EXHIBITION_COLUMNS, exhibition_rows(count), legacy_exhibitions, EXHIBITION_ROW),
+        ("artworks", ARTWORK_COLUMNS, artwork_rows(count), legacy_artworks, ARTWORK_ROW),
+    ]
+
+    for name, columns, rows, legacy, mapper in cases:
+        cursor = FakeCursor(columns)
+        assert legacy(cursor, rows) == mapper.all(cursor, rows), f"{name}: outputs differ"
+
+        print(f"{name} ({count} rows, best of {repeat})")
+        old = run("dict_from_row + renames", lambda: legacy(cursor, rows), repeat)
+        new = run("RowMapper (compiled)", lambda: mapper.all(cursor, rows), repeat)
+        fresh = run("RowMapper (incl. compile)", lambda: RowMapper(mapper.fields, mapper.default).all(cursor, rows), repeat)
+        print(f"  speedup {old / new:.2f}x (first call {old / fresh:.2f}x)\n")
+
+if __name__ == "__main__":
+    main()
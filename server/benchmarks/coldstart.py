@@ -0,0 +1,125 @@
+"""Measure server cold start.
+
+Starts `python server.py` repeatedly and records how long it takes to
+import the server module, to answer /healthz (the socket is listening)
+and to answer /readyz with 200 (the schema is checked and migrated). The
+first run uses an empty database, so it includes creating the schema;
+later runs start against the initialized one.
+
+    python benchmarks/coldstart.py [runs]
+    python benchmarks/coldstart.py 10 --json coldstart.json
+
+SQLite in a temporary directory is used unless --backend mysql is given.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+import http.client
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCH_DIR)
+
+# Give up on a run after this many seconds
+STARTUP_TIMEOUT = 60
+
+IMPORT_PROBE = "import time; start = time.perf_counter(); import server; print(time.perf_counter() - start)"
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _status(port, path):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+def import_time(env):
+    """Seconds to import server.py in a fresh interpreter"""
+    output = subprocess.run([sys.executable, '-c', IMPORT_PROBE], cwd=SERVER_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+def start_once(env):
+    """Start the server; returns (seconds until /healthz, seconds until /readyz is 200)"""
+    port = _free_port()
+    env = dict(env, AFRIART_PORT=str(port))
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'server.py'], cwd=SERVER_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    live = ready = None
+    try:
+        while ready is None:
+            elapsed = time.perf_counter() - started
+            if elapsed > STARTUP_TIMEOUT or process.poll() is not None:
+                raise SystemExit(f"Server did not become ready (exit code {process.poll()})")
+            if live is None:
+                if _status(port, '/healthz') == 200:
+                    live = time.perf_counter() - started
+            elif _status(port, '/readyz') == 200:
+                ready = time.perf_counter() - started
+            time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait()
+    return live, ready
+
+def summarize(values):
+    return {
+        'median_ms': round(statistics.median(values) * 1000, 1),
+        'min_ms': round(min(values) * 1000, 1),
+        'max_ms': round(max(values) * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('runs', nargs='?', type=int, default=5)
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--json', metavar='PATH', help="write the results to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ, AFRIART_DB_BACKEND=args.backend)
+    # Startup is measured without payments, which need the M-Pesa settings
+    env.setdefault('AFRIART_MPESA_ENABLED', '0')
+    if args.backend == 'sqlite':
+        env.setdefault('AFRIART_SQLITE_PATH', os.path.join(tempfile.mkdtemp(prefix='afriart-coldstart-'), 'bench.db'))
+
+    imports = [import_time(env) for _ in range(args.runs)]
+    first_live, first_ready = start_once(env)
+    starts = [start_once(env) for _ in range(args.runs)]
+
+    result = {
+        'backend': args.backend,
+        'runs': args.runs,
+        'import': summarize(imports),
+        'empty_database': {'healthz_ms': round(first_live * 1000, 1), 'readyz_ms': round(first_ready * 1000, 1)},
+        'healthz': summarize([live for live, _ in starts]),
+        'readyz': summarize([ready for _, ready in starts]),
+    }
+
+    print(f"Cold start ({args.backend}, {args.runs} runs)")
+    print(f"  import server         median {result['import']['median_ms']:8.1f} ms")
+    print(f"  /healthz answered     median {result['healthz']['median_ms']:8.1f} ms")
+    print(f"  /readyz 200           median {result['readyz']['median_ms']:8.1f} ms")
+    print(f"  empty database        /healthz {result['empty_database']['healthz_ms']:.1f} ms, "
+          f"/readyz {result['empty_database']['readyz_ms']:.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compare the micro-benchmarks between two git revisions.
+
+Checks each revision out into a temporary git worktree and runs this
+tree's micro.py against its server/ directory, so both sides are timed by
+the same benchmark code. Without a second revision the working tree
+(including uncommitted changes) is compared against the first.
+
+    python benchmarks/compare.py main                  # main vs working tree
+    python benchmarks/compare.py main my-branch
+    python benchmarks/compare.py main --benchmarks verify_token json_dumps
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCH_DIR)
+
+def git(*args):
+    return subprocess.run(['git', *args], cwd=SERVER_DIR, capture_output=True, text=True, check=True).stdout.strip()
+
+@contextlib.contextmanager
+def checkout(revision):
+    """server/ directory of revision (None for the working tree)"""
+    if revision is None:
+        yield SERVER_DIR
+        return
+
+    top = git('rev-parse', '--show-toplevel')
+    path = tempfile.mkdtemp(prefix='afriart-compare-')
+    git('worktree', 'add', '--detach', path, revision)
+    try:
+        yield os.path.join(path, os.path.relpath(os.path.realpath(SERVER_DIR), top))
+    finally:
+        git('worktree', 'remove', '--force', path)
+
+def run(revision, benchmarks, repeat):
+    label = revision or 'working tree'
+    print(f"Benchmarking {label}...", file=sys.stderr)
+    with checkout(revision) as code_dir, tempfile.NamedTemporaryFile(suffix='.json') as output:
+        subprocess.run([sys.executable, os.path.join(BENCH_DIR, 'micro.py'), '--code-dir', code_dir,
+                        '--repeat', str(repeat), '--json', output.name, *benchmarks], check=True)
+        with open(output.name) as f:
+            return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base', help="baseline revision (branch, tag or commit)")
+    parser.add_argument('head', nargs='?', help="revision to compare (default: the working tree)")
+    parser.add_argument('--benchmarks', nargs='+', default=[], help="only run these benchmarks")
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--threshold', type=float, default=0.05,
+                        help="changes smaller than this fraction are reported as noise")
+    args = parser.parse_args()
+
+    base = run(args.base, args.benchmarks, args.repeat)
+    head = run(args.head, args.benchmarks, args.repeat)
+
+    head_label = args.head or 'working tree'
+    print(f"\n{'benchmark':<22}{args.base[:14]:>16}{head_label[:14]:>16}{'change':>10}")
+    for name in dict.fromkeys([*base['results'], *head['results'], *base['skipped'], *head['skipped']]):
+        before = base['results'].get(name, {}).get('median_us')
+        after = head['results'].get(name, {}).get('median_us')
+        if before is None or after is None:
+            print(f"{name:<22}{before or 'n/a':>16}{after or 'n/a':>16}{'':>10}")
+            continue
+
+        change = after / before - 1
+        verdict = 'same' if abs(change) < args.threshold else ('faster' if change < 0 else 'SLOWER')
+        print(f"{name:<22}{before:>13.3f} us{after:>13.3f} us{change:>+9.1%}  {verdict}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""A local stand-in for the Safaricom Daraja API.
+
+Answers the OAuth, STK push and STK query calls made by mpesa.py with
+successful responses after an optional delay, so payment flows can be
+load tested without network access or sandbox rate limits.
+"""
+import json
+import time
+import uuid
+import threading
+import http.server
+
+class DarajaHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # Simulated Daraja response time (seconds)
+    latency = 0.0
+
+    def _reply(self, data):
+        time.sleep(self.latency)
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith('/oauth/v1/generate'):
+            self._reply({"access_token": "bench-access-token", "expires_in": "3599"})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+
+        if self.path == '/mpesa/stkpush/v1/processrequest':
+            self._reply({
+                "MerchantRequestID": f"bench-{uuid.uuid4().hex[:12]}",
+                "CheckoutRequestID": f"ws_CO_bench_{uuid.uuid4().hex}",
+                "ResponseCode": "0",
+                "ResponseDescription": "Success. Request accepted for processing",
+                "CustomerMessage": "Success. Request accepted for processing"
+            })
+        elif self.path == '/mpesa/stkpushquery/v1/query':
+            self._reply({
+                "CheckoutRequestID": request.get("CheckoutRequestID"),
+                "ResponseCode": "0",
+                "ResultCode": "0",
+                "ResultDesc": "The service request is processed successfully."
+            })
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fake_daraja(latency=0.0):
+    """Start the fake API on a free local port; returns (server, base_url)"""
+    handler = type('BenchDarajaHandler', (DarajaHandler,), {'latency': latency})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -0,0 +1,390 @@
+"""End-to-end HTTP load test for the AfriArt server.
+
+Seeds a synthetic catalogue, starts RequestHandler in-process on a free
+port (with a fake Daraja API for payments) and drives it from concurrent
+keep-alive clients across a realistic route mix. Reports p50/p95/p99
+latency and throughput per route, and process RSS, and can save the
+results as a baseline or compare them against one.
+
+    python benchmarks/load.py --scale 10k --concurrency 16 --duration 30
+    python benchmarks/load.py --scale 10k --save-baseline sqlite-10k
+    python benchmarks/load.py --scale 10k --compare sqlite-10k
+
+SQLite in a temporary directory is used unless --backend mysql is given,
+in which case the database settings (AFRIART_DB_HOST, AFRIART_DB_NAME, ...)
+must point at a scratch database (it is wiped).
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import contextlib
+import http.client
+from collections import defaultdict
+from urllib.parse import quote
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(BENCH_DIR, 'baselines')
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+# Relative weight of each route in the request mix
+ROUTE_MIX = {
+    'list_artworks': 25,
+    'list_exhibitions': 15,
+    'artwork_detail': 20,
+    'exhibition_detail': 10,
+    'login': 8,
+    'my_orders': 8,
+    'upload_artwork': 2,
+    'mpesa_flow': 12,
+}
+
+# 1x1 PNG used for upload requests
+PNG_PIXEL = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000154a24f0e0000000049454e44ae426082'
+)
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def rss_kb():
+    """Current resident set size of this process in KB (Linux), or None"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+class Client:
+    """One keep-alive connection issuing requests and recording their latency"""
+
+    def __init__(self, port, context, samples, rng):
+        self.port = port
+        self.context = context
+        self.samples = samples
+        self.rng = rng
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def request(self, route, method, path, body=None, headers=None, token=None):
+        headers = dict(headers or {})
+        headers.setdefault('Accept-Encoding', 'gzip')
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+        if isinstance(body, dict):
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            data, status = b'', 599
+        self.samples.append((route, time.perf_counter() - start, status))
+
+        if 200 <= status < 300 and data and response.getheader('Content-Encoding') is None:
+            try:
+                return json.loads(data)
+            except ValueError:
+                return None
+        return None
+
+    def list_artworks(self):
+        self.request('list_artworks', 'GET', '/artworks')
+
+    def list_exhibitions(self):
+        self.request('list_exhibitions', 'GET', '/exhibitions')
+
+    def artwork_detail(self):
+        self.request('artwork_detail', 'GET', f"/artworks/{self.rng.randint(1, self.context['artworks'])}")
+
+    def exhibition_detail(self):
+        self.request('exhibition_detail', 'GET', f"/exhibitions/{self.rng.randint(1, self.context['exhibitions'])}")
+
+    def login(self):
+        self.request('login', 'POST', '/login', {
+            'email': f"bench-user-{self.rng.randrange(self.context['users'])}@example.com",
+            'password': self.context['password']
+        })
+
+    def my_orders(self):
+        self.request('my_orders', 'GET', '/me/orders?page=1&pageSize=20', token=self.context['user_token'])
+
+    def upload_artwork(self):
+        boundary = uuid.uuid4().hex
+        fields = {'title': 'Bench upload', 'artist': 'Bench Artist', 'description': 'Uploaded by the load test',
+                  'price': '15000', 'dimensions': '30x40 cm', 'medium': 'Digital', 'year': '2025'}
+        parts = [
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode()
+            for name, value in fields.items()
+        ]
+        parts.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"bench.png\"\r\n"
+            f"Content-Type: image/png\r\n\r\n".encode() + PNG_PIXEL + b"\r\n"
+        )
+        parts.append(f"--{boundary}--\r\n".encode())
+        self.request('upload_artwork', 'POST', '/artworks', b''.join(parts),
+                     {'Content-Type': f"multipart/form-data; boundary={boundary}"},
+                     token=self.context['admin_token'])
+
+    def mpesa_flow(self):
+        """Book tickets, receive Daraja's success callback and poll the payment status"""
+        booking = self.request('mpesa_checkout', 'POST', '/orders/exhibition', {
+            'exhibitionId': str(self.rng.randint(1, self.context['exhibitions'])),
+            'slots': 1,
+            'name': 'Bench User',
+            'email': 'bench-user-0@example.com',
+            'phone': '0712345678'
+        }, token=self.context['user_token'])
+        if not booking or 'checkoutRequestId' not in booking:
+            return
+
+        checkout_request_id = booking['checkoutRequestId']
+        self.request('mpesa_callback', 'POST', self.context['callback_path'], {'Body': {'stkCallback': {
+            'MerchantRequestID': booking.get('merchantRequestId'),
+            'CheckoutRequestID': checkout_request_id,
+            'ResultCode': 0,
+            'ResultDesc': 'The service request is processed successfully.'
+        }}})
+        self.request('mpesa_status', 'GET', f"/mpesa/status/{checkout_request_id}", token=self.context['user_token'])
+
+    def close(self):
+        self.connection.close()
+
+def _worker(port, context, deadline, samples, seed_value):
+    rng = random.Random(seed_value)
+    client = Client(port, context, samples, rng)
+    routes = list(ROUTE_MIX)
+    weights = list(ROUTE_MIX.values())
+    try:
+        while time.monotonic() < deadline:
+            getattr(client, rng.choices(routes, weights)[0])()
+    finally:
+        client.close()
+
+def _token(port, path, email, password):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.request('POST', path, body=json.dumps({'email': email, 'password': password}),
+                       headers={'Content-Type': 'application/json'})
+    response = json.loads(connection.getresponse().read())
+    connection.close()
+    if 'token' not in response:
+        raise SystemExit(f"Could not sign in as {email}: {response}")
+    return response['token']
+
+def summarize(samples, elapsed):
+    by_route = defaultdict(list)
+    errors = defaultdict(int)
+    for route, latency, status in samples:
+        by_route[route].append(latency)
+        if status >= 500:
+            errors[route] += 1
+
+    def stats(latencies, error_count):
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'errors': error_count,
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        }
+
+    routes = {route: stats(latencies, errors[route]) for route, latencies in sorted(by_route.items())}
+    overall = stats([latency for _, latency, _ in samples], sum(errors.values()))
+    return overall, routes
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    # The database backend is chosen when database.py is imported, so configure it first
+    workdir = tempfile.mkdtemp(prefix='afriart-bench-')
+    os.environ['AFRIART_DB_BACKEND'] = args.backend
+    if args.backend == 'sqlite':
+        os.environ.setdefault('AFRIART_SQLITE_PATH', os.path.join(workdir, 'bench.db'))
+    # The simulated Daraja callbacks authenticate like real ones
+    os.environ.setdefault('AFRIART_MPESA_CALLBACK_TOKEN', 'bench-callback-token')
+    # The fake Daraja API accepts any credentials
+    os.environ.setdefault('AFRIART_MPESA_CONSUMER_KEY', 'bench-consumer-key')
+    os.environ.setdefault('AFRIART_MPESA_CONSUMER_SECRET', 'bench-consumer-secret')
+    os.environ.setdefault('AFRIART_MPESA_PASSKEY', 'bench-passkey')
+
+    import seed
+    import mpesa
+    import server
+    from health import start_background_startup
+    from fake_daraja import start_fake_daraja
+
+    print(f"Seeding {args.scale} catalogue ({args.backend})...")
+    started = time.perf_counter()
+    counts = seed.seed(seed.SCALES[args.scale])
+    print(f"  {counts} in {time.perf_counter() - started:.1f}s")
+
+    daraja, mpesa.API_BASE_URL = start_fake_daraja(args.daraja_latency)
+    server.UPLOAD_DIR = os.path.join(workdir, 'uploads')
+    os.makedirs(server.UPLOAD_DIR, exist_ok=True)
+
+    # Migrate and warm up as a real start does; the server refuses requests until then
+    start_background_startup().join()
+
+    # Per-request access logs would dominate the measurement and the output
+    handler = type('BenchRequestHandler', (server.RequestHandler,), {'log_message': lambda self, *a: None})
+    httpd = server.ThreadingServer(('127.0.0.1', 0), handler)
+    port = httpd.server_address[1]
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    context = dict(counts, password=seed.BENCH_PASSWORD)
+    context['user_token'] = _token(port, '/login', seed.BENCH_USER_EMAIL, seed.BENCH_PASSWORD)
+    context['admin_token'] = _token(port, '/admin-login', seed.BENCH_ADMIN_EMAIL, seed.BENCH_PASSWORD)
+    context['callback_path'] = f"/mpesa/callback?token={quote(mpesa.CALLBACK_TOKEN, safe='')}"
+
+    rss_before = rss_kb()
+    samples = []
+    threads = []
+
+    # The handlers print diagnostics on most requests; keep them out of the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if args.warmup > 0:
+            warmup_deadline = time.monotonic() + args.warmup
+            warmers = [threading.Thread(target=_worker, args=(port, context, warmup_deadline, [], -i - 1))
+                       for i in range(args.concurrency)]
+            for thread in warmers:
+                thread.start()
+            for thread in warmers:
+                thread.join()
+
+        started = time.perf_counter()
+        deadline = time.monotonic() + args.duration
+        for i in range(args.concurrency):
+            worker_samples = []
+            samples.append(worker_samples)
+            threads.append(threading.Thread(target=_worker, args=(port, context, deadline, worker_samples, i)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    httpd.shutdown()
+    daraja.shutdown()
+
+    overall, routes = summarize([sample for worker in samples for sample in worker], elapsed)
+    return {
+        'meta': {
+            'scale': args.scale,
+            'backend': args.backend,
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'daraja_latency_s': args.daraja_latency,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'revision': _git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'overall': overall,
+        'routes': routes,
+        'memory': {'rss_before_kb': rss_before, 'rss_after_kb': rss_kb(), 'peak_rss_kb': peak_rss_kb()},
+    }
+
+def print_report(result):
+    meta = result['meta']
+    print(f"\n{meta['scale']} catalogue, {meta['backend']}, {meta['concurrency']} clients, {meta['duration_s']}s")
+    print(f"{'route':<20}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, stats in list(result['routes'].items()) + [('overall', result['overall'])]:
+        print(f"{route:<20}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput_rps']:>10.1f}"
+              f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+    memory = result['memory']
+    print(f"RSS {memory['rss_before_kb']} KB before, {memory['rss_after_kb']} KB after, peak {memory['peak_rss_kb']} KB")
+
+def compare(result, baseline, tolerance):
+    """List the metrics that regressed by more than tolerance relative to the baseline"""
+    regressions = []
+    entries = [('overall', result['overall'], baseline['overall'])] + [
+        (route, stats, baseline['routes'][route])
+        for route, stats in result['routes'].items() if route in baseline['routes']
+    ]
+    for route, current, previous in entries:
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{route} {metric}: {previous[metric]} -> {current[metric]}")
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{route} throughput_rps: {previous['throughput_rps']} -> {current['throughput_rps']}")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{route} errors: {previous['errors']} -> {current['errors']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=['1k', '10k', '100k'], default='1k')
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20, help="measured seconds")
+    parser.add_argument('--warmup', type=float, default=3, help="unmeasured seconds before the run")
+    parser.add_argument('--daraja-latency', type=float, default=0.0, help="simulated Daraja response time (s)")
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    parser.add_argument('--save-baseline', metavar='NAME', help="store the results as baselines/NAME.json")
+    parser.add_argument('--compare', metavar='NAME', help="fail if worse than baselines/NAME.json")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed regression (fraction)")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_report(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved baseline {path}")
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressions against {args.compare} (tolerance {args.tolerance:.0%}):")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare}")
+
+if __name__ == "__main__":
+    main()
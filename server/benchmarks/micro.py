@@ -0,0 +1,275 @@
+"""Micro-benchmarks for the helpers on the request hot path.
+
+Times dict_from_row, json_dumps, verify_token, hash_password,
+extract_auth_token and get_all_exhibitions (row fetch to response dict,
+with the database replaced by an in-memory cursor) in isolation, so we
+can see which of them are worth optimizing.
+
+    python benchmarks/micro.py                       # all benchmarks, timeit
+    python benchmarks/micro.py verify_token json_dumps
+    python benchmarks/micro.py --json results.json
+    python benchmarks/micro.py --pyperf -o results.json   # when pyperf is installed
+
+--code-dir runs the benchmarks against another checkout of server/ (this
+is how compare.py benchmarks other branches). Helpers that do not exist
+in that checkout are reported as skipped.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+from datetime import date, timedelta
+from decimal import Decimal
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Minimum duration of one timeit sample (seconds)
+MIN_SAMPLE_TIME = 0.2
+
+EXHIBITION_COLUMNS = ('id', 'title', 'description', 'location', 'start_date', 'end_date',
+                      'ticket_price', 'image_url', 'total_slots', 'available_slots', 'status')
+
+def exhibition_rows(count):
+    start = date(2025, 1, 1)
+    return [
+        (i, f"Exhibition {i}", "A showcase of contemporary East African art", "Nairobi National Museum",
+         start + timedelta(days=i % 365), start + timedelta(days=i % 365 + 30),
+         Decimal('1500.00'), f"/uploads/exhibition-{i}.jpg", 200, 200 - i % 200, 'upcoming')
+        for i in range(count)
+    ]
+
+class FakeCursor:
+    """A DB-API cursor that returns canned rows"""
+
+    def __init__(self, column_names, rows=()):
+        self.column_names = column_names
+        self.description = [(name,) for name in column_names]
+        self.rows = rows
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, *args, **kwargs):
+        return self._cursor
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+class FakeHandler:
+    """The part of BaseHTTPRequestHandler that extract_auth_token looks at"""
+
+    def __init__(self, headers):
+        self.headers = headers
+
+BENCHMARKS = {}
+
+def benchmark(name):
+    """Register a setup function that returns the callable to time"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+@benchmark('dict_from_row')
+def bench_dict_from_row():
+    from database import dict_from_row
+    cursor = FakeCursor(EXHIBITION_COLUMNS)
+    row = exhibition_rows(1)[0]
+    return lambda: dict_from_row(row, cursor)
+
+@benchmark('json_dumps')
+def bench_json_dumps():
+    from database import json_dumps
+    # 100 exhibitions shaped like the /exhibitions response: Decimal prices, dates already ISO strings
+    payload = {"exhibitions": [
+        {"id": str(row[0]), "title": row[1], "description": row[2], "location": row[3],
+         "startDate": row[4].isoformat(), "endDate": row[5].isoformat(), "ticketPrice": row[6],
+         "imageUrl": row[7], "totalSlots": row[8], "availableSlots": row[9], "status": row[10]}
+        for row in exhibition_rows(100)
+    ]}
+    return lambda: json_dumps(payload)
+
+@benchmark('verify_token')
+def bench_verify_token():
+    from auth import generate_token, verify_token
+    token = generate_token(1, 'Bench User', False)
+    return lambda: verify_token(token)
+
+@benchmark('hash_password')
+def bench_hash_password():
+    from auth import hash_password
+    return lambda: hash_password('correct horse battery staple')
+
+@benchmark('extract_auth_token')
+def bench_extract_auth_token():
+    from middleware import extract_auth_token
+    handler = FakeHandler({'Authorization': 'Bearer ' + 'x' * 160})
+    return lambda: extract_auth_token(handler)
+
+@benchmark('get_all_exhibitions')
+def bench_get_all_exhibitions():
+    import exhibition
+    connection = FakeConnection(FakeCursor(EXHIBITION_COLUMNS, exhibition_rows(1000)))
+    # Older checkouts read from get_db_connection, newer ones from the replica-aware helper
+    for name in ('get_db_connection', 'get_read_connection'):
+        if hasattr(exhibition, name):
+            setattr(exhibition, name, lambda: connection)
+    return exhibition.get_all_exhibitions
+
+@contextlib.contextmanager
+def quiet():
+    """Discard the diagnostics the helpers print while they are being timed"""
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        yield
+    finally:
+        sys.stdout = stdout
+
+def time_func(func):
+    """pyperf-style timer: run func loops times and return the elapsed seconds"""
+    def run(loops):
+        with quiet():
+            start = time.perf_counter()
+            for _ in range(loops):
+                func()
+            elapsed = time.perf_counter() - start
+        return elapsed
+    return run
+
+def calibrate(timer):
+    loops = 1
+    while timer(loops) < MIN_SAMPLE_TIME:
+        loops *= 2
+    return loops
+
+def prepare(names):
+    """Set up the selected benchmarks; returns ({name: callable}, {name: reason skipped})"""
+    funcs, skipped = {}, {}
+    for name in names:
+        try:
+            with quiet():
+                func = BENCHMARKS[name]()
+                # Fail here rather than half way through a timing run
+                func()
+            funcs[name] = func
+        except Exception as e:
+            skipped[name] = f"{type(e).__name__}: {e}"
+    return funcs, skipped
+
+def run_timeit(funcs, repeat):
+    results = {}
+    for name, func in funcs.items():
+        timer = time_func(func)
+        loops = calibrate(timer)
+        samples = [timer(loops) / loops for _ in range(repeat)]
+        results[name] = {
+            'loops': loops,
+            'min_us': round(min(samples) * 1e6, 4),
+            'median_us': round(statistics.median(samples) * 1e6, 4),
+            'stdev_us': round(statistics.stdev(samples) * 1e6, 4) if len(samples) > 1 else 0.0,
+        }
+        print(f"  {name:<22} {results[name]['median_us']:12.3f} us  "
+              f"(min {results[name]['min_us']:.3f}, {repeat} x {loops} loops)", file=sys.stderr)
+    return results
+
+def add_arguments(parser):
+    parser.add_argument('benchmarks', nargs='*', help=f"any of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--code-dir', default=os.path.join(BENCH_DIR, '..'),
+                        help="server/ directory to import the helpers from")
+
+def use_embedded_database():
+    """Import the helpers against the embedded SQLite backend
+
+    database.py picks its backend when it is imported, so this has to run
+    before any helper is loaded; otherwise every DB-backed benchmark needs
+    a MySQL driver. Settings already in the environment win, which is also
+    how pyperf workers and compare.py runs share one configuration.
+    """
+    os.environ.setdefault('AFRIART_DB_BACKEND', 'sqlite')
+    if 'AFRIART_SQLITE_PATH' not in os.environ:
+        workdir = tempfile.mkdtemp(prefix='afriart-micro-')
+        os.environ['AFRIART_SQLITE_PATH'] = os.path.join(workdir, 'micro.db')
+    # No payment is made here, so the callback token is not required
+    os.environ.setdefault('AFRIART_MPESA_ENABLED', '0')
+
+def load(args):
+    names = args.benchmarks or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+    args.code_dir = os.path.abspath(args.code_dir)
+    sys.path.insert(0, args.code_dir)
+
+    funcs, skipped = prepare(names)
+    for name, reason in skipped.items():
+        print(f"  {name:<22} skipped ({reason})", file=sys.stderr)
+    return funcs, skipped
+
+def main_pyperf():
+    import pyperf
+
+    def worker_args(cmd, args):
+        # pyperf re-runs this script in worker processes; pass our options along
+        cmd.extend(['--pyperf', '--code-dir', args.code_dir] + args.benchmarks)
+
+    runner = pyperf.Runner(add_cmdline_args=worker_args)
+    add_arguments(runner.argparser)
+    runner.argparser.add_argument('--pyperf', action='store_true')
+    args = runner.parse_args()
+    use_embedded_database()
+    # Workers start with a clean environment; keep the backend settings database.py reads
+    args.inherit_environ = (args.inherit_environ or []) + [name for name in os.environ if name.startswith('AFRIART_')]
+    funcs, _ = load(args)
+    for name, func in funcs.items():
+        runner.bench_time_func(name, time_func(func))
+
+def main():
+    if '--pyperf' in sys.argv[1:]:
+        return main_pyperf()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=7, help="timeit samples per benchmark")
+    parser.add_argument('--json', metavar='PATH', help="write the results to this file")
+    parser.add_argument('--pyperf', action='store_true',
+                        help="measure with pyperf instead of timeit (accepts pyperf's options, e.g. -o)")
+    args = parser.parse_args()
+
+    use_embedded_database()
+    funcs, skipped = load(args)
+    results = run_timeit(funcs, args.repeat)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'meta': {'code_dir': args.code_dir, 'python': platform.python_version(),
+                         'platform': platform.platform(), 'repeat': args.repeat},
+                'results': results,
+                'skipped': skipped,
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
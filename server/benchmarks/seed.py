@@ -0,0 +1,142 @@
+"""Seed a database with a synthetic catalogue for benchmarking.
+
+Uses whichever backend database.py is configured for (AFRIART_DB_BACKEND),
+so point it at a scratch database: the tables are emptied first.
+
+    AFRIART_DB_BACKEND=sqlite AFRIART_SQLITE_PATH=/tmp/bench.db python benchmarks/seed.py 10k
+"""
+import os
+import sys
+import random
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import get_db_connection, initialize_database
+from auth import hash_password
+
+# Number of artworks per scale; exhibitions, users and orders are derived from it
+SCALES = {'1k': 1000, '10k': 10000, '100k': 100000}
+
+BATCH_SIZE = 5000
+
+# Accounts the load generator signs in with
+BENCH_PASSWORD = 'bench-password'
+BENCH_ADMIN_EMAIL = 'bench-admin@example.com'
+BENCH_USER_EMAIL = 'bench-user-0@example.com'
+
+# Deleted children first so foreign keys are never violated
+TABLES = [
+    'sales_daily', 'artist_sales', 'exhibition_attendance', 'artwork_holds', 'exhibition_holds',
+    'mpesa_transactions', 'exhibition_bookings', 'artwork_orders', 'checkouts', 'contact_messages',
+    'exhibitions', 'artworks', 'admins', 'users',
+]
+
+DESCRIPTION = (
+    "A vibrant study of light and movement inspired by the markets of Nairobi, "
+    "layered in acrylic and natural pigments sourced from the Rift Valley."
+)
+
+def _insert(cursor, query, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        cursor.executemany(query, rows[start:start + BATCH_SIZE])
+
+def seed(artworks, seed_value=42):
+    """Replace the contents of the database with a catalogue of the given size.
+
+    Returns the counts inserted per table.
+    """
+    rng = random.Random(seed_value)
+    exhibitions = max(10, artworks // 100)
+    users = max(50, artworks // 100)
+    orders = artworks // 2
+    bookings = artworks // 2
+    today = date.today()
+    password = hash_password(BENCH_PASSWORD)
+
+    if not initialize_database():
+        raise SystemExit("Could not initialize the database")
+
+    connection = get_db_connection()
+    if connection is None:
+        raise SystemExit("Database connection failed")
+    cursor = connection.cursor()
+
+    try:
+        for table in TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+
+        _insert(cursor, "INSERT INTO admins (id, name, email, password) VALUES (%s, %s, %s, %s)",
+                [(1, 'Bench Admin', BENCH_ADMIN_EMAIL, password)])
+        _insert(cursor, "INSERT INTO users (id, name, email, password, phone) VALUES (%s, %s, %s, %s, %s)", [
+            (i + 1, f"Bench User {i}", f"bench-user-{i}@example.com", password, '0712345678')
+            for i in range(users)
+        ])
+        _insert(cursor, """
+        INSERT INTO artworks (id, title, artist, description, price, image_url, dimensions, medium, year, status)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, [
+            (i + 1, f"Artwork {i}", f"Artist {rng.randrange(500)}", DESCRIPTION,
+             rng.randrange(5000, 500000), f"/uploads/artwork-{i}.jpg", "60x90 cm",
+             rng.choice(['Acrylic', 'Oil', 'Watercolour', 'Mixed media']), rng.randrange(1990, 2026),
+             'sold' if i < orders // 2 else 'available')
+            for i in range(artworks)
+        ])
+        _insert(cursor, """
+        INSERT INTO exhibitions (id, title, description, location, start_date, end_date, ticket_price,
+                                 image_url, total_slots, available_slots, status)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, [
+            (i + 1, f"Exhibition {i}", DESCRIPTION, "Nairobi National Museum",
+             today - timedelta(days=7), today + timedelta(days=rng.randrange(30, 365)),
+             rng.randrange(500, 3000), f"/uploads/exhibition-{i}.jpg",
+             # Effectively unlimited so a long load test never sells out
+             1000000000, 1000000000, 'ongoing')
+            for i in range(exhibitions)
+        ])
+
+        now = datetime.now()
+        _insert(cursor, """
+        INSERT INTO artwork_orders (user_id, artwork_id, name, email, phone, delivery_address, payment_method,
+                                    payment_status, order_date, total_amount)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, [
+            (rng.randrange(users) + 1, rng.randrange(artworks) + 1, 'Bench User', 'bench@example.com',
+             '0712345678', 'Nairobi', 'mpesa', rng.choice(['pending', 'completed', 'failed']),
+             now - timedelta(minutes=rng.randrange(60 * 24 * 365)), rng.randrange(5000, 500000))
+            for _ in range(orders)
+        ])
+        _insert(cursor, """
+        INSERT INTO exhibition_bookings (user_id, exhibition_id, name, email, phone, slots, payment_method,
+                                         payment_status, booking_date, total_amount)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, [
+            (rng.randrange(users) + 1, rng.randrange(exhibitions) + 1, 'Bench User', 'bench@example.com',
+             '0712345678', rng.randrange(1, 5), 'mpesa', rng.choice(['pending', 'completed', 'failed']),
+             now - timedelta(minutes=rng.randrange(60 * 24 * 365)), rng.randrange(500, 12000))
+            for _ in range(bookings)
+        ])
+        # Seeded payments completed when they were placed
+        cursor.execute("UPDATE artwork_orders SET paid_at = order_date WHERE payment_status = 'completed'")
+        cursor.execute("UPDATE exhibition_bookings SET paid_at = booking_date WHERE payment_status = 'completed'")
+
+        connection.commit()
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+    return {
+        'artworks': artworks,
+        'exhibitions': exhibitions,
+        'users': users,
+        'artwork_orders': orders,
+        'exhibition_bookings': bookings,
+    }
+
+if __name__ == "__main__":
+    scale = sys.argv[1] if len(sys.argv) > 1 else '1k'
+    if scale not in SCALES:
+        print(f"Usage: python benchmarks/seed.py [{'|'.join(SCALES)}]")
+        sys.exit(2)
+    print(seed(SCALES[scale]))
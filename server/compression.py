@@ -0,0 +1,106 @@
+"""Response compression and the catalogue response cache.
+
+Responses larger than MIN_COMPRESS_SIZE are compressed with the best
+encoding the client accepts: brotli when the brotli package is installed,
+otherwise gzip. A CompressedVariants object keeps each encoding of a body
+once it has been produced, so cached responses are only compressed once
+per encoding rather than on every hit.
+"""
+import gzip
+import time
+import threading
+from functools import lru_cache
+from config import CONFIG
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed (bytes)
+MIN_COMPRESS_SIZE = CONFIG.compression.min_size
+
+GZIP_LEVEL = CONFIG.compression.gzip_level
+BROTLI_QUALITY = CONFIG.compression.brotli_quality
+
+# Encodings we can produce, most preferred first
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+@lru_cache(maxsize=256)
+def _preferred_encoding(accept_encoding):
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def negotiate(accept_encoding, size):
+    """Pick the encoding for a body of size bytes, or None to send it as is"""
+    if not accept_encoding or size < MIN_COMPRESS_SIZE:
+        return None
+    return _preferred_encoding(accept_encoding)
+
+def compress(body, encoding):
+    """Compress body with the given content encoding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+class CompressedVariants:
+    """A response body and the compressed copies of it made so far"""
+
+    def __init__(self, body):
+        self.body = body
+        self._encoded = {}
+
+    def encode(self, encoding):
+        """The body in the given encoding (None for identity), compressing on first use"""
+        if encoding is None:
+            return self.body
+        encoded = self._encoded.get(encoding)
+        if encoded is None:
+            encoded = self._encoded[encoding] = compress(self.body, encoding)
+        return encoded
+
+class ResponseCache:
+    """Short-lived cache of public responses, keyed by path"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Bumped by clear(), so a response loaded before a write is not cached after it
+        self.generation = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def put(self, key, variants, generation=None):
+        """Cache variants, unless the cache was cleared since generation was read"""
+        if self.ttl > 0:
+            with self._lock:
+                if generation is None or generation == self.generation:
+                    self._entries[key] = (time.monotonic() + self.ttl, variants)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
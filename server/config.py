@@ -0,0 +1,289 @@
+"""Server configuration, loaded once at import.
+
+Every setting has a default, can be set in a TOML file and can be
+overridden by an environment variable, in that order. The file is only
+read when AFRIART_CONFIG names one:
+
+    [database]
+    host = "db1.internal"
+    pool_size = 20
+
+    [server]
+    keep_alive_timeout = 30
+
+Values are converted to their setting's type and checked before anything
+else starts. Unknown keys in the file and invalid values stop the server
+with a ConfigError that lists all of them. The modules that use a setting
+still expose it as a module constant (database.DB_POOL_SIZE and so on).
+
+    python config.py          # print the effective configuration
+"""
+import os
+from types import SimpleNamespace
+
+try:
+    import tomllib
+except ImportError:
+    # Python before 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Environment variable naming the TOML file
+CONFIG_FILE_ENV = 'AFRIART_CONFIG'
+
+# The development default; a server started with it logs a warning
+DEFAULT_SECRET_KEY = "your_secret_key_replace_this_with_a_secure_random_string"
+
+class ConfigError(ValueError):
+    """The configuration file or environment holds invalid settings"""
+
+def _integer(value):
+    if isinstance(value, bool):
+        raise ValueError("expected an integer")
+    return int(value)
+
+def _number(value):
+    if isinstance(value, bool):
+        raise ValueError("expected a number")
+    return float(value)
+
+def _text(value):
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+        raise ValueError("expected a string")
+    return str(value)
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'on'):
+        return True
+    if text in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError("expected true or false")
+
+def _names(value):
+    # Comma separated in the environment, an array in the file
+    items = value.split(',') if isinstance(value, str) else value
+    if not isinstance(items, list):
+        raise ValueError("expected a list")
+    return [str(item).strip() for item in items if str(item).strip()]
+
+def _sizes(value):
+    # "route=bytes,route=bytes" in the environment, a table in the file
+    if isinstance(value, str):
+        pairs = [item.split('=', 1) for item in value.split(',') if item.strip()]
+        if any(len(pair) != 2 for pair in pairs):
+            raise ValueError("expected route=bytes pairs")
+        value = dict(pairs)
+    if not isinstance(value, dict):
+        raise ValueError("expected a table of route = bytes")
+    return {route.strip(): _integer(size) for route, size in value.items()}
+
+def _at_least(minimum):
+    return lambda value: None if value >= minimum else f"must be at least {minimum}"
+
+def _between(low, high):
+    return lambda value: None if low <= value <= high else f"must be between {low} and {high}"
+
+def _one_of(*choices):
+    return lambda value: None if value in choices else f"must be one of {', '.join(choices)}"
+
+class Setting:
+    """One configuration value: its TOML key (section.name), environment variables and type"""
+
+    def __init__(self, key, default, env, convert=_text, check=None, secret=False):
+        self.key = key
+        self.default = default
+        # The first variable that is set wins; later ones are older names kept working
+        self.env = (env,) if isinstance(env, str) else env
+        self.convert = convert
+        self.check = check
+        self.secret = secret
+
+SETTINGS = (
+    # HTTP server
+    Setting('server.port', 8000, 'AFRIART_PORT', _integer, _between(1, 65535)),
+    Setting('server.upload_dir', os.path.join(SERVER_DIR, '../public/uploads'), 'AFRIART_UPLOAD_DIR'),
+    Setting('server.listen_backlog', 128, 'AFRIART_LISTEN_BACKLOG', _integer, _at_least(1)),
+    Setting('server.max_workers', 256, 'AFRIART_MAX_WORKERS', _integer, _at_least(1)),
+    Setting('server.keep_alive_timeout', 15.0, 'AFRIART_KEEP_ALIVE_TIMEOUT', _number, _at_least(0.1)),
+    Setting('server.max_requests_per_connection', 100, 'AFRIART_MAX_REQUESTS_PER_CONNECTION', _integer, _at_least(1)),
+    Setting('server.max_drain_bytes', 1024 * 1024, 'AFRIART_MAX_DRAIN_BYTES', _integer, _at_least(0)),
+    Setting('server.max_body_bytes', 64 * 1024, 'AFRIART_MAX_BODY_BYTES', _integer, _at_least(0)),
+    Setting('server.max_upload_bytes', 10 * 1024 * 1024, 'AFRIART_MAX_UPLOAD_BYTES', _integer, _at_least(0)),
+    Setting('server.body_limits', {}, 'AFRIART_BODY_LIMITS', _sizes,
+            lambda limits: next((f"has a negative limit for {route}" for route, size in limits.items() if size < 0), None)),
+    Setting('server.header_timeout', 10.0, 'AFRIART_HEADER_TIMEOUT', _number, _at_least(0.1)),
+    Setting('server.body_timeout', 20.0, 'AFRIART_BODY_TIMEOUT', _number, _at_least(0.1)),
+    Setting('server.min_body_rate', 50 * 1024, 'AFRIART_MIN_BODY_RATE', _integer, _at_least(1)),
+    Setting('server.catalogue_cache_ttl', 5.0, 'AFRIART_CATALOGUE_CACHE_TTL', _number, _at_least(0)),
+    Setting('server.startup_retry_interval', 5.0, 'AFRIART_STARTUP_RETRY_INTERVAL', _number, _at_least(0.1)),
+    Setting('server.shutdown_timeout', 25.0, 'AFRIART_SHUTDOWN_TIMEOUT', _number, _at_least(0)),
+    Setting('server.shutdown_delay', 0.0, 'AFRIART_SHUTDOWN_DELAY', _number, _at_least(0)),
+    Setting('server.json_backend', 'auto', 'AFRIART_JSON_BACKEND', _text, _one_of('auto', 'stdlib')),
+
+    # Response compression
+    Setting('compression.min_size', 1024, 'AFRIART_MIN_COMPRESS_SIZE', _integer, _at_least(0)),
+    Setting('compression.gzip_level', 6, 'AFRIART_GZIP_LEVEL', _integer, _between(1, 9)),
+    Setting('compression.brotli_quality', 5, 'AFRIART_BROTLI_QUALITY', _integer, _between(0, 11)),
+
+    # CORS
+    Setting('cors.origins', ['*'], 'AFRIART_CORS_ORIGINS', _names),
+    Setting('cors.max_age', 7200, 'AFRIART_CORS_MAX_AGE', _integer, _at_least(0)),
+
+    # Authentication
+    Setting('auth.secret_key', DEFAULT_SECRET_KEY, ('AFRIART_SECRET_KEY', 'JWT_SECRET_KEY'), _text, secret=True),
+
+    # Database
+    Setting('database.backend', 'mysql', 'AFRIART_DB_BACKEND', _text, _one_of('mysql', 'sqlite')),
+    Setting('database.sqlite_path', os.path.join(SERVER_DIR, 'artgallery.db'), 'AFRIART_SQLITE_PATH'),
+    Setting('database.sqlite_busy_timeout', 5.0, 'AFRIART_SQLITE_BUSY_TIMEOUT', _number, _at_least(0)),
+    Setting('database.sqlite_statement_cache', 256, 'AFRIART_SQLITE_STATEMENT_CACHE', _integer, _at_least(0)),
+    Setting('database.host', 'localhost', 'AFRIART_DB_HOST'),
+    Setting('database.port', 3306, 'AFRIART_DB_PORT', _integer, _between(1, 65535)),
+    Setting('database.user', 'root', 'AFRIART_DB_USER'),
+    Setting('database.password', '', 'AFRIART_DB_PASSWORD', _text, secret=True),
+    Setting('database.name', 'artgallery', 'AFRIART_DB_NAME'),
+    Setting('database.pool_size', 10, 'AFRIART_DB_POOL_SIZE', _integer, _between(1, 32)),
+    Setting('database.pool_warm', None, 'AFRIART_DB_POOL_WARM', _integer, _at_least(0)),
+    Setting('database.replicas', [], 'AFRIART_DB_REPLICAS', _names),
+    Setting('database.max_replica_lag', 5, 'AFRIART_MAX_REPLICA_LAG', _integer, _at_least(0)),
+    Setting('database.replica_check_interval', 10.0, 'AFRIART_REPLICA_CHECK_INTERVAL', _number, _at_least(0)),
+    Setting('database.read_your_writes_window', 10, 'AFRIART_READ_YOUR_WRITES_WINDOW', _integer, _at_least(0)),
+    Setting('database.query_stats', True, 'AFRIART_QUERY_STATS', _flag),
+    Setting('database.slow_query_ms', 200.0, 'AFRIART_SLOW_QUERY_MS', _number, _at_least(0)),
+
+    # Checkout holds
+    Setting('holds.slot_ttl', 600, ('AFRIART_SLOT_HOLD_TTL', 'SLOT_HOLD_TTL'), _integer, _at_least(1)),
+    Setting('holds.artwork_ttl', 180, ('AFRIART_ARTWORK_HOLD_TTL', 'ARTWORK_HOLD_TTL'), _integer, _at_least(1)),
+    Setting('holds.sweep_interval', 30, ('AFRIART_HOLD_SWEEP_INTERVAL', 'HOLD_SWEEP_INTERVAL'), _integer, _at_least(1)),
+    Setting('holds.sweep_batch', 500, 'AFRIART_HOLD_SWEEP_BATCH', _integer, _at_least(1)),
+
+    # M-Pesa (Daraja API)
+    Setting('mpesa.enabled', True, 'AFRIART_MPESA_ENABLED', _flag),
+    Setting('mpesa.api_base_url', "https://sandbox.safaricom.co.ke", 'AFRIART_MPESA_API_BASE_URL'),
+    # Credentials have no default: they come from the environment or the file
+    Setting('mpesa.consumer_key', None, 'AFRIART_MPESA_CONSUMER_KEY', _text, secret=True),
+    Setting('mpesa.consumer_secret', None, 'AFRIART_MPESA_CONSUMER_SECRET', _text, secret=True),
+    Setting('mpesa.business_short_code', "174379", 'AFRIART_MPESA_SHORT_CODE'),
+    Setting('mpesa.passkey', None, 'AFRIART_MPESA_PASSKEY', _text, secret=True),
+    Setting('mpesa.callback_url', "https://webhook.site/3c1f62b5-4214-47d6-9f26-71c1f4b9c8f0", 'AFRIART_MPESA_CALLBACK_URL'),
+    Setting('mpesa.callback_token', None, 'AFRIART_MPESA_CALLBACK_TOKEN', _text,
+            lambda token: None if len(token) >= 16 else "must be at least 16 characters", secret=True),
+    Setting('mpesa.timeout', 30.0, 'AFRIART_MPESA_TIMEOUT', _number, _at_least(0.1)),
+
+    # Tracing
+    Setting('tracing.exporter', 'none', 'AFRIART_TRACE_EXPORTER', _text, _one_of('none', 'file', 'otlp')),
+    Setting('tracing.file', os.path.join(SERVER_DIR, 'traces.jsonl'), 'AFRIART_TRACE_FILE'),
+    Setting('tracing.otlp_endpoint', 'http://localhost:4318/v1/traces', 'AFRIART_OTLP_ENDPOINT'),
+    Setting('tracing.sample_ratio', 1.0, 'AFRIART_TRACE_SAMPLE_RATIO', _number, _between(0, 1)),
+    Setting('tracing.service_name', 'afriart-api', 'AFRIART_SERVICE_NAME'),
+    Setting('tracing.export_interval', 2.0, 'AFRIART_TRACE_EXPORT_INTERVAL', _number, _at_least(0.1)),
+    Setting('tracing.export_batch_size', 512, 'AFRIART_TRACE_BATCH_SIZE', _integer, _at_least(1)),
+    Setting('tracing.max_queued_spans', 4096, 'AFRIART_TRACE_MAX_QUEUED', _integer, _at_least(1)),
+
+    # Profiling
+    Setting('profiler.max_sample_seconds', 60, 'AFRIART_MAX_PROFILE_SECONDS', _integer, _at_least(1)),
+)
+
+# Settings without which no payment can complete; required while mpesa.enabled is on
+MPESA_REQUIRED = ('mpesa.consumer_key', 'mpesa.consumer_secret', 'mpesa.passkey', 'mpesa.callback_token')
+
+def _read_file(path):
+    if tomllib is None:
+        raise ConfigError(f"{path}: reading TOML needs Python 3.11+ or the tomli package")
+    try:
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    except OSError as e:
+        raise ConfigError(f"Cannot read configuration file {path}: {e}")
+    except tomllib.TOMLDecodeError as e:
+        raise ConfigError(f"{path}: {e}")
+
+def _file_values(data, path, errors):
+    """The file's settings by dotted key; unknown sections and keys are errors"""
+    known = {setting.key for setting in SETTINGS}
+    values = {}
+    for section, entries in data.items():
+        if not isinstance(entries, dict):
+            errors.append(f"{path}: '{section}' must be a [section]")
+            continue
+        for name, value in entries.items():
+            key = f"{section}.{name}"
+            if key in known:
+                values[key] = value
+            else:
+                errors.append(f"{path}: unknown setting '{key}'")
+    return values
+
+def load(environ=None, path=None):
+    """Read and check the configuration; raises ConfigError listing every problem"""
+    environ = os.environ if environ is None else environ
+    path = path or environ.get(CONFIG_FILE_ENV)
+    errors = []
+    file_values = _file_values(_read_file(path), path, errors) if path else {}
+
+    sections = {}
+    for setting in SETTINGS:
+        source, raw = 'default', setting.default
+        if setting.key in file_values:
+            source, raw = path, file_values[setting.key]
+        for name in setting.env:
+            if environ.get(name) is not None:
+                source, raw = name, environ[name]
+                break
+
+        value = raw
+        if raw is not None:
+            try:
+                value = setting.convert(raw)
+            except (TypeError, ValueError) as e:
+                errors.append(f"{setting.key} (from {source}): {raw!r} is invalid: {e}")
+                continue
+            problem = setting.check(value) if setting.check else None
+            if problem:
+                errors.append(f"{setting.key} (from {source}): {value!r} {problem}")
+                continue
+        section, name = setting.key.split('.')
+        sections.setdefault(section, {})[name] = value
+
+    # Settings that failed their own check are already reported above
+    mpesa = sections.get('mpesa', {})
+    if mpesa.get('enabled'):
+        for setting in SETTINGS:
+            name = setting.key.split('.')[1]
+            if setting.key in MPESA_REQUIRED and name in mpesa and mpesa[name] is None:
+                errors.append(f"{setting.key} must be set ({setting.env[0]}) while mpesa.enabled is on; "
+                              "set AFRIART_MPESA_ENABLED=0 to run without payments")
+
+    if errors:
+        raise ConfigError("Invalid configuration:\n  " + "\n  ".join(errors))
+
+    config = SimpleNamespace(**{name: SimpleNamespace(**values) for name, values in sections.items()})
+    config.source = path
+    # Warm every pooled connection unless told otherwise
+    if config.database.pool_warm is None:
+        config.database.pool_warm = config.database.pool_size
+    if config.auth.secret_key == DEFAULT_SECRET_KEY:
+        print("WARNING: Using the default JWT secret key; set AFRIART_SECRET_KEY in production")
+    return config
+
+def describe(config):
+    """The effective settings as "key = value" lines, with secrets masked"""
+    lines = []
+    for setting in SETTINGS:
+        section, name = setting.key.split('.')
+        value = getattr(getattr(config, section), name)
+        lines.append(f"{setting.key} = {'********' if setting.secret and value else repr(value)}")
+    return lines
+
+CONFIG = load()
+
+if __name__ == "__main__":
+    print(f"# Configuration file: {CONFIG.source or '(none)'}")
+    print("\n".join(describe(CONFIG)))
@@ -2,10 +2,10 @@
 from database import save_contact_message, get_all_contact_messages, update_message_status
 import json
 import jwt
-import os
+from config import CONFIG
 
-# Get the secret key from environment or use a default (in production, always use environment variables)
-SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'afriart_default_secret_key')
+# Secret key for JWT tokens, shared by every module that issues or checks them
+SECRET_KEY = CONFIG.auth.secret_key
 
 def is_admin(auth_header):
     """Verify if the request is from an admin"""
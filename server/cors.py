@@ -0,0 +1,68 @@
+"""CORS policy for the API.
+
+Allowed origins come from AFRIART_CORS_ORIGINS (comma separated, '*' for
+any origin, the default). The header lines for every allowed origin are
+rendered to bytes once at startup, and preflight requests are answered
+with a complete pre-rendered 204 response that browsers may cache for
+AFRIART_CORS_MAX_AGE seconds, so the admin panel's PUT/DELETE requests
+stop paying for a preflight round trip on every call.
+"""
+from config import CONFIG
+
+CORS_ALLOWED_ORIGINS = CONFIG.cors.origins
+
+# How long browsers may reuse a preflight result (seconds; Chrome caps this at 7200)
+CORS_MAX_AGE = CONFIG.cors.max_age
+
+ALLOWED_METHODS = 'GET, POST, PUT, DELETE, OPTIONS'
+ALLOWED_HEADERS = 'Content-Type, Authorization'
+
+def _render(headers):
+    return ''.join(f"{name}: {value}\r\n" for name, value in headers).encode('latin-1')
+
+class CorsPolicy:
+    """Pre-rendered CORS headers for a fixed set of allowed origins"""
+
+    def __init__(self, origins, max_age, protocol_version='HTTP/1.1'):
+        self.allow_any = '*' in origins
+        self._response_headers = {}
+        self._preflight = {}
+
+        for origin in (['*'] if self.allow_any else origins):
+            headers = [('Access-Control-Allow-Origin', origin)]
+            if origin != '*':
+                # The response depends on the request's Origin, so shared caches must key on it
+                headers.append(('Vary', 'Origin'))
+            self._response_headers[origin] = _render(headers)
+            self._preflight[origin] = (
+                f"{protocol_version} 204 No Content\r\n".encode('latin-1')
+                + _render(headers + [
+                    ('Access-Control-Allow-Methods', ALLOWED_METHODS),
+                    ('Access-Control-Allow-Headers', ALLOWED_HEADERS),
+                    ('Access-Control-Max-Age', max_age),
+                ])
+            )
+
+        self._preflight_denied = (
+            f"{protocol_version} 403 Forbidden\r\n".encode('latin-1')
+            + _render([('Content-Length', 0), ('Vary', 'Origin')])
+        )
+
+    def response_headers(self, origin):
+        """CORS header lines to add to a response for a request from origin"""
+        if self.allow_any:
+            return self._response_headers['*']
+        return self._response_headers.get(origin, b'')
+
+    def preflight_response(self, origin, date, close_connection=False):
+        """Complete (status, response bytes) for an OPTIONS preflight from origin"""
+        key = '*' if self.allow_any else origin
+        head = self._preflight.get(key)
+        status = 204
+        if head is None:
+            head, status = self._preflight_denied, 403
+
+        tail = b'Connection: close\r\n\r\n' if close_connection else b'\r\n'
+        return status, head + f"Date: {date}\r\n".encode('latin-1') + tail
+
+CORS = CorsPolicy(CORS_ALLOWED_ORIGINS, CORS_MAX_AGE)
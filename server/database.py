@@ -1,161 +1,396 @@
-import mysql.connector
-from mysql.connector import Error
-import json
-from decimal import Decimal
-
-# Custom JSON encoder to handle Decimal types
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
+import time
+import weakref
+import threading
+import itertools
+import schema
+import serializer
+from rowmap import RowMapper, plain
+from querylog import instrument, instrument_cursor, unwrap
+from config import CONFIG
+
+# Storage backend: 'mysql' (default) or 'sqlite' for single-node and test deployments
+DB_BACKEND = CONFIG.database.backend
+SQLITE_PATH = CONFIG.database.sqlite_path
+
+if DB_BACKEND == 'sqlite':
+    import sqlite_backend
+    from sqlite_backend import Error
+else:
+    import mysql.connector
+    from mysql.connector import Error, pooling
 
 # Database connection configuration
 DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',  # Update with your MySQL username
-    'password': '',  # Update with your MySQL password
-    'database': 'artgallery'
+    'host': CONFIG.database.host,
+    'port': CONFIG.database.port,
+    'user': CONFIG.database.user,
+    'password': CONFIG.database.password,
+    'database': CONFIG.database.name
 }
 
-def get_db_connection():
-    """Create and return a database connection"""
+# Connections kept open per database host
+DB_POOL_SIZE = CONFIG.database.pool_size
+
+# Pooled connections per host on which the fixed queries are prepared at startup
+DB_POOL_WARM = CONFIG.database.pool_warm
+
+# Read replicas as comma separated host[:port]; catalogue reads are spread over them
+DB_REPLICAS = CONFIG.database.replicas
+
+# Replicas further behind the primary than this many seconds are not read from
+MAX_REPLICA_LAG = CONFIG.database.max_replica_lag
+
+# How long a replica's measured lag is trusted before it is checked again (seconds)
+REPLICA_CHECK_INTERVAL = CONFIG.database.replica_check_interval
+
+# After a write, the writer's reads go to the primary for this many seconds
+READ_YOUR_WRITES_WINDOW = CONFIG.database.read_your_writes_window
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+_replica_lag = {}
+_replica_counter = itertools.count()
+
+# Fixed queries registered with prepared_statement(), and the prepared cursors per physical connection
+_prepared_statements = []
+_statement_cursors = weakref.WeakKeyDictionary()
+_statement_cursors_lock = threading.Lock()
+
+_request = threading.local()
+_recent_writers = {}
+_recent_writers_lock = threading.Lock()
+_write_listeners = []
+
+def _pooled_connection(name, config):
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                # Resetting the session on every checkout would also deallocate the
+                # prepared statements; _PooledConnection rolls back instead
+                pool = pooling.MySQLConnectionPool(
+                    pool_name=f"afriart-{name}", pool_size=DB_POOL_SIZE,
+                    pool_reset_session=False, **config
+                )
+                _pools[name] = pool
+    
+    try:
+        return _PooledConnection(pool.get_connection())
+    except pooling.PoolError:
+        # Every pooled connection is busy; serve this request with a one-off connection
+        return mysql.connector.connect(**config)
+
+class _PooledConnection:
+    """A pooled connection that ends its open transaction when handed back"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        # Without a session reset, the next borrower would otherwise inherit
+        # this transaction's snapshot and locks
+        try:
+            if self._connection.in_transaction:
+                self._connection.rollback()
+        except Error as e:
+            print(f"Error rolling back pooled connection: {e}")
+        self._connection.close()
+
+def close_pools():
+    """Close the pooled connections; called at shutdown once requests have drained"""
+    if DB_BACKEND == 'sqlite':
+        sqlite_backend.close_pools()
+        return
+    
+    with _pools_lock:
+        pools = list(_pools.items())
+        _pools.clear()
+    
+    for name, pool in pools:
+        try:
+            # mysql.connector has no public call for closing a pool's idle connections
+            pool._remove_connections()
+        except Error as e:
+            print(f"Error closing connection pool {name}: {e}")
+
+def _primary_connection():
+    if DB_BACKEND == 'sqlite':
+        try:
+            return sqlite_backend.connect(SQLITE_PATH)
+        except Error as e:
+            print(f"Error opening SQLite database: {e}")
+            return None
+    
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
+        connection = _pooled_connection('primary', DB_CONFIG)
         if connection.is_connected():
             return connection
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
     return None
 
-def initialize_database():
-    """Create database tables if they don't exist"""
-    connection = get_db_connection()
-    if connection is None:
-        print("Failed to connect to database")
-        return False
+def get_db_connection():
+    """Return a connection to the primary database (writes and read-after-write)"""
+    return instrument(_primary_connection(), _explain)
+
+def _explain(query, params):
+    """Query plan of a slow statement, looked up on a separate cursor"""
+    if DB_BACKEND == 'sqlite':
+        # The caller's thread already holds a connection, so this is a second handle on it;
+        # closing it leaves the caller's transaction alone
+        connection = sqlite_backend.connect(SQLITE_PATH)
+        cursor = connection.cursor()
+        try:
+            cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            connection.close()
     
-    cursor = connection.cursor()
+    # The caller's cursor may still have unread results, so use another connection
+    connection = _primary_connection()
+    if connection is None:
+        return []
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("EXPLAIN " + query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        connection.close()
+
+def prepared_statement(query):
+    """Register a fixed query to be prepared on the pooled connections at startup"""
+    _prepared_statements.append(query)
+    return query
+
+class _PreparedCursor:
+    """A prepared cursor cached on its connection; close() keeps the statement"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        # Unread rows would make the connection's next command fail
+        if getattr(self._cursor, 'with_rows', False):
+            try:
+                self._cursor.fetchall()
+            except Error:
+                pass
+
+def _statement_cursor(connection, query):
+    # The physical connection outlives the pool's per-checkout wrapper
+    raw = unwrap(connection)
+    raw = getattr(raw, '_cnx', raw)
+    session = getattr(raw, 'connection_id', None)
+    with _statement_cursors_lock:
+        cached = _statement_cursors.get(raw)
+        if cached is None or cached[0] != session:
+            # New connection, or it reconnected and the server forgot its statements
+            cached = _statement_cursors[raw] = (session, {})
+    cursors = cached[1]
+    cursor = cursors.get(query)
+    if cursor is None:
+        cursor = cursors[query] = raw.cursor(prepared=True)
+    return _PreparedCursor(cursor)
+
+def prepared_cursor(connection, query):
+    """Cursor for running query, one of the fixed queries registered with prepared_statement().
     
-    # Create users table
-    users_table = """
-    CREATE TABLE IF NOT EXISTS users (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        name VARCHAR(255) NOT NULL,
-        email VARCHAR(255) NOT NULL UNIQUE,
-        password VARCHAR(255) NOT NULL,
-        phone VARCHAR(20),
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
+    On MySQL this is a server-side prepared statement, parsed once per
+    pooled connection and reused for as long as that connection lives.
+    SQLite already compiles and caches statements per connection, so
+    there it is an ordinary cursor.
     """
+    if DB_BACKEND == 'sqlite':
+        return connection.cursor()
+    return instrument_cursor(_statement_cursor(connection, query), _explain)
+
+def warm_pool():
+    """Open the connection pools and prepare the registered statements on them.
     
-    # Create admins table
-    admins_table = """
-    CREATE TABLE IF NOT EXISTS admins (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        name VARCHAR(255) NOT NULL,
-        email VARCHAR(255) NOT NULL UNIQUE,
-        password VARCHAR(255) NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
+    A pool connects all of its connections when it is created, so doing
+    this at startup keeps both the connecting and the parsing of the fixed
+    queries out of the first requests. Each statement is run once with
+    NULL parameters, which matches nothing. Returns the number of
+    connections and statements warmed.
     """
+    warmed = {"connections": 0, "statements": 0}
+    if DB_BACKEND == 'sqlite' or DB_POOL_WARM <= 0:
+        return warmed
     
-    # Create artworks table
-    artworks_table = """
-    CREATE TABLE IF NOT EXISTS artworks (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        title VARCHAR(255) NOT NULL,
-        artist VARCHAR(255) NOT NULL,
-        description TEXT,
-        price DECIMAL(10, 2) NOT NULL,
-        image_url VARCHAR(255),
-        dimensions VARCHAR(100),
-        medium VARCHAR(100),
-        year INT,
-        status ENUM('available', 'sold') NOT NULL DEFAULT 'available',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    """
+    hosts = [('primary', DB_CONFIG)] + [(replica, _replica_config(replica)) for replica in DB_REPLICAS]
+    for name, config in hosts:
+        connections = []
+        try:
+            # Held all at once so that each checkout is a different connection
+            for _ in range(min(DB_POOL_WARM, DB_POOL_SIZE)):
+                connections.append(_pooled_connection(name, config))
+            for connection in connections:
+                for query in _prepared_statements:
+                    cursor = _statement_cursor(connection, query)
+                    cursor.execute(query, (None,) * query.count('%s'))
+                    cursor.close()
+                    warmed["statements"] += 1
+                warmed["connections"] += 1
+        except Error as e:
+            print(f"Error warming connection pool {name}: {e}")
+        finally:
+            for connection in connections:
+                connection.close()
+    return warmed
+
+def _replica_config(replica):
+    host, _, port = replica.partition(':')
+    config = dict(DB_CONFIG, host=host)
+    if port:
+        config['port'] = int(port)
+    return config
+
+def _measure_replica_lag(connection):
+    """Seconds the replica is behind its primary, or None if it is not replicating"""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except Error:
+            # MySQL before 8.0.22
+            cursor.execute("SHOW SLAVE STATUS")
+        channels = cursor.fetchall()
+    finally:
+        cursor.close()
+    
+    lags = [channel.get('Seconds_Behind_Source', channel.get('Seconds_Behind_Master')) for channel in channels]
+    if not lags or None in lags:
+        return None
+    return max(lags)
+
+def _lag_acceptable(lag):
+    return lag is not None and lag <= MAX_REPLICA_LAG
+
+def get_read_connection():
+    """Return a connection for read-only queries.
     
-    # Create exhibitions table
-    exhibitions_table = """
-    CREATE TABLE IF NOT EXISTS exhibitions (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        title VARCHAR(255) NOT NULL,
-        description TEXT,
-        location VARCHAR(255) NOT NULL,
-        start_date DATE NOT NULL,
-        end_date DATE NOT NULL,
-        ticket_price DECIMAL(10, 2) NOT NULL,
-        image_url VARCHAR(255),
-        total_slots INT NOT NULL,
-        available_slots INT NOT NULL,
-        status ENUM('upcoming', 'ongoing', 'past') NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
+    Reads go to the next replica whose replication lag is within
+    MAX_REPLICA_LAG. They fall back to the primary when no replicas are
+    configured, when every replica is behind or unreachable, or when the
+    current caller has just written and must read its own writes.
     """
+    if DB_BACKEND == 'sqlite' or not DB_REPLICAS or getattr(_request, 'pinned', False):
+        return get_db_connection()
     
-    # Create artwork orders table
-    artwork_orders_table = """
-    CREATE TABLE IF NOT EXISTS artwork_orders (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        user_id INT NOT NULL,
-        artwork_id INT NOT NULL,
-        name VARCHAR(255) NOT NULL,
-        email VARCHAR(255) NOT NULL,
-        phone VARCHAR(20) NOT NULL,
-        delivery_address TEXT NOT NULL,
-        payment_method ENUM('mpesa') NOT NULL,
-        payment_status ENUM('pending', 'completed', 'failed') NOT NULL DEFAULT 'pending',
-        mpesa_transaction_id VARCHAR(50),
-        order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        total_amount DECIMAL(10, 2) NOT NULL,
-        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-        FOREIGN KEY (artwork_id) REFERENCES artworks(id) ON DELETE CASCADE
-    );
+    start = next(_replica_counter)
+    for offset in range(len(DB_REPLICAS)):
+        replica = DB_REPLICAS[(start + offset) % len(DB_REPLICAS)]
+        checked = _replica_lag.get(replica)
+        fresh = checked is not None and time.monotonic() - checked[0] < REPLICA_CHECK_INTERVAL
+        if fresh and not _lag_acceptable(checked[1]):
+            continue
+        
+        connection = None
+        try:
+            connection = _pooled_connection(replica, _replica_config(replica))
+            if fresh:
+                return instrument(connection, _explain)
+            
+            lag = _measure_replica_lag(connection)
+            _replica_lag[replica] = (time.monotonic(), lag)
+            if _lag_acceptable(lag):
+                return instrument(connection, _explain)
+            print(f"Replica {replica} is lagging ({lag}s behind), reading from primary")
+        except Error as e:
+            print(f"Error connecting to replica {replica}: {e}")
+            _replica_lag[replica] = (time.monotonic(), None)
+        
+        if connection is not None:
+            connection.close()
+    
+    return get_db_connection()
+
+def begin_request(session_key=None):
+    """Reset read routing for a new request handled on this thread.
+    
+    session_key identifies the caller (the server passes its Authorization
+    header) so that reads following one of its recent writes stay on the
+    primary even when they arrive as a separate request.
     """
+    _request.session_key = session_key
+    last_write = None
+    if session_key:
+        with _recent_writers_lock:
+            last_write = _recent_writers.get(session_key)
+    _request.pinned = last_write is not None and time.monotonic() - last_write < READ_YOUR_WRITES_WINDOW
+
+def mark_write():
+    """Record that the current request wrote to the primary.
     
-    # Create exhibition bookings table
-    exhibition_bookings_table = """
-    CREATE TABLE IF NOT EXISTS exhibition_bookings (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        user_id INT NOT NULL,
-        exhibition_id INT NOT NULL,
-        name VARCHAR(255) NOT NULL,
-        email VARCHAR(255) NOT NULL,
-        phone VARCHAR(20) NOT NULL,
-        slots INT NOT NULL,
-        payment_method ENUM('mpesa') NOT NULL,
-        payment_status ENUM('pending', 'completed', 'failed') NOT NULL DEFAULT 'pending',
-        mpesa_transaction_id VARCHAR(50),
-        booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        total_amount DECIMAL(10, 2) NOT NULL,
-        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-        FOREIGN KEY (exhibition_id) REFERENCES exhibitions(id) ON DELETE CASCADE
-    );
+    The rest of the request, and the same caller's requests for the next
+    READ_YOUR_WRITES_WINDOW seconds, read from the primary.
     """
+    _request.pinned = True
+    for listener in _write_listeners:
+        listener()
+    
+    session_key = getattr(_request, 'session_key', None)
+    if not session_key:
+        return
+    
+    now = time.monotonic()
+    with _recent_writers_lock:
+        for key, written_at in list(_recent_writers.items()):
+            if now - written_at >= READ_YOUR_WRITES_WINDOW:
+                del _recent_writers[key]
+        _recent_writers[session_key] = now
+
+def add_write_listener(listener):
+    """Call listener() whenever mark_write() records a write (e.g. to drop cached responses)"""
+    _write_listeners.append(listener)
+
+def initialize_database():
+    """Create database tables if they don't exist.
     
-    # Create contact messages table
-    contact_messages_table = """
-    CREATE TABLE IF NOT EXISTS contact_messages (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        name VARCHAR(255) NOT NULL,
-        email VARCHAR(255) NOT NULL,
-        phone VARCHAR(20),
-        message TEXT NOT NULL,
-        date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        status ENUM('new', 'read', 'replied') NOT NULL DEFAULT 'new'
-    );
+    The DDL comes from schema.py. Its fingerprint is stored in the
+    schema_fingerprint table, so once a database has been initialized from
+    the current definitions startup costs a single SELECT instead of one
+    CREATE TABLE IF NOT EXISTS round-trip per table.
     """
+    connection = get_db_connection()
+    if connection is None:
+        print("Failed to connect to database")
+        return False
+    
+    cursor = connection.cursor()
+    expected = schema.fingerprint(DB_BACKEND)
     
     try:
-        cursor.execute(users_table)
-        cursor.execute(admins_table)
-        cursor.execute(artworks_table)
-        cursor.execute(exhibitions_table)
-        cursor.execute(artwork_orders_table)
-        cursor.execute(exhibition_bookings_table)
-        cursor.execute(contact_messages_table)
+        try:
+            cursor.execute("SELECT fingerprint FROM schema_fingerprint WHERE dialect = %s", (DB_BACKEND,))
+            row = cursor.fetchone()
+        except Error:
+            # First start: the fingerprint table does not exist yet
+            row = None
+        
+        if row is not None and row[0] == expected:
+            print("Database schema is up to date")
+            return True
+        
+        for statement in schema.create_statements(DB_BACKEND):
+            cursor.execute(statement)
+        cursor.execute(
+            "REPLACE INTO schema_fingerprint (dialect, fingerprint) VALUES (%s, %s)",
+            (DB_BACKEND, expected)
+        )
         connection.commit()
         print("Database initialized successfully")
         return True
@@ -167,19 +402,70 @@ def initialize_database():
             cursor.close()
             connection.close()
 
+def ensure_column(cursor, table, column, definition):
+    """Add a column to an existing table if it is missing"""
+    if DB_BACKEND == 'sqlite':
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return
+    
+    cursor.execute("""
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    if cursor.fetchone() is None:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def redefine_column(cursor, table, column):
+    """Change an existing column to its current definition in schema.py (e.g. to widen an ENUM)"""
+    if DB_BACKEND == 'mysql':
+        cursor.execute(f"ALTER TABLE {table} MODIFY COLUMN {schema.column_definition(table, column, 'mysql')}")
+        return
+    
+    # SQLite keeps ENUM values in a CHECK constraint, which cannot be altered in
+    # place: copy the rows into a table created from the current definition
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+    if schema.column_definition(table, column, 'sqlite') in cursor.fetchone()[0]:
+        return
+    
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    columns = ', '.join(c.name for c in schema.find_table(table).columns if c.name in existing)
+    
+    create, *indexes = schema.create_table_statements(schema.find_table(table), 'sqlite')
+    cursor.execute(create.replace(f"CREATE TABLE IF NOT EXISTS {table} (", f"CREATE TABLE {table}_rebuild (", 1))
+    cursor.execute(f"INSERT INTO {table}_rebuild ({columns}) SELECT {columns} FROM {table}")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}_rebuild RENAME TO {table}")
+    for statement in indexes:
+        cursor.execute(statement)
+
+def ensure_index(cursor, table, index_name, columns):
+    """Create a secondary index on an existing table if it is missing"""
+    if DB_BACKEND == 'sqlite':
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({columns})")
+        return
+    
+    cursor.execute("""
+    SELECT 1 FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    LIMIT 1
+    """, (table, index_name))
+    if cursor.fetchone() is None:
+        cursor.execute(f"CREATE INDEX {index_name} ON {table} ({columns})")
+
+# Generic mapping used by dict_from_row: column names kept, Decimals converted to float
+_PLAIN_ROW = RowMapper(default=plain)
+
 def dict_from_row(row, cursor):
     """Convert a database row to a dictionary"""
-    result = {cursor.column_names[i]: value for i, value in enumerate(row)}
-    # Convert Decimal objects to float for JSON serialization
-    for key, value in result.items():
-        if isinstance(value, Decimal):
-            result[key] = float(value)
-    return result
-
-# Helper function to safely encode JSON with Decimal values
+    return _PLAIN_ROW.one(cursor, row)
+
+# Helper function to safely encode JSON with Decimal and date values
 def json_dumps(data):
-    """Safely convert data to JSON string, handling Decimal types"""
-    return json.dumps(data, cls=DecimalEncoder)
+    """Safely convert data to JSON string, handling Decimal and date types"""
+    return serializer.dumps(data).decode()
 
 # Contact message functions
 def save_contact_message(name, email, phone, message, source='contact_form'):
@@ -191,14 +477,6 @@ def save_contact_message(name, email, phone, message, source='contact_form'):
     try:
         cursor = connection.cursor()
         
-        # Check if contact_messages table has source column
-        cursor.execute("SHOW COLUMNS FROM contact_messages LIKE 'source'")
-        source_exists = cursor.fetchone()
-        
-        if not source_exists:
-            # Add source column if it doesn't exist
-            cursor.execute("ALTER TABLE contact_messages ADD COLUMN source VARCHAR(50) DEFAULT 'contact_form'")
-        
         # Insert the message into the database
         query = """
         INSERT INTO contact_messages (name, email, phone, message, source)
@@ -220,7 +498,7 @@ def save_contact_message(name, email, phone, message, source='contact_form'):
 
 def get_all_contact_messages():
     """Get all contact messages"""
-    connection = get_db_connection()
+    connection = get_read_connection()
     if connection is None:
         return {"error": "Database connection failed"}
     
@@ -267,6 +545,7 @@ def update_message_status(message_id, status):
         """
         cursor.execute(query, (status, message_id))
         connection.commit()
+        mark_write()
         
         if cursor.rowcount == 0:
             return {"error": "Message not found"}
@@ -1,51 +1,48 @@
 
-from database import get_db_connection, dict_from_row, json_dumps
+from database import get_db_connection, get_read_connection, mark_write, json_dumps, prepared_statement, prepared_cursor
+from rowmap import RowMapper, to_float, to_str, isoformat
 from auth import verify_token
 import json
 from decimal import Decimal
 
+# Exhibition rows as sent to the frontend (camelCase keys, id as string, ISO dates)
+EXHIBITION_ROW = RowMapper({
+    'id': ('id', to_str),
+    'start_date': ('startDate', isoformat),
+    'end_date': ('endDate', isoformat),
+    'ticket_price': ('ticketPrice', to_float),
+    'image_url': 'imageUrl',
+    'total_slots': 'totalSlots',
+    'available_slots': 'availableSlots'
+})
+
+ALL_EXHIBITIONS_QUERY = prepared_statement("""
+    SELECT id, title, description, location, start_date, end_date,
+           ticket_price, image_url, total_slots, available_slots, status
+    FROM exhibitions
+    ORDER BY start_date ASC
+""")
+
+EXHIBITION_QUERY = prepared_statement("""
+    SELECT id, title, description, location, start_date, end_date,
+           ticket_price, image_url, total_slots, available_slots, status
+    FROM exhibitions
+    WHERE id = %s
+""")
+
 def get_all_exhibitions():
     """Get all exhibitions from the database"""
-    connection = get_db_connection()
+    connection = get_read_connection()
     if connection is None:
         return {"error": "Database connection failed"}
     
-    cursor = connection.cursor()
+    cursor = prepared_cursor(connection, ALL_EXHIBITIONS_QUERY)
     
     try:
-        query = """
-        SELECT id, title, description, location, start_date, end_date,
-               ticket_price, image_url, total_slots, available_slots, status
-        FROM exhibitions
-        ORDER BY start_date ASC
-        """
-        cursor.execute(query)
+        cursor.execute(ALL_EXHIBITIONS_QUERY)
         rows = cursor.fetchall()
         
-        exhibitions = []
-        for row in rows:
-            exhibition = dict_from_row(row, cursor)
-            
-            # Convert id to string to match frontend expectations
-            exhibition['id'] = str(exhibition['id'])
-            
-            # Convert dates to string format
-            exhibition['startDate'] = exhibition.pop('start_date').isoformat()
-            exhibition['endDate'] = exhibition.pop('end_date').isoformat()
-            
-            # Convert ticket_price to camelCase
-            exhibition['ticketPrice'] = exhibition.pop('ticket_price')
-            
-            # Convert image_url to camelCase
-            exhibition['imageUrl'] = exhibition.pop('image_url')
-            
-            # Convert total_slots and available_slots to camelCase
-            exhibition['totalSlots'] = exhibition.pop('total_slots')
-            exhibition['availableSlots'] = exhibition.pop('available_slots')
-            
-            exhibitions.append(exhibition)
-        
-        return {"exhibitions": exhibitions}
+        return {"exhibitions": EXHIBITION_ROW.all(cursor, rows)}
     except Exception as e:
         print(f"Error getting exhibitions: {e}")
         return {"error": str(e)}
@@ -56,45 +53,20 @@ def get_all_exhibitions():
 
 def get_exhibition(exhibition_id):
     """Get a specific exhibition by ID"""
-    connection = get_db_connection()
+    connection = get_read_connection()
     if connection is None:
         return {"error": "Database connection failed"}
     
-    cursor = connection.cursor()
+    cursor = prepared_cursor(connection, EXHIBITION_QUERY)
     
     try:
-        query = """
-        SELECT id, title, description, location, start_date, end_date,
-               ticket_price, image_url, total_slots, available_slots, status
-        FROM exhibitions
-        WHERE id = %s
-        """
-        cursor.execute(query, (exhibition_id,))
+        cursor.execute(EXHIBITION_QUERY, (exhibition_id,))
         row = cursor.fetchone()
         
         if not row:
             return {"error": "Exhibition not found"}
         
-        exhibition = dict_from_row(row, cursor)
-        
-        # Convert id to string to match frontend expectations
-        exhibition['id'] = str(exhibition['id'])
-        
-        # Convert dates to string format
-        exhibition['startDate'] = exhibition.pop('start_date').isoformat()
-        exhibition['endDate'] = exhibition.pop('end_date').isoformat()
-        
-        # Convert ticket_price to camelCase
-        exhibition['ticketPrice'] = exhibition.pop('ticket_price')
-        
-        # Convert image_url to camelCase
-        exhibition['imageUrl'] = exhibition.pop('image_url')
-        
-        # Convert total_slots and available_slots to camelCase
-        exhibition['totalSlots'] = exhibition.pop('total_slots')
-        exhibition['availableSlots'] = exhibition.pop('available_slots')
-        
-        return exhibition
+        return EXHIBITION_ROW.one(cursor, row)
     except Exception as e:
         print(f"Error getting exhibition: {e}")
         return {"error": str(e)}
@@ -107,7 +79,6 @@ def create_exhibition(auth_header, exhibition_data):
     """Create a new exhibition (admin only)"""
     print(f"\n--- Create Exhibition Request ---")
     print(f"Auth Header: {auth_header}")
-    print(f"Exhibition Data: {exhibition_data}")
     
     if not auth_header:
         print("ERROR: Authentication header missing")
@@ -160,7 +131,6 @@ def create_exhibition(auth_header, exhibition_data):
                 print(f"ERROR: Failed to parse exhibition data: {e}")
                 return {"error": f"Invalid exhibition data format: {str(e)}"}
         
-        print(f"Inserting exhibition data: {exhibition_data}")
         query = """
         INSERT INTO exhibitions (title, description, location, start_date, end_date,
                                ticket_price, image_url, total_slots, available_slots, status)
@@ -183,6 +153,7 @@ def create_exhibition(auth_header, exhibition_data):
             exhibition_data.get("status")
         ))
         connection.commit()
+        mark_write()
         
         # Return the newly created exhibition
         new_exhibition_id = cursor.lastrowid
@@ -201,7 +172,6 @@ def update_exhibition(auth_header, exhibition_id, exhibition_data):
     # Debug input
     print(f"Update exhibition called with auth_header: {auth_header}")
     print(f"Exhibition ID: {exhibition_id}")
-    print(f"Exhibition data: {exhibition_data}")
     
     if not auth_header:
         print("Error: No authentication header provided")
@@ -271,6 +241,7 @@ def update_exhibition(auth_header, exhibition_id, exhibition_data):
             exhibition_id
         ))
         connection.commit()
+        mark_write()
         
         # Check if exhibition was found and updated
         if cursor.rowcount == 0:
@@ -333,6 +304,7 @@ def delete_exhibition(auth_header, exhibition_id):
         query = "DELETE FROM exhibitions WHERE id = %s"
         cursor.execute(query, (exhibition_id,))
         connection.commit()
+        mark_write()
         
         # Check if exhibition was found and deleted
         if cursor.rowcount == 0:
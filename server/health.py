@@ -0,0 +1,123 @@
+"""Startup and readiness state for /healthz and /readyz.
+
+The server binds its socket first and prepares the database in a
+background thread: schema check, migrations, connection pool warm-up,
+then the hold sweeper.
+Until every check has passed, /readyz answers 503 (so load balancers
+hold traffic back) and other routes are refused with 503. /healthz only
+says the process is serving. A check that fails or raises (the database
+is down at boot, a migration cannot take its lock) is retried every
+STARTUP_RETRY_INTERVAL seconds instead of failing the pod.
+"""
+import time
+import threading
+from config import CONFIG
+
+# Seconds between attempts while the database is unreachable at startup
+STARTUP_RETRY_INTERVAL = CONFIG.server.startup_retry_interval
+
+class Readiness:
+    """Named startup checks; ready once all of them have passed"""
+
+    def __init__(self, checks):
+        self._checks = {name: (False, "pending") for name in checks}
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.ready_after = None
+        self.ready = False
+        # Set once every check has passed; unlike ready, draining does not clear it
+        self.prepared = False
+        self.draining = False
+
+    def mark(self, name, ok, detail="ok"):
+        with self._lock:
+            self._checks[name] = (ok, detail)
+            ready = all(passed for passed, _ in self._checks.values())
+            if ready and not self.prepared:
+                self.ready_after = time.monotonic() - self.started
+                self.prepared = True
+            self.ready = ready and not self.draining
+
+    def drain(self):
+        """Report not ready from now on, so load balancers stop sending traffic"""
+        with self._lock:
+            self.draining = True
+            self.ready = False
+
+    def snapshot(self):
+        with self._lock:
+            checks = {name: {"ok": ok, "detail": detail} for name, (ok, detail) in self._checks.items()}
+        status = {"status": "draining" if self.draining else "ready" if self.ready else "starting", "checks": checks}
+        if self.ready_after is not None:
+            status["readyAfterSeconds"] = round(self.ready_after, 3)
+        return status
+
+STARTUP = Readiness(['database', 'schema', 'migrations', 'pool'])
+
+def _prepare_database():
+    """Run the startup checks in order until they all pass.
+    
+    A failed or crashed check is retried, from the first check, every
+    STARTUP_RETRY_INTERVAL seconds; the schema and migration steps skip
+    whatever earlier attempts already applied.
+    """
+    # Imported here so the listening socket does not wait for the migration machinery
+    from database import get_db_connection, initialize_database, warm_pool
+    from migrate import apply_migrations, verify_migrations
+    from reservations import start_hold_sweeper
+
+    def check_database():
+        connection = get_db_connection()
+        if connection is None:
+            return False, "unreachable"
+        connection.close()
+        return True, "ok"
+
+    def check_schema():
+        print("Initializing database...")
+        return initialize_database(), "initialization failed"
+
+    def check_migrations():
+        # Bring existing tables up to date before serving traffic
+        print("Applying schema migrations...")
+        if not apply_migrations():
+            return False, "migrations failed"
+        migration_status = verify_migrations()
+        if not migration_status.get("ok"):
+            # Serve anyway, as before; the mismatch is reported in /readyz
+            print(f"WARNING: Schema migrations out of sync: {migration_status}")
+            return True, f"out of sync: {migration_status}"
+        return True, "ok"
+
+    def check_pool():
+        # Connect the pools and prepare the fixed queries so the first requests don't pay for it
+        warmed = warm_pool()
+        print(f"Warmed {warmed['connections']} pooled connections, {warmed['statements']} prepared statements")
+        return True, warmed
+
+    checks = [('database', check_database), ('schema', check_schema),
+              ('migrations', check_migrations), ('pool', check_pool)]
+    while True:
+        for name, check in checks:
+            try:
+                ok, detail = check()
+            except Exception as e:
+                ok, detail = False, str(e)
+            if not ok:
+                print(f"Startup check {name} failed ({detail}), retrying in {STARTUP_RETRY_INTERVAL}s")
+                STARTUP.mark(name, False, f"{detail}, retrying")
+                break
+            STARTUP.mark(name, True, detail)
+        else:
+            break
+        time.sleep(STARTUP_RETRY_INTERVAL)
+
+    # Return slots from abandoned checkouts in the background
+    start_hold_sweeper()
+    print(f"Server ready after {STARTUP.ready_after:.2f}s")
+
+def start_background_startup():
+    """Prepare the database on a background thread; progress is reported by STARTUP"""
+    thread = threading.Thread(target=_prepare_database, name='startup', daemon=True)
+    thread.start()
+    return thread
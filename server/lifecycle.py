@@ -0,0 +1,124 @@
+"""Graceful shutdown and reload.
+
+SIGTERM (and Ctrl+C) take the server out of rotation: /readyz turns 503,
+responses carry Connection: close, and after SHUTDOWN_DELAY seconds the
+listening socket stops accepting. Requests already being handled get up
+to SHUTDOWN_TIMEOUT seconds to finish. Then queued trace spans are
+exported, the hold sweeper is stopped and the database pools are closed.
+
+SIGHUP reloads: the server drains the same way, but keeps the listening
+socket open and re-executes itself with the socket inherited through
+AFRIART_LISTEN_FD. The new process re-reads its configuration and code.
+Connections arriving in the meantime wait in the socket's backlog instead
+of being refused.
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import threading
+from config import CONFIG
+
+# Seconds in-flight requests get to finish once the server stops accepting
+SHUTDOWN_TIMEOUT = CONFIG.server.shutdown_timeout
+
+# Seconds to keep accepting after SIGTERM, so load balancers see /readyz fail first
+SHUTDOWN_DELAY = CONFIG.server.shutdown_delay
+
+# Set by a reloading parent to the file descriptor of the listening socket it handed over
+LISTEN_FD_ENV = 'AFRIART_LISTEN_FD'
+
+class InFlight:
+    """Counts the requests currently being handled"""
+
+    def __init__(self):
+        self.count = 0
+        self._idle = threading.Condition()
+
+    def begin(self):
+        with self._idle:
+            self.count += 1
+
+    def end(self):
+        with self._idle:
+            self.count -= 1
+            if self.count == 0:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout):
+        """Wait until no request is in flight; False if the timeout ran out first"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self.count == 0, timeout)
+
+IN_FLIGHT = InFlight()
+
+# 'shutdown' or 'reload' once a signal has asked the server to stop
+_stopping = None
+
+def stopping():
+    """True once the server has been asked to shut down or reload"""
+    return _stopping is not None
+
+def inherited_socket():
+    """The listening socket handed over by a reloading parent, or None"""
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    if not fd:
+        return None
+    return socket.socket(fileno=int(fd))
+
+def _request_stop(httpd, action):
+    global _stopping
+    if _stopping is not None:
+        return
+    _stopping = action
+    from health import STARTUP
+    STARTUP.drain()
+    print(f"Received {'SIGHUP, reloading' if action == 'reload' else 'shutdown signal, draining'}...")
+
+    def stop():
+        if action == 'shutdown' and SHUTDOWN_DELAY > 0:
+            time.sleep(SHUTDOWN_DELAY)
+        # serve_forever() runs on the main thread, where signal handlers run too,
+        # so it has to be stopped from another thread
+        httpd.shutdown()
+
+    threading.Thread(target=stop, name='shutdown', daemon=True).start()
+
+def install_signal_handlers(httpd):
+    """SIGTERM and SIGINT shut the server down gracefully, SIGHUP reloads it"""
+    signal.signal(signal.SIGTERM, lambda signum, frame: _request_stop(httpd, 'shutdown'))
+    signal.signal(signal.SIGINT, lambda signum, frame: _request_stop(httpd, 'shutdown'))
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda signum, frame: _request_stop(httpd, 'reload'))
+
+def _release_resources():
+    # Imported here: by now they are loaded, and a server that never got that far has nothing to release
+    from database import close_pools
+    from reservations import stop_hold_sweeper
+    from tracing import flush
+
+    stop_hold_sweeper()
+    flush()
+    close_pools()
+
+def finish(httpd):
+    """Drain in-flight requests, release resources, then exit or re-execute for a reload.
+
+    Called once serve_forever() has returned.
+    """
+    if not IN_FLIGHT.wait_idle(SHUTDOWN_TIMEOUT):
+        print(f"Shutdown timeout: {IN_FLIGHT.count} requests still in flight")
+    _release_resources()
+
+    if _stopping != 'reload':
+        httpd.server_close()
+        print("Server closed")
+        return
+
+    print("Re-executing server with the listening socket kept open")
+    sys.stdout.flush()
+    fd = httpd.socket.fileno()
+    os.set_inheritable(fd, True)
+    os.environ[LISTEN_FD_ENV] = str(fd)
+    os.execv(sys.executable, [sys.executable] + sys.argv)
@@ -3,18 +3,11 @@ import jwt
 import datetime
 from functools import wraps
 from http.server import BaseHTTPRequestHandler
-from decimal import Decimal
-import json
+import serializer
+from config import CONFIG
 
-# Secret key for JWT token generation - replace with a secure random string
-SECRET_KEY = "your_secret_key_replace_this_with_a_secure_random_string"
-
-# Custom JSON encoder to handle Decimal types
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
+# Secret key for JWT tokens, shared by every module that issues or checks them
+SECRET_KEY = CONFIG.auth.secret_key
 
 def generate_token(user_id, name, is_admin):
     """Generate a JWT token for authentication"""
@@ -110,8 +103,8 @@ def admin_required(handler_method):
     
     return wrapper
 
-# Helper function to safely encode JSON with Decimal values
+# Helper function to safely encode JSON with Decimal and date values
 def json_dumps(data):
-    """Safely convert data to JSON string, handling Decimal types"""
-    return json.dumps(data, cls=DecimalEncoder)
+    """Safely convert data to JSON string, handling Decimal and date types"""
+    return serializer.dumps(data).decode()
 
@@ -0,0 +1,143 @@
+import os
+import re
+import sys
+import hashlib
+import importlib.util
+from database import get_db_connection, Error, DB_BACKEND
+
+# Directory holding the ordered migration files (NNNN_description.py, each defining up(cursor))
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+
+# Named lock that stops two servers starting at once from applying the same migration
+MIGRATION_LOCK = 'afriart_schema_migrations'
+MIGRATION_LOCK_TIMEOUT = 60
+
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+def _create_migrations_table(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(10) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+def discover_migrations():
+    """List the migration files in version order as (version, name, path, checksum)"""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        path = os.path.join(MIGRATIONS_DIR, filename)
+        with open(path, 'rb') as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        migrations.append((match.group(1), match.group(2), path, checksum))
+    return migrations
+
+def _load_migration(version, name, path):
+    spec = importlib.util.spec_from_file_location(f"migration_{version}_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _applied_migrations(cursor):
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return {version: checksum for version, checksum in cursor.fetchall()}
+
+def apply_migrations():
+    """Apply every migration that has not run against this database yet"""
+    connection = get_db_connection()
+    if connection is None:
+        print("Failed to connect to database")
+        return False
+    
+    cursor = connection.cursor()
+    
+    try:
+        # SQLite runs on a single node, so only MySQL needs the cross-process lock
+        if DB_BACKEND == 'mysql':
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+            if cursor.fetchone()[0] != 1:
+                print("Timed out waiting for another process to finish migrating")
+                return False
+        
+        try:
+            _create_migrations_table(cursor)
+            applied = _applied_migrations(cursor)
+            
+            for version, name, path, checksum in discover_migrations():
+                if version in applied:
+                    continue
+                
+                print(f"Applying migration {version}_{name}...")
+                _load_migration(version, name, path).up(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (version, name, checksum)
+                )
+                connection.commit()
+            
+            return True
+        finally:
+            if DB_BACKEND == 'mysql':
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+                cursor.fetchone()
+    except Error as e:
+        print(f"Error applying migrations: {e}")
+        return False
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def verify_migrations():
+    """Compare the migration files with what has been applied to the database"""
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+    
+    cursor = connection.cursor()
+    
+    try:
+        _create_migrations_table(cursor)
+        applied = _applied_migrations(cursor)
+        migrations = discover_migrations()
+        known = {version for version, _, _, _ in migrations}
+        
+        pending = [f"{version}_{name}" for version, name, _, _ in migrations if version not in applied]
+        modified = [
+            f"{version}_{name}" for version, name, _, checksum in migrations
+            if version in applied and applied[version] != checksum
+        ]
+        unknown = sorted(version for version in applied if version not in known)
+        
+        return {
+            "ok": not pending and not modified and not unknown,
+            "applied": len(applied),
+            "pending": pending,
+            "modified": modified,
+            "unknown": unknown
+        }
+    except Error as e:
+        print(f"Error verifying migrations: {e}")
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "apply"
+    
+    if command == "apply":
+        sys.exit(0 if apply_migrations() else 1)
+    elif command == "verify":
+        result = verify_migrations()
+        print(result)
+        sys.exit(0 if result.get("ok") else 1)
+    else:
+        print("Usage: python migrate.py [apply|verify]")
+        sys.exit(2)
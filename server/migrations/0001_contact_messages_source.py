@@ -0,0 +1,5 @@
+from database import ensure_column
+
+def up(cursor):
+    """Track where a contact message came from (contact form or chat bot)"""
+    ensure_column(cursor, 'contact_messages', 'source', "VARCHAR(50) DEFAULT 'contact_form'")
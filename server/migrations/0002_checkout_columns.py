@@ -0,0 +1,8 @@
+from database import ensure_column, ensure_index
+
+def up(cursor):
+    """Group orders and bookings paid for by one checkout"""
+    ensure_column(cursor, 'artwork_orders', 'checkout_id', 'INT')
+    ensure_index(cursor, 'artwork_orders', 'idx_artwork_orders_checkout', 'checkout_id')
+    ensure_column(cursor, 'exhibition_bookings', 'checkout_id', 'INT')
+    ensure_index(cursor, 'exhibition_bookings', 'idx_exhibition_bookings_checkout', 'checkout_id')
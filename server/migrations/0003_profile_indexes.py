@@ -0,0 +1,7 @@
+from database import ensure_index
+
+def up(cursor):
+    """Indexes behind the profile order and booking listings"""
+    ensure_index(cursor, 'artwork_orders', 'idx_artwork_orders_user_date', 'user_id, order_date')
+    ensure_index(cursor, 'exhibition_bookings', 'idx_exhibition_bookings_user_date', 'user_id, booking_date')
+    ensure_index(cursor, 'mpesa_transactions', 'idx_mpesa_transactions_checkout', 'checkout_request_id')
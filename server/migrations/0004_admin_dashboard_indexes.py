@@ -0,0 +1,9 @@
+from database import ensure_index
+
+def up(cursor):
+    """Indexes behind the admin order and booking dashboards"""
+    ensure_index(cursor, 'artwork_orders', 'idx_artwork_orders_status_date', 'payment_status, order_date')
+    ensure_index(cursor, 'artwork_orders', 'idx_artwork_orders_date', 'order_date')
+    ensure_index(cursor, 'exhibition_bookings', 'idx_exhibition_bookings_status_date', 'payment_status, booking_date')
+    ensure_index(cursor, 'exhibition_bookings', 'idx_exhibition_bookings_date', 'booking_date')
+    ensure_index(cursor, 'mpesa_transactions', 'idx_mpesa_transactions_date', 'transaction_date')
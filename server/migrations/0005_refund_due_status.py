@@ -0,0 +1,6 @@
+from database import redefine_column
+
+def up(cursor):
+    """Let orders and bookings be flagged for a refund when a paid item could not be delivered"""
+    redefine_column(cursor, 'artwork_orders', 'payment_status')
+    redefine_column(cursor, 'exhibition_bookings', 'payment_status')
@@ -0,0 +1,10 @@
+from database import ensure_column
+
+def up(cursor):
+    """Record when each order and booking was paid, for the daily sales summary"""
+    ensure_column(cursor, 'artwork_orders', 'paid_at', 'DATETIME')
+    ensure_column(cursor, 'exhibition_bookings', 'paid_at', 'DATETIME')
+    
+    # Earlier payments were not timestamped; their order date is the closest record
+    cursor.execute("UPDATE artwork_orders SET paid_at = order_date WHERE payment_status = 'completed' AND paid_at IS NULL")
+    cursor.execute("UPDATE exhibition_bookings SET paid_at = booking_date WHERE payment_status = 'completed' AND paid_at IS NULL")
@@ -1,20 +1,53 @@
 
-import requests
+import hmac
 import base64
 import json
 from datetime import datetime
 import time
-from db_setup import get_db_connection, dict_from_row
-from mysql.connector import Error
+from urllib.parse import urlparse, quote
+from tracing import span, traced, inject, current_span
+from database import get_db_connection, dict_from_row, mark_write, Error
+from reservations import hold_slots, release_slots, hold_artwork, release_artwork, apply_payment_to_hold
+from reports import record_artwork_sale, record_booking_sale
+from config import CONFIG
+
+# Without M-Pesa no payment can be started; callbacks are refused
+ENABLED = CONFIG.mpesa.enabled
 
 # M-Pesa API credentials
-CONSUMER_KEY = "sMwMwGZ8oOiSkNrUIrPbcCeWIO8UiQ3SV4CyX739uAyZVs1F"
-CONSUMER_SECRET = "A3Hs5zRY3nDCn7XpxPuc1iAKpfy6UDdetiCalIAfuAIpgTROI5yCqqOewDfThh2o"
-BUSINESS_SHORT_CODE = "174379"  # Lipa Na M-Pesa Shortcode
-PASSKEY = "bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919"
-CALLBACK_URL = "https://webhook.site/3c1f62b5-4214-47d6-9f26-71c1f4b9c8f0"
-API_BASE_URL = "https://sandbox.safaricom.co.ke"
+CONSUMER_KEY = CONFIG.mpesa.consumer_key
+CONSUMER_SECRET = CONFIG.mpesa.consumer_secret
+BUSINESS_SHORT_CODE = CONFIG.mpesa.business_short_code  # Lipa Na M-Pesa Shortcode
+PASSKEY = CONFIG.mpesa.passkey
+
+# Shared secret Daraja echoes back in the callback URL; callbacks without it are refused
+CALLBACK_TOKEN = CONFIG.mpesa.callback_token
+CALLBACK_URL = CONFIG.mpesa.callback_url
+if CALLBACK_TOKEN:
+    CALLBACK_URL += ('&' if urlparse(CALLBACK_URL).query else '?') + f"token={quote(CALLBACK_TOKEN, safe='')}"
+API_BASE_URL = CONFIG.mpesa.api_base_url
+
+# Seconds to wait for Daraja before giving up on a call
+DARAJA_TIMEOUT = CONFIG.mpesa.timeout
+
+# Status query result codes after which the STK push can no longer be paid: insufficient
+# balance, expired, cancelled by the customer, phone unreachable, wrong PIN. Any other
+# code may still be followed by a successful callback, so the hold is kept until then
+FAILED_RESULT_CODES = ('1', '1019', '1032', '1037', '2001')
 
+def _daraja(method, url, **kwargs):
+    """Call the Daraja API in a client span, passing the trace context along"""
+    # requests (with urllib3 and certifi) is only loaded once a payment is made
+    import requests
+    
+    with span(f"{method} {urlparse(url).path}", 'client', {"http.method": method, "http.url": url}) as current:
+        kwargs['headers'] = inject(dict(kwargs.get('headers') or {}))
+        kwargs.setdefault('timeout', DARAJA_TIMEOUT)
+        response = requests.request(method, url, **kwargs)
+        current.set_attribute("http.status_code", response.status_code)
+        return response
+
+@traced()
 def get_access_token():
     """Get OAuth access token from M-Pesa"""
     url = f"{API_BASE_URL}/oauth/v1/generate?grant_type=client_credentials"
@@ -24,7 +57,7 @@ def get_access_token():
     }
     
     try:
-        response = requests.get(url, headers=headers)
+        response = _daraja('GET', url, headers=headers)
         response_data = response.json()
         
         if "access_token" in response_data:
@@ -43,8 +76,12 @@ def generate_password():
     password = base64.b64encode(password_str.encode()).decode('utf-8')
     return password, timestamp
 
+@traced()
 def initiate_stk_push(phone_number, amount, account_reference, order_type, order_id, user_id):
     """Initiate STK Push to customer's phone"""
+    if not ENABLED:
+        return {"error": "M-Pesa payments are disabled"}
+    
     access_token = get_access_token()
     if not access_token:
         return {"error": "Failed to get access token"}
@@ -78,11 +115,14 @@ def initiate_stk_push(phone_number, amount, account_reference, order_type, order
     }
     
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = _daraja('POST', url, json=payload, headers=headers)
         result = response.json()
         print(f"STK Push result: {result}")
         
         if "ResponseCode" in result and result["ResponseCode"] == "0":
+            # The callback arrives in a separate trace; this attribute ties the two together
+            current_span().set_attribute("mpesa.checkout_request_id", result["CheckoutRequestID"])
+            
             # Save transaction to database
             save_transaction_request(
                 result["CheckoutRequestID"],
@@ -108,8 +148,14 @@ def initiate_stk_push(phone_number, amount, account_reference, order_type, order
         print(f"Exception during STK Push: {e}")
         return {"error": str(e)}
 
-def check_transaction_status(checkout_request_id):
-    """Check status of an STK Push transaction"""
+@traced()
+def check_transaction_status(checkout_request_id, user_id):
+    """Check status of one of the user's STK Push transactions.
+    
+    Other users' transactions are reported as not found. A pending payment
+    is only failed, releasing its holds, when Daraja reports a definitive
+    failure; otherwise the callback or the hold sweeper settles it.
+    """
     connection = get_db_connection()
     if not connection:
         return {"error": "Database connection failed"}
@@ -120,9 +166,9 @@ def check_transaction_status(checkout_request_id):
         # Check if transaction exists in database
         query = """
         SELECT * FROM mpesa_transactions 
-        WHERE checkout_request_id = %s
+        WHERE checkout_request_id = %s AND user_id = %s
         """
-        cursor.execute(query, (checkout_request_id,))
+        cursor.execute(query, (checkout_request_id, user_id))
         row = cursor.fetchone()
         
         if not row:
@@ -152,12 +198,14 @@ def check_transaction_status(checkout_request_id):
             }
             
             try:
-                response = requests.post(url, json=payload, headers=headers)
+                response = _daraja('POST', url, json=payload, headers=headers)
                 result = response.json()
                 print(f"Transaction status query result: {result}")
                 
+                # Daraja sends ResultCode as a string here; a response without one is still processing
+                result_code = str(result.get("ResultCode"))
                 if "ResultCode" in result:
-                    if result["ResultCode"] == "0":
+                    if result_code == "0":
                         # Update transaction status to completed
                         update_transaction_status(
                             checkout_request_id,
@@ -178,7 +226,7 @@ def check_transaction_status(checkout_request_id):
                             "status": "completed",
                             "message": "Payment completed successfully"
                         }
-                    else:
+                    elif result_code in FAILED_RESULT_CODES:
                         # Update transaction status to failed
                         update_transaction_status(
                             checkout_request_id,
@@ -187,16 +235,24 @@ def check_transaction_status(checkout_request_id):
                             result.get("ResultDesc")
                         )
                         
+                        # Release anything held for the order
+                        update_order_status(
+                            transaction["order_type"],
+                            transaction["order_id"],
+                            "failed"
+                        )
+                        
                         return {
                             "success": False,
                             "status": "failed",
                             "message": result.get("ResultDesc", "Payment failed")
                         }
-                else:
-                    return {
-                        "status": "pending",
-                        "message": "Payment is being processed"
-                    }
+                
+                # Still being processed, or a result the callback will settle
+                return {
+                    "status": "pending",
+                    "message": "Payment is being processed"
+                }
             except Exception as e:
                 print(f"Exception during status check: {e}")
                 return {"error": str(e)}
@@ -215,6 +271,7 @@ def check_transaction_status(checkout_request_id):
             cursor.close()
             connection.close()
 
+@traced()
 def save_transaction_request(checkout_request_id, merchant_request_id, order_type, order_id, user_id, amount, phone_number):
     """Save M-Pesa transaction request to database"""
     connection = get_db_connection()
@@ -248,6 +305,7 @@ def save_transaction_request(checkout_request_id, merchant_request_id, order_typ
             cursor.close()
             connection.close()
 
+@traced()
 def update_transaction_status(checkout_request_id, status, result_code=None, result_desc=None):
     """Update M-Pesa transaction status in database"""
     connection = get_db_connection()
@@ -273,6 +331,42 @@ def update_transaction_status(checkout_request_id, status, result_code=None, res
             cursor.close()
             connection.close()
 
+def _apply_order_status(cursor, order_type, order_id, payment_status):
+    """Apply a payment outcome to a single artwork order or exhibition booking.
+    
+    The status never moves away from 'completed' or 'refund_due', so a
+    repeated callback or a status query racing the callback is a no-op and
+    the summaries are counted exactly once. 'failed' can still become
+    'completed' on purpose: a status query that gives up before the
+    customer enters their PIN reports a failure, and the money that then
+    arrives must still be matched to the order.
+    
+    A completed payment whose item was lost in the meantime (the hold lapsed
+    and the artwork or the last slots went to someone else) leaves the order
+    in 'refund_due' for an admin to refund.
+    """
+    table = "artwork_orders" if order_type == "artwork" else "exhibition_bookings"
+    query = f"""
+    UPDATE {table}
+    SET payment_status = %s, paid_at = %s
+    WHERE id = %s AND payment_status NOT IN (%s, 'completed', 'refund_due')
+    """
+    paid_at = datetime.now() if payment_status == "completed" else None
+    cursor.execute(query, (payment_status, paid_at, order_id, payment_status))
+    if cursor.rowcount == 0:
+        return
+    
+    if not apply_payment_to_hold(cursor, order_type, order_id, payment_status):
+        cursor.execute(f"UPDATE {table} SET payment_status = 'refund_due' WHERE id = %s", (order_id,))
+        print(f"WARNING: {order_type} order {order_id} was paid but can no longer be fulfilled; flagged for refund")
+        return
+    
+    if order_type == "artwork" and payment_status == "completed":
+        record_artwork_sale(cursor, order_id)
+    elif order_type == "exhibition" and payment_status == "completed":
+        record_booking_sale(cursor, order_id)
+
+@traced()
 def update_order_status(order_type, order_id, payment_status):
     """Update order payment status in database"""
     connection = get_db_connection()
@@ -282,48 +376,37 @@ def update_order_status(order_type, order_id, payment_status):
     cursor = connection.cursor()
     
     try:
-        if order_type == "artwork":
-            query = """
-            UPDATE artwork_orders
-            SET payment_status = %s
-            WHERE id = %s
-            """
-        elif order_type == "exhibition":
-            query = """
-            UPDATE exhibition_bookings
-            SET payment_status = %s
-            WHERE id = %s
-            """
+        if order_type in ("artwork", "exhibition"):
+            _apply_order_status(cursor, order_type, order_id, payment_status)
+        elif order_type == "checkout":
+            # A checkout pays for several orders and bookings at once
+            cursor.execute(
+                "UPDATE checkouts SET payment_status = %s WHERE id = %s AND payment_status <> 'completed'",
+                (payment_status, order_id)
+            )
+            cursor.execute(
+                "SELECT id FROM artwork_orders WHERE checkout_id = %s ORDER BY artwork_id",
+                (order_id,)
+            )
+            artwork_order_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "SELECT id FROM exhibition_bookings WHERE checkout_id = %s ORDER BY exhibition_id",
+                (order_id,)
+            )
+            booking_ids = [row[0] for row in cursor.fetchall()]
+            
+            for artwork_order_id in artwork_order_ids:
+                _apply_order_status(cursor, "artwork", artwork_order_id, payment_status)
+            for booking_id in booking_ids:
+                _apply_order_status(cursor, "exhibition", booking_id, payment_status)
         else:
             return False
         
-        cursor.execute(query, (payment_status, order_id))
         connection.commit()
-        
-        # If it's an artwork order and payment is completed, update artwork status
-        if order_type == "artwork" and payment_status == "completed":
-            query = """
-            UPDATE artworks a
-            JOIN artwork_orders o ON a.id = o.artwork_id
-            SET a.status = 'sold'
-            WHERE o.id = %s
-            """
-            cursor.execute(query, (order_id,))
-            connection.commit()
-        
-        # If it's an exhibition booking and payment is completed, update available slots
-        if order_type == "exhibition" and payment_status == "completed":
-            query = """
-            UPDATE exhibitions e
-            JOIN exhibition_bookings b ON e.id = b.exhibition_id
-            SET e.available_slots = e.available_slots - b.slots
-            WHERE b.id = %s
-            """
-            cursor.execute(query, (order_id,))
-            connection.commit()
-        
+        mark_write()
         return True
     except Error as e:
+        connection.rollback()
         print(f"Error updating order: {e}")
         return False
     finally:
@@ -331,6 +414,13 @@ def update_order_status(order_type, order_id, payment_status):
             cursor.close()
             connection.close()
 
+def verify_callback_token(token):
+    """True if token is the configured callback secret; always False while M-Pesa is disabled"""
+    if not ENABLED or not CALLBACK_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), CALLBACK_TOKEN.encode())
+
+@traced()
 def handle_mpesa_callback(callback_data):
     """Handle M-Pesa callback data"""
     try:
@@ -340,8 +430,10 @@ def handle_mpesa_callback(callback_data):
         
         if not checkout_request_id:
             return {"error": "Missing CheckoutRequestID"}
+        current_span().set_attribute("mpesa.checkout_request_id", checkout_request_id)
         
-        if result_code == "0":
+        # Daraja sends ResultCode as a number in callbacks and as a string in queries
+        if str(result_code) == "0":
             # Payment successful
             status = "completed"
         else:
@@ -383,20 +475,73 @@ def handle_mpesa_callback(callback_data):
         print(f"Error handling M-Pesa callback: {e}")
         return {"error": str(e)}
 
-def handle_stk_push_request(request_data):
-    """Handle STK Push request from frontend"""
+def _payable_order(order_type, order_id, user_id):
+    """The amount due on one of the user's unpaid orders or bookings, or an error"""
+    connection = get_db_connection()
+    if not connection:
+        return {"error": "Database connection failed"}
+    
+    cursor = connection.cursor()
+    table = "artwork_orders" if order_type == "artwork" else "exhibition_bookings"
+    
+    try:
+        cursor.execute(f"SELECT user_id, total_amount, payment_status FROM {table} WHERE id = %s", (order_id,))
+        row = cursor.fetchone()
+        
+        # Someone else's order is reported as missing rather than confirmed to exist
+        if not row or str(row[0]) != str(user_id):
+            return {"error": "Order not found"}
+        if row[2] in ("completed", "refund_due"):
+            return {"error": "Order already paid"}
+        
+        return {"amount": row[1]}
+    except Error as e:
+        print(f"Error looking up order: {e}")
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def handle_stk_push_request(user_id, request_data):
+    """Request payment for one of the user's pending orders or bookings.
+    
+    The amount charged is the order's total from the database, never the
+    amount sent by the client, and the item is held for the buyer before
+    the STK push goes out.
+    """
     try:
         phone_number = request_data.get("phoneNumber")
-        amount = request_data.get("amount")
         order_type = request_data.get("orderType")
         order_id = request_data.get("orderId")
-        user_id = request_data.get("userId")
         account_reference = request_data.get("accountReference")
         
-        if not all([phone_number, amount, order_type, order_id, user_id, account_reference]):
+        if not all([phone_number, order_type, order_id, account_reference]):
             return {"error": "Missing required fields"}
+        if order_type not in ("artwork", "exhibition"):
+            return {"error": "Order type must be 'artwork' or 'exhibition'"}
+        
+        order = _payable_order(order_type, order_id, user_id)
+        if "error" in order:
+            return order
+        
+        # Reserve the item so it cannot be sold to someone else while the customer enters their PIN
+        if order_type == "exhibition":
+            hold = hold_slots(order_id)
+        else:
+            hold = hold_artwork(order_id)
+        if "error" in hold:
+            return hold
+        
+        result = initiate_stk_push(phone_number, order["amount"], account_reference, order_type, order_id, user_id)
+        
+        if "error" in result:
+            if order_type == "exhibition":
+                release_slots(order_id)
+            else:
+                release_artwork(order_id)
         
-        return initiate_stk_push(phone_number, amount, account_reference, order_type, order_id, user_id)
+        return result
     except Exception as e:
         print(f"Error handling STK Push request: {e}")
         return {"error": str(e)}
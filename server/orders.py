@@ -0,0 +1,497 @@
+from database import get_db_connection, mark_write, Error
+from datetime import datetime, timedelta
+from reservations import take_artwork_hold, take_slot_hold, ARTWORK_HOLD_TTL, SLOT_HOLD_TTL
+from mpesa import initiate_stk_push, update_order_status
+
+# Page size limits for order and booking listings
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def _parse_cart(items):
+    """Split cart items into artwork ids and slots requested per exhibition"""
+    artwork_ids = []
+    exhibition_slots = {}
+    
+    for item in items:
+        item_type = item.get('type')
+        try:
+            item_id = int(item.get('id'))
+        except (TypeError, ValueError):
+            return None, None, f"Invalid item id: {item.get('id')}"
+        
+        if item_type == 'artwork':
+            if item_id not in artwork_ids:
+                artwork_ids.append(item_id)
+        elif item_type == 'exhibition':
+            try:
+                slots = int(item.get('slots', 1))
+            except (TypeError, ValueError):
+                return None, None, f"Invalid slots for exhibition {item_id}"
+            if slots < 1:
+                return None, None, f"Invalid slots for exhibition {item_id}"
+            exhibition_slots[item_id] = exhibition_slots.get(item_id, 0) + slots
+        else:
+            return None, None, f"Invalid item type: {item_type}"
+    
+    return artwork_ids, exhibition_slots, None
+
+def _link_transaction(checkout_id, checkout_request_id):
+    """Record the STK push that pays for a checkout on each of its orders and bookings"""
+    connection = get_db_connection()
+    if connection is None:
+        return False
+    
+    cursor = connection.cursor()
+    
+    try:
+        cursor.execute(
+            "UPDATE artwork_orders SET mpesa_transaction_id = %s WHERE checkout_id = %s",
+            (checkout_request_id, checkout_id)
+        )
+        cursor.execute(
+            "UPDATE exhibition_bookings SET mpesa_transaction_id = %s WHERE checkout_id = %s",
+            (checkout_request_id, checkout_id)
+        )
+        connection.commit()
+        return True
+    except Error as e:
+        print(f"Error linking transaction to checkout: {e}")
+        return False
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def create_checkout(user_id, checkout_data):
+    """Create the orders and bookings of a cart and request one M-Pesa payment for all of them.
+    
+    Every row is written in a single transaction: the artwork orders and the
+    exhibition bookings are each inserted with one executemany, and the
+    items are held for the buyer before commit. If any item is unavailable
+    nothing is written. The STK push is only sent after the commit so no
+    database transaction stays open across the call to Daraja.
+    """
+    items = checkout_data.get('items') or []
+    if not items:
+        return {"error": "Cart is empty"}
+    
+    name = checkout_data.get('name')
+    email = checkout_data.get('email')
+    phone = checkout_data.get('phone')
+    delivery_address = checkout_data.get('deliveryAddress', '')
+    
+    if not name or not email or not phone:
+        return {"error": "Name, email and phone are required"}
+    
+    artwork_ids, exhibition_slots, error = _parse_cart(items)
+    if error:
+        return {"error": error}
+    
+    if artwork_ids and not delivery_address:
+        return {"error": "Delivery address is required for artwork orders"}
+    
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+    
+    cursor = connection.cursor()
+    now = datetime.now()
+    
+    try:
+        # Price every item from the database in one query per table
+        artworks = {}
+        if artwork_ids:
+            placeholders = ', '.join(['%s'] * len(artwork_ids))
+            cursor.execute(
+                f"SELECT id, price, status FROM artworks WHERE id IN ({placeholders})",
+                artwork_ids
+            )
+            artworks = {row[0]: row for row in cursor.fetchall()}
+        
+        exhibitions = {}
+        if exhibition_slots:
+            placeholders = ', '.join(['%s'] * len(exhibition_slots))
+            cursor.execute(
+                f"SELECT id, ticket_price, status FROM exhibitions WHERE id IN ({placeholders})",
+                list(exhibition_slots)
+            )
+            exhibitions = {row[0]: row for row in cursor.fetchall()}
+        
+        for artwork_id in artwork_ids:
+            if artwork_id not in artworks:
+                return {"error": f"Artwork {artwork_id} not found"}
+            if artworks[artwork_id][2] != 'available':
+                return {"error": f"Artwork {artwork_id} is no longer available"}
+        
+        for exhibition_id in exhibition_slots:
+            if exhibition_id not in exhibitions:
+                return {"error": f"Exhibition {exhibition_id} not found"}
+            if exhibitions[exhibition_id][2] == 'past':
+                return {"error": f"Exhibition {exhibition_id} has already ended"}
+        
+        order_rows = [
+            (user_id, artwork_id, name, email, phone, delivery_address, 'mpesa', artworks[artwork_id][1])
+            for artwork_id in artwork_ids
+        ]
+        booking_rows = [
+            (user_id, exhibition_id, name, email, phone, slots, 'mpesa',
+             exhibitions[exhibition_id][1] * slots)
+            for exhibition_id, slots in exhibition_slots.items()
+        ]
+        total_amount = sum(row[7] for row in order_rows) + sum(row[7] for row in booking_rows)
+        
+        cursor.execute(
+            "INSERT INTO checkouts (user_id, total_amount) VALUES (%s, %s)",
+            (user_id, total_amount)
+        )
+        checkout_id = cursor.lastrowid
+        
+        if order_rows:
+            cursor.executemany(
+                """
+                INSERT INTO artwork_orders (user_id, artwork_id, name, email, phone,
+                                            delivery_address, payment_method, total_amount, checkout_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                [row + (checkout_id,) for row in order_rows]
+            )
+        
+        if booking_rows:
+            cursor.executemany(
+                """
+                INSERT INTO exhibition_bookings (user_id, exhibition_id, name, email, phone,
+                                                 slots, payment_method, total_amount, checkout_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                [row + (checkout_id,) for row in booking_rows]
+            )
+        
+        # Read back the generated ids, ordered by item so holds always lock rows in the same order
+        cursor.execute(
+            "SELECT id, artwork_id FROM artwork_orders WHERE checkout_id = %s ORDER BY artwork_id",
+            (checkout_id,)
+        )
+        orders = cursor.fetchall()
+        cursor.execute(
+            "SELECT id, exhibition_id, slots FROM exhibition_bookings WHERE checkout_id = %s ORDER BY exhibition_id",
+            (checkout_id,)
+        )
+        bookings = cursor.fetchall()
+        
+        artwork_expires_at = now + timedelta(seconds=ARTWORK_HOLD_TTL)
+        for order_id, artwork_id in orders:
+            error = take_artwork_hold(cursor, order_id, artwork_id, now, artwork_expires_at)
+            if error:
+                connection.rollback()
+                return {"error": error, "artworkId": str(artwork_id)}
+        
+        slots_expires_at = now + timedelta(seconds=SLOT_HOLD_TTL)
+        for booking_id, exhibition_id, slots in bookings:
+            error = take_slot_hold(cursor, booking_id, exhibition_id, slots, slots_expires_at)
+            if error:
+                connection.rollback()
+                return {"error": error, "exhibitionId": str(exhibition_id)}
+        
+        connection.commit()
+        mark_write()
+    except Error as e:
+        connection.rollback()
+        print(f"Error creating checkout: {e}")
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+    
+    # One STK push for the whole cart
+    result = initiate_stk_push(
+        phone,
+        total_amount,
+        f"Checkout {checkout_id}",
+        "checkout",
+        checkout_id,
+        user_id
+    )
+    
+    if "error" in result:
+        # Fail the orders so their holds are released straight away
+        update_order_status("checkout", checkout_id, "failed")
+        result["checkoutId"] = str(checkout_id)
+        return result
+    
+    _link_transaction(checkout_id, result["checkoutRequestId"])
+    
+    return {
+        "success": True,
+        "checkoutId": str(checkout_id),
+        "orderIds": [str(order_id) for order_id, _ in orders],
+        "bookingIds": [str(booking_id) for booking_id, _, _ in bookings],
+        "totalAmount": float(total_amount),
+        "checkoutRequestId": result["checkoutRequestId"],
+        "merchantRequestId": result["merchantRequestId"]
+    }
+
+def create_artwork_order(user_id, order_data):
+    """Order a single artwork"""
+    checkout_data = dict(order_data)
+    checkout_data['items'] = [{'type': 'artwork', 'id': order_data.get('artworkId')}]
+    return create_checkout(user_id, checkout_data)
+
+def create_exhibition_booking(user_id, booking_data):
+    """Book tickets for a single exhibition"""
+    checkout_data = dict(booking_data)
+    checkout_data['items'] = [{
+        'type': 'exhibition',
+        'id': booking_data.get('exhibitionId'),
+        'slots': booking_data.get('slots', 1)
+    }]
+    return create_checkout(user_id, checkout_data)
+
+def _page_bounds(page, page_size):
+    """Clamp pagination parameters and return (page, page_size, offset)"""
+    try:
+        page = max(int(page), 1)
+    except (TypeError, ValueError):
+        page = 1
+    try:
+        page_size = min(max(int(page_size), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        page_size = DEFAULT_PAGE_SIZE
+    return page, page_size, (page - 1) * page_size
+
+def get_user_orders(user_id, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """Get one page of a user's artwork orders with artwork and payment details.
+
+    A single joined query served by idx_artwork_orders_user_date replaces a
+    lookup per order. One extra row is fetched to tell whether another page
+    exists without a COUNT(*) over the user's history.
+    """
+    page, page_size, offset = _page_bounds(page, page_size)
+    
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+    
+    cursor = connection.cursor()
+    
+    try:
+        query = """
+        SELECT o.id, o.artwork_id, a.title, a.artist, a.image_url, o.total_amount,
+               o.delivery_address, o.payment_status, o.order_date, o.checkout_id,
+               o.mpesa_transaction_id, t.status, t.result_desc
+        FROM artwork_orders o
+        JOIN artworks a ON a.id = o.artwork_id
+        LEFT JOIN mpesa_transactions t ON t.checkout_request_id = o.mpesa_transaction_id
+        WHERE o.user_id = %s
+        ORDER BY o.order_date DESC, o.id DESC
+        LIMIT %s OFFSET %s
+        """
+        cursor.execute(query, (user_id, page_size + 1, offset))
+        rows = cursor.fetchall()
+        
+        orders = []
+        for row in rows[:page_size]:
+            orders.append({
+                "id": str(row[0]),
+                "artworkId": str(row[1]),
+                "artworkTitle": row[2],
+                "artist": row[3],
+                "imageUrl": row[4],
+                "totalAmount": float(row[5]),
+                "deliveryAddress": row[6],
+                "paymentStatus": row[7],
+                "orderDate": row[8].isoformat() if row[8] else None,
+                "checkoutId": str(row[9]) if row[9] else None,
+                "checkoutRequestId": row[10],
+                "transactionStatus": row[11],
+                "transactionMessage": row[12]
+            })
+        
+        return {
+            "orders": orders,
+            "page": page,
+            "pageSize": page_size,
+            "hasMore": len(rows) > page_size
+        }
+    except Error as e:
+        print(f"Error getting user orders: {e}")
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_user_bookings(user_id, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """Get one page of a user's exhibition bookings with exhibition and payment details"""
+    page, page_size, offset = _page_bounds(page, page_size)
+    
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+    
+    cursor = connection.cursor()
+    
+    try:
+        query = """
+        SELECT b.id, b.exhibition_id, e.title, e.location, e.start_date, e.end_date,
+               e.image_url, b.slots, b.total_amount, b.payment_status, b.booking_date,
+               b.checkout_id, b.mpesa_transaction_id, t.status, t.result_desc
+        FROM exhibition_bookings b
+        JOIN exhibitions e ON e.id = b.exhibition_id
+        LEFT JOIN mpesa_transactions t ON t.checkout_request_id = b.mpesa_transaction_id
+        WHERE b.user_id = %s
+        ORDER BY b.booking_date DESC, b.id DESC
+        LIMIT %s OFFSET %s
+        """
+        cursor.execute(query, (user_id, page_size + 1, offset))
+        rows = cursor.fetchall()
+        
+        bookings = []
+        for row in rows[:page_size]:
+            bookings.append({
+                "id": str(row[0]),
+                "exhibitionId": str(row[1]),
+                "exhibitionTitle": row[2],
+                "location": row[3],
+                "startDate": row[4].isoformat() if row[4] else None,
+                "endDate": row[5].isoformat() if row[5] else None,
+                "imageUrl": row[6],
+                "slots": row[7],
+                "totalAmount": float(row[8]),
+                "paymentStatus": row[9],
+                "bookingDate": row[10].isoformat() if row[10] else None,
+                "checkoutId": str(row[11]) if row[11] else None,
+                "checkoutRequestId": row[12],
+                "transactionStatus": row[13],
+                "transactionMessage": row[14]
+            })
+        
+        return {
+            "bookings": bookings,
+            "page": page,
+            "pageSize": page_size,
+            "hasMore": len(rows) > page_size
+        }
+    except Error as e:
+        print(f"Error getting user bookings: {e}")
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_all_orders(page=1, page_size=DEFAULT_PAGE_SIZE, payment_status=None):
+    """Get one page of all artwork orders for the admin dashboard, newest first"""
+    page, page_size, offset = _page_bounds(page, page_size)
+    
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+    
+    cursor = connection.cursor()
+    
+    try:
+        # Filtered pages are served by idx_artwork_orders_status_date, unfiltered ones by idx_artwork_orders_date
+        where = "WHERE o.payment_status = %s" if payment_status else ""
+        params = (payment_status,) if payment_status else ()
+        query = f"""
+        SELECT o.id, o.user_id, o.name, o.email, o.phone, o.artwork_id, a.title,
+               o.total_amount, o.payment_status, o.order_date, o.checkout_id,
+               o.mpesa_transaction_id
+        FROM artwork_orders o
+        JOIN artworks a ON a.id = o.artwork_id
+        {where}
+        ORDER BY o.order_date DESC, o.id DESC
+        LIMIT %s OFFSET %s
+        """
+        cursor.execute(query, params + (page_size + 1, offset))
+        rows = cursor.fetchall()
+        
+        orders = []
+        for row in rows[:page_size]:
+            orders.append({
+                "id": str(row[0]),
+                "userId": str(row[1]),
+                "customer": row[2],
+                "email": row[3],
+                "phone": row[4],
+                "artworkId": str(row[5]),
+                "artwork": row[6],
+                "amount": float(row[7]),
+                "status": row[8],
+                "date": row[9].isoformat() if row[9] else None,
+                "checkoutId": str(row[10]) if row[10] else None,
+                "checkoutRequestId": row[11]
+            })
+        
+        return {
+            "orders": orders,
+            "page": page,
+            "pageSize": page_size,
+            "hasMore": len(rows) > page_size
+        }
+    except Error as e:
+        print(f"Error getting orders: {e}")
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_all_bookings(page=1, page_size=DEFAULT_PAGE_SIZE, payment_status=None):
+    """Get one page of all exhibition bookings for the admin dashboard, newest first"""
+    page, page_size, offset = _page_bounds(page, page_size)
+    
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+    
+    cursor = connection.cursor()
+    
+    try:
+        where = "WHERE b.payment_status = %s" if payment_status else ""
+        params = (payment_status,) if payment_status else ()
+        query = f"""
+        SELECT b.id, b.user_id, b.name, b.email, b.phone, b.exhibition_id, e.title,
+               b.slots, b.total_amount, b.payment_status, b.booking_date, b.checkout_id,
+               b.mpesa_transaction_id
+        FROM exhibition_bookings b
+        JOIN exhibitions e ON e.id = b.exhibition_id
+        {where}
+        ORDER BY b.booking_date DESC, b.id DESC
+        LIMIT %s OFFSET %s
+        """
+        cursor.execute(query, params + (page_size + 1, offset))
+        rows = cursor.fetchall()
+        
+        bookings = []
+        for row in rows[:page_size]:
+            bookings.append({
+                "id": str(row[0]),
+                "userId": str(row[1]),
+                "customer": row[2],
+                "email": row[3],
+                "phone": row[4],
+                "exhibitionId": str(row[5]),
+                "exhibition": row[6],
+                "slots": row[7],
+                "amount": float(row[8]),
+                "status": row[9],
+                "date": row[10].isoformat() if row[10] else None,
+                "checkoutId": str(row[11]) if row[11] else None,
+                "checkoutRequestId": row[12]
+            })
+        
+        return {
+            "bookings": bookings,
+            "page": page,
+            "pageSize": page_size,
+            "hasMore": len(rows) > page_size
+        }
+    except Error as e:
+        print(f"Error getting bookings: {e}")
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
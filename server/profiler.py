@@ -0,0 +1,152 @@
+"""Live profiling for the admin API.
+
+sample_stacks() samples the Python stack of every thread at a fixed
+interval for a few seconds and returns the counts in collapsed-stack
+format ("frame;frame;frame count" per line), which flamegraph.pl,
+speedscope and similar tools read directly. Nothing is installed while
+no sampling session is running, so profiling costs nothing when off.
+
+For a single slow request, an admin can send an X-Profile header: that
+request runs under cProfile and the response carries an X-Profile-Id for
+fetching the report from REQUEST_PROFILES.
+"""
+import os
+import sys
+import time
+import uuid
+import marshal
+import pstats
+import cProfile
+import threading
+from io import StringIO
+from collections import Counter, OrderedDict
+from config import CONFIG
+
+# Longest sampling session one request may ask for (seconds)
+MAX_SAMPLE_SECONDS = CONFIG.profiler.max_sample_seconds
+MIN_SAMPLE_INTERVAL = 0.001
+
+# Per-request profiles kept for retrieval, oldest dropped first
+REQUEST_PROFILES_KEPT = 20
+
+# Orderings accepted for request profile reports
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls', 'filename')
+
+# Leaf frames of threads that are waiting rather than working
+IDLE_FRAMES = {
+    ('socket.py', 'readinto'),
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('socketserver.py', 'serve_forever'),
+}
+
+# Only one sampling session at a time; overlapping ones would just sample each other
+_sampling = threading.Lock()
+
+def _frame_label(frame):
+    # Module names rather than file names: the stdlib's http/server.py is not our server.py
+    module = frame.f_globals.get('__name__')
+    if not module or module == '__main__':
+        module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+    return f"{frame.f_code.co_name} ({module}:{frame.f_lineno})"
+
+def _collapse(frame):
+    """Root-first frame labels of a stack, and whether the thread is idle"""
+    labels = []
+    leaf = frame
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels, (os.path.basename(leaf.f_code.co_filename), leaf.f_code.co_name) in IDLE_FRAMES
+
+def sample_stacks(seconds, interval=0.01, include_idle=False):
+    """Sample every thread's stack for the given number of seconds.
+
+    Returns {"samples": n, "stacks": Counter of collapsed stacks}, or an
+    error dict if the arguments are invalid or another session is running.
+    """
+    try:
+        seconds = float(seconds)
+        interval = float(interval)
+    except (TypeError, ValueError):
+        return {"error": "seconds and interval must be numbers"}
+    if not 0 < seconds <= MAX_SAMPLE_SECONDS:
+        return {"error": f"seconds must be between 0 and {MAX_SAMPLE_SECONDS}"}
+    interval = max(interval, MIN_SAMPLE_INTERVAL)
+
+    if not _sampling.acquire(blocking=False):
+        return {"error": "A profiling session is already running"}
+
+    own_thread = threading.get_ident()
+    stacks = Counter()
+    samples = 0
+    try:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                labels, idle = _collapse(frame)
+                if include_idle or not idle:
+                    stacks[';'.join(labels)] += 1
+            samples += 1
+            time.sleep(interval)
+    finally:
+        _sampling.release()
+
+    return {"samples": samples, "stacks": stacks}
+
+def collapsed(stacks):
+    """Collapsed-stack text, hottest stacks first"""
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+class RequestProfiles:
+    """cProfile runs of individual requests, kept for later retrieval"""
+
+    def __init__(self, size):
+        self.size = size
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start profiling the calling thread; returns (profile_id, profile) or (None, None)"""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Python 3.12+ allows only one active profiler per process
+            print(f"Request profiling unavailable: {e}")
+            return None, None
+        return uuid.uuid4().hex[:16], profile
+
+    def finish(self, profile_id, profile, label):
+        profile.disable()
+        with self._lock:
+            self._profiles[profile_id] = (label, profile)
+            while len(self._profiles) > self.size:
+                self._profiles.popitem(last=False)
+
+    def report(self, profile_id, sort='cumulative', limit=40):
+        """pstats text report of a finished profile, or None if unknown"""
+        entry = self._profiles.get(profile_id)
+        if entry is None:
+            return None
+        label, profile = entry
+        if sort not in SORT_KEYS:
+            sort = 'cumulative'
+        output = StringIO()
+        output.write(f"{label}\n\n")
+        pstats.Stats(profile, stream=output).sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def raw(self, profile_id):
+        """The profile in pstats' binary format (for snakeviz and pstats.Stats), or None"""
+        entry = self._profiles.get(profile_id)
+        if entry is None:
+            return None
+        profile = entry[1]
+        profile.create_stats()
+        return marshal.dumps(profile.stats)
+
+REQUEST_PROFILES = RequestProfiles(REQUEST_PROFILES_KEPT)
@@ -0,0 +1,248 @@
+"""Query timing for the data layer.
+
+database.py hands out connections whose cursors time every execute and
+fetch. Each statement is tagged with the function that ran it and its
+normalized SQL (literals and parameters replaced by ?), and the totals
+are kept in QUERY_STATS for the admin metrics endpoint. Statements slower
+than AFRIART_SLOW_QUERY_MS are printed together with their EXPLAIN plan.
+Set AFRIART_QUERY_STATS=0 to hand out plain connections instead.
+"""
+import re
+import sys
+import time
+import threading
+from functools import lru_cache
+from tracing import start_span, is_recording
+from config import CONFIG
+
+QUERY_STATS_ENABLED = CONFIG.database.query_stats
+
+# Statements taking longer than this are logged with their query plan (milliseconds)
+SLOW_QUERY_MS = CONFIG.database.slow_query_ms
+
+# A slow statement's plan is logged at most once per this many seconds
+EXPLAIN_INTERVAL = 60
+
+# Statements EXPLAIN can describe on both MySQL and SQLite
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE')
+
+_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\b\d+(?:\.\d+)?\b|%s|\?")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+`?(\w+)", re.IGNORECASE)
+
+@lru_cache(maxsize=2048)
+def normalize(sql):
+    """SQL with whitespace collapsed and literals and placeholders replaced by ?"""
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = _LITERAL.sub('?', sql)
+    # IN lists and multi-row VALUES of any length count as one statement
+    return _VALUE_LIST.sub('(?, ...)', sql)
+
+def _span_name(sql):
+    # OpenTelemetry style "<operation> <table>"
+    operation = sql.lstrip('( ').split(' ', 1)[0].upper()
+    table = _TABLE.search(sql)
+    return f"{operation} {table.group(1)}" if table else operation
+
+def _caller(depth):
+    frame = sys._getframe(depth + 1)
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+class QueryStats:
+    """Counts and durations per (calling function, normalized statement)"""
+
+    def __init__(self):
+        self._statements = {}
+        self._lock = threading.Lock()
+        self.slow_queries = 0
+
+    def record(self, function, sql, execute_time=0.0, fetch_time=0.0, rows=0, executed=True):
+        key = (function, sql)
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                # [executions, execute seconds, fetch seconds, slowest execution, rows fetched]
+                entry = self._statements[key] = [0, 0.0, 0.0, 0.0, 0]
+            if executed:
+                entry[0] += 1
+                entry[3] = max(entry[3], execute_time)
+            entry[1] += execute_time
+            entry[2] += fetch_time
+            entry[4] += rows
+
+    def snapshot(self, limit=50):
+        """Statements by total time, and totals per calling function"""
+        with self._lock:
+            statements = [(key, list(entry)) for key, entry in self._statements.items()]
+            slow_queries = self.slow_queries
+
+        functions = {}
+        for (function, _), (count, execute_time, fetch_time, _, _) in statements:
+            totals = functions.setdefault(function, {"queries": 0, "totalMs": 0.0})
+            totals["queries"] += count
+            totals["totalMs"] += (execute_time + fetch_time) * 1000
+
+        statements.sort(key=lambda item: item[1][1] + item[1][2], reverse=True)
+        return {
+            "slowQueryThresholdMs": SLOW_QUERY_MS,
+            "slowQueries": slow_queries,
+            "statements": [
+                {
+                    "function": function,
+                    "sql": sql,
+                    "count": count,
+                    "totalMs": round((execute_time + fetch_time) * 1000, 3),
+                    "executeMs": round(execute_time * 1000, 3),
+                    "fetchMs": round(fetch_time * 1000, 3),
+                    "avgMs": round((execute_time + fetch_time) * 1000 / count, 3) if count else 0.0,
+                    "maxExecuteMs": round(max_time * 1000, 3),
+                    "rows": rows,
+                }
+                for (function, sql), (count, execute_time, fetch_time, max_time, rows) in statements[:limit]
+            ],
+            "functions": {
+                function: {"queries": totals["queries"], "totalMs": round(totals["totalMs"], 3)}
+                for function, totals in sorted(functions.items(), key=lambda item: item[1]["totalMs"], reverse=True)
+            },
+        }
+
+    def count_slow(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self.slow_queries = 0
+
+QUERY_STATS = QueryStats()
+
+_explained = {}
+
+def _log_slow(function, sql, params, elapsed, explain):
+    QUERY_STATS.count_slow()
+    normalized = normalize(sql)
+    print(f"Slow query ({elapsed * 1000:.1f} ms) in {function}: {normalized}")
+
+    if explain is None or not normalized.lstrip('( ').upper().startswith(EXPLAINABLE):
+        return
+    now = time.monotonic()
+    if now - _explained.get(normalized, -EXPLAIN_INTERVAL) < EXPLAIN_INTERVAL:
+        return
+    _explained[normalized] = now
+
+    try:
+        for row in explain(sql, params):
+            print(f"    {row}")
+    except Exception as e:
+        print(f"    EXPLAIN failed: {e}")
+
+class InstrumentedCursor:
+    """A cursor that records how long each statement and its fetches take"""
+
+    def __init__(self, cursor, explain):
+        self._cursor = cursor
+        self._explain = explain
+        # [function, sql, params, seconds so far, logged as slow, explain] of the last statement
+        self._current = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _executed(self, function, sql, params, elapsed, explain):
+        QUERY_STATS.record(function, normalize(sql), execute_time=elapsed)
+        slow = elapsed * 1000 >= SLOW_QUERY_MS
+        self._current = [function, sql, params, elapsed, slow, explain]
+        if slow:
+            _log_slow(function, sql, params, elapsed, explain)
+
+    def _fetched(self, elapsed, rows):
+        current = self._current
+        if current is None:
+            return
+        QUERY_STATS.record(current[0], normalize(current[1]), fetch_time=elapsed, rows=rows, executed=False)
+        current[3] += elapsed
+        if not current[4] and current[3] * 1000 >= SLOW_QUERY_MS:
+            current[4] = True
+            _log_slow(*current[:4], current[5])
+
+    def _start_span(self, query, function):
+        sql = normalize(query)
+        return start_span(_span_name(sql), 'client', {"db.statement": sql, "code.function": function})
+
+    def execute(self, query, *args, **kwargs):
+        function = _caller(1)
+        db_span = self._start_span(query, function) if is_recording() else None
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(query, *args, **kwargs)
+        finally:
+            params = args[0] if args else kwargs.get('params')
+            self._executed(function, query, params, time.perf_counter() - start, self._explain)
+            if db_span is not None:
+                db_span.end()
+
+    def executemany(self, query, *args, **kwargs):
+        function = _caller(1)
+        db_span = self._start_span(query, function) if is_recording() else None
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, *args, **kwargs)
+        finally:
+            # Plans of batched statements are not looked up
+            self._executed(function, query, None, time.perf_counter() - start, None)
+            if db_span is not None:
+                db_span.end()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(time.perf_counter() - start, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._fetched(time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(time.perf_counter() - start, len(rows))
+        return rows
+
+class InstrumentedConnection:
+    """A connection whose cursors are InstrumentedCursors"""
+
+    def __init__(self, connection, explain):
+        self._connection = connection
+        self._explain = explain
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self._explain)
+
+def instrument(connection, explain=None):
+    """Wrap connection so its queries are timed; explain(sql, params) returns plan rows"""
+    if connection is None or not QUERY_STATS_ENABLED:
+        return connection
+    return InstrumentedConnection(connection, explain)
+
+def instrument_cursor(cursor, explain=None):
+    """Wrap a cursor that did not come from an instrumented connection"""
+    if not QUERY_STATS_ENABLED:
+        return cursor
+    return InstrumentedCursor(cursor, explain)
+
+def unwrap(connection):
+    """The connection instrument() wrapped, or connection itself"""
+    if isinstance(connection, InstrumentedConnection):
+        return connection._connection
+    return connection
@@ -0,0 +1,295 @@
+from database import get_db_connection, Error, DB_BACKEND
+from datetime import datetime, timedelta
+import sys
+
+# Longest reporting window the admin dashboard may request (days)
+MAX_REPORT_DAYS = 366
+
+# Rows read per batch when rebuilding the summaries from history
+REBUILD_BATCH_SIZE = 5000
+
+def record_artwork_sale(cursor, order_id):
+    """Add a completed artwork order to the daily and per-artist summaries.
+    
+    Runs on the caller's transaction so the summaries commit together with
+    the payment status change that caused them. Sales count towards the day
+    they were paid, not the day they were ordered.
+    """
+    cursor.execute("""
+    INSERT INTO sales_daily (day, artwork_orders, artwork_revenue)
+    SELECT DATE(paid_at), 1, total_amount FROM artwork_orders WHERE id = %s
+    ON DUPLICATE KEY UPDATE
+        artwork_orders = artwork_orders + VALUES(artwork_orders),
+        artwork_revenue = artwork_revenue + VALUES(artwork_revenue)
+    """, (order_id,))
+    cursor.execute("""
+    INSERT INTO artist_sales (artist, orders, revenue)
+    SELECT a.artist, 1, o.total_amount
+    FROM artwork_orders o
+    JOIN artworks a ON a.id = o.artwork_id
+    WHERE o.id = %s
+    ON DUPLICATE KEY UPDATE
+        orders = orders + VALUES(orders),
+        revenue = revenue + VALUES(revenue)
+    """, (order_id,))
+
+def record_booking_sale(cursor, booking_id):
+    """Add a completed exhibition booking to the daily and per-exhibition summaries"""
+    cursor.execute("""
+    INSERT INTO sales_daily (day, bookings, tickets, ticket_revenue)
+    SELECT DATE(paid_at), 1, slots, total_amount FROM exhibition_bookings WHERE id = %s
+    ON DUPLICATE KEY UPDATE
+        bookings = bookings + VALUES(bookings),
+        tickets = tickets + VALUES(tickets),
+        ticket_revenue = ticket_revenue + VALUES(ticket_revenue)
+    """, (booking_id,))
+    cursor.execute("""
+    INSERT INTO exhibition_attendance (exhibition_id, bookings, tickets, revenue)
+    SELECT exhibition_id, 1, slots, total_amount FROM exhibition_bookings WHERE id = %s
+    ON DUPLICATE KEY UPDATE
+        bookings = bookings + VALUES(bookings),
+        tickets = tickets + VALUES(tickets),
+        revenue = revenue + VALUES(revenue)
+    """, (booking_id,))
+
+def get_sales_stats(days=30):
+    """Get pre-aggregated sales figures for the admin dashboard.
+    
+    Revenue and attendance come from the summary tables kept up to date by
+    the payment path, so the cost of a report grows with the number of days
+    and exhibitions shown rather than with the number of orders.
+    """
+    try:
+        days = min(max(int(days), 1), MAX_REPORT_DAYS)
+    except (TypeError, ValueError):
+        days = 30
+    since = (datetime.now() - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+    
+    cursor = connection.cursor()
+    
+    try:
+        # Revenue by day, artworks and tickets side by side
+        cursor.execute("""
+        SELECT day, artwork_orders, artwork_revenue, bookings, tickets, ticket_revenue
+        FROM sales_daily
+        WHERE day >= %s
+        ORDER BY day
+        """, (since.date(),))
+        revenue_by_day = [
+            {
+                "date": row[0].isoformat(),
+                "artworkOrders": row[1],
+                "artworkRevenue": float(row[2]),
+                "bookings": row[3],
+                "tickets": row[4],
+                "ticketRevenue": float(row[5]),
+                "totalRevenue": float(row[2] + row[5])
+            }
+            for row in cursor.fetchall()
+        ]
+        
+        # Tickets sold per exhibition
+        cursor.execute("""
+        SELECT e.id, e.title, e.total_slots, e.available_slots,
+               COALESCE(s.bookings, 0), COALESCE(s.tickets, 0), COALESCE(s.revenue, 0)
+        FROM exhibitions e
+        LEFT JOIN exhibition_attendance s ON s.exhibition_id = e.id
+        ORDER BY COALESCE(s.tickets, 0) DESC
+        """)
+        tickets_by_exhibition = [
+            {
+                "exhibitionId": str(row[0]),
+                "title": row[1],
+                "totalSlots": row[2],
+                "availableSlots": row[3],
+                "bookings": row[4],
+                "ticketsSold": row[5],
+                "revenue": float(row[6])
+            }
+            for row in cursor.fetchall()
+        ]
+        
+        # Best selling artists
+        cursor.execute("""
+        SELECT artist, orders, revenue
+        FROM artist_sales
+        ORDER BY revenue DESC
+        LIMIT 20
+        """)
+        top_artists = [
+            {"artist": row[0], "orders": row[1], "revenue": float(row[2])}
+            for row in cursor.fetchall()
+        ]
+        
+        # Conversion of M-Pesa payment requests into completed payments
+        cursor.execute("""
+        SELECT status, COUNT(*), SUM(amount)
+        FROM mpesa_transactions
+        WHERE transaction_date >= %s
+        GROUP BY status
+        """, (since,))
+        by_status = {status: (count, float(amount or 0)) for status, count, amount in cursor.fetchall()}
+        initiated = sum(count for count, _ in by_status.values())
+        completed = by_status.get('completed', (0, 0.0))[0]
+        
+        conversion = {
+            "initiated": initiated,
+            "pending": by_status.get('pending', (0, 0.0))[0],
+            "completed": completed,
+            "failed": by_status.get('failed', (0, 0.0))[0],
+            "completedAmount": by_status.get('completed', (0, 0.0))[1],
+            "conversionRate": round(completed / initiated, 4) if initiated else 0.0
+        }
+        
+        return {
+            "days": days,
+            "since": since.date().isoformat(),
+            "revenueByDay": revenue_by_day,
+            "ticketsByExhibition": tickets_by_exhibition,
+            "topArtists": top_artists,
+            "paymentConversion": conversion
+        }
+    except Error as e:
+        print(f"Error getting sales stats: {e}")
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def rebuild_summaries(batch_size=REBUILD_BATCH_SIZE):
+    """Recompute the sales summary tables from the full order history.
+    
+    Completed orders and bookings are read in primary-key batches and each
+    batch is folded into the summaries with one executemany per table.
+    
+    The whole rebuild is one transaction, so the dashboard keeps showing the
+    old totals until the new ones commit. It starts by emptying the
+    summaries, which locks every summary row and the gaps between them;
+    record_artwork_sale and record_booking_sale write to the same tables, so
+    a payment completing meanwhile waits for the rebuild to commit and is
+    then added on top. Its order is not yet committed when the rebuild reads
+    the history, so it is counted exactly once. On SQLite the transaction
+    holds the database's write lock, so payments wait the same way.
+    """
+    connection = get_db_connection()
+    if connection is None:
+        print("Failed to connect to database")
+        return False
+    
+    cursor = connection.cursor()
+    
+    try:
+        # The locks above rely on REPEATABLE READ: gap locks, and one snapshot taken after the DELETEs
+        if DB_BACKEND == 'mysql':
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("DELETE FROM sales_daily")
+        cursor.execute("DELETE FROM artist_sales")
+        cursor.execute("DELETE FROM exhibition_attendance")
+        
+        last_id = 0
+        orders = 0
+        while True:
+            cursor.execute("""
+            SELECT o.id, DATE(o.paid_at), a.artist, o.total_amount
+            FROM artwork_orders o
+            JOIN artworks a ON a.id = o.artwork_id
+            WHERE o.payment_status = 'completed' AND o.id > %s
+            ORDER BY o.id
+            LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            
+            daily = {}
+            artists = {}
+            for _, day, artist, amount in rows:
+                count, revenue = daily.get(day, (0, 0))
+                daily[day] = (count + 1, revenue + amount)
+                count, revenue = artists.get(artist, (0, 0))
+                artists[artist] = (count + 1, revenue + amount)
+            
+            cursor.executemany("""
+            INSERT INTO sales_daily (day, artwork_orders, artwork_revenue)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                artwork_orders = artwork_orders + VALUES(artwork_orders),
+                artwork_revenue = artwork_revenue + VALUES(artwork_revenue)
+            """, [(day, count, revenue) for day, (count, revenue) in daily.items()])
+            cursor.executemany("""
+            INSERT INTO artist_sales (artist, orders, revenue)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                orders = orders + VALUES(orders),
+                revenue = revenue + VALUES(revenue)
+            """, [(artist, count, revenue) for artist, (count, revenue) in artists.items()])
+            
+            last_id = rows[-1][0]
+            orders += len(rows)
+        
+        last_id = 0
+        bookings = 0
+        while True:
+            cursor.execute("""
+            SELECT id, DATE(paid_at), exhibition_id, slots, total_amount
+            FROM exhibition_bookings
+            WHERE payment_status = 'completed' AND id > %s
+            ORDER BY id
+            LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            
+            daily = {}
+            exhibitions = {}
+            for _, day, exhibition_id, slots, amount in rows:
+                count, tickets, revenue = daily.get(day, (0, 0, 0))
+                daily[day] = (count + 1, tickets + slots, revenue + amount)
+                count, tickets, revenue = exhibitions.get(exhibition_id, (0, 0, 0))
+                exhibitions[exhibition_id] = (count + 1, tickets + slots, revenue + amount)
+            
+            cursor.executemany("""
+            INSERT INTO sales_daily (day, bookings, tickets, ticket_revenue)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                bookings = bookings + VALUES(bookings),
+                tickets = tickets + VALUES(tickets),
+                ticket_revenue = ticket_revenue + VALUES(ticket_revenue)
+            """, [(day,) + totals for day, totals in daily.items()])
+            cursor.executemany("""
+            INSERT INTO exhibition_attendance (exhibition_id, bookings, tickets, revenue)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                bookings = bookings + VALUES(bookings),
+                tickets = tickets + VALUES(tickets),
+                revenue = revenue + VALUES(revenue)
+            """, [(exhibition_id,) + totals for exhibition_id, totals in exhibitions.items()])
+            
+            last_id = rows[-1][0]
+            bookings += len(rows)
+        
+        connection.commit()
+        
+        print(f"Rebuilt sales summaries from {orders} orders and {bookings} bookings")
+        return True
+    except Error as e:
+        connection.rollback()
+        print(f"Error rebuilding sales summaries: {e}")
+        return False
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else REBUILD_BATCH_SIZE
+        rebuild_summaries(batch_size)
+    else:
+        print("Usage: python reports.py rebuild [batch_size]")
@@ -0,0 +1,476 @@
+import threading
+from datetime import datetime, timedelta
+from database import get_db_connection, mark_write, Error
+from config import CONFIG
+
+# How long booked slots stay reserved while the STK push is pending (seconds)
+SLOT_HOLD_TTL = CONFIG.holds.slot_ttl
+
+# How often the sweeper returns expired holds to the pool (seconds)
+HOLD_SWEEP_INTERVAL = CONFIG.holds.sweep_interval
+
+# How long an artwork stays locked to one buyer while their STK push is pending (seconds)
+ARTWORK_HOLD_TTL = CONFIG.holds.artwork_ttl
+
+# Maximum number of expired holds released per sweep
+HOLD_SWEEP_BATCH = CONFIG.holds.sweep_batch
+
+_sweeper_thread = None
+_sweeper_stop = threading.Event()
+
+def _take_slots(cursor, exhibition_id, slots):
+    """Atomically take slots from an exhibition, never going below zero.
+    
+    The check and the decrement are one statement, so the exhibition row is
+    locked only for the duration of this UPDATE instead of across a
+    SELECT ... FOR UPDATE round trip. Concurrent checkouts for the same
+    exhibition serialise on the row for microseconds rather than queueing
+    behind each other's whole transaction.
+    """
+    query = """
+    UPDATE exhibitions
+    SET available_slots = available_slots - %s
+    WHERE id = %s AND available_slots >= %s
+    """
+    cursor.execute(query, (slots, exhibition_id, slots))
+    return cursor.rowcount == 1
+
+def _return_slots(cursor, exhibition_id, slots):
+    """Give slots back to an exhibition"""
+    query = """
+    UPDATE exhibitions
+    SET available_slots = available_slots + %s
+    WHERE id = %s
+    """
+    cursor.execute(query, (slots, exhibition_id))
+
+def _release_hold(cursor, booking_id, status):
+    """Move an active hold to a terminal status and return its slots.
+    
+    The status flip is conditional on the hold still being active, so a hold
+    that is concurrently converted, released or swept is only credited back once.
+    """
+    cursor.execute(
+        "SELECT exhibition_id, slots FROM exhibition_holds WHERE booking_id = %s AND status = 'active'",
+        (booking_id,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return False
+    
+    exhibition_id, slots = row
+    cursor.execute(
+        "UPDATE exhibition_holds SET status = %s WHERE booking_id = %s AND status = 'active'",
+        (status, booking_id)
+    )
+    if cursor.rowcount == 0:
+        return False
+    
+    _return_slots(cursor, exhibition_id, slots)
+    return True
+
+def _convert_hold(cursor, booking_id):
+    """Turn a booking's hold into a sale once payment has completed.
+    
+    The slots were already taken when the hold was placed, so an active hold
+    only needs its status flipped and a converted one nothing at all. Only a
+    hold that lapsed or was released before the payment landed has its slots
+    taken again, with the same conditional UPDATE, so available_slots can
+    never go negative and a booking is never charged its slots twice.
+    
+    Returns False if the exhibition filled up after the hold lapsed.
+    """
+    cursor.execute(
+        "UPDATE exhibition_holds SET status = 'converted' WHERE booking_id = %s AND status = 'active'",
+        (booking_id,)
+    )
+    if cursor.rowcount == 1:
+        return True
+    
+    cursor.execute("SELECT status FROM exhibition_holds WHERE booking_id = %s", (booking_id,))
+    hold = cursor.fetchone()
+    if hold and hold[0] == 'converted':
+        return True
+    
+    cursor.execute(
+        "SELECT exhibition_id, slots FROM exhibition_bookings WHERE id = %s",
+        (booking_id,)
+    )
+    booking = cursor.fetchone()
+    if not booking:
+        return False
+    
+    exhibition_id, slots = booking
+    if not _take_slots(cursor, exhibition_id, slots):
+        return False
+    
+    if hold:
+        cursor.execute(
+            "UPDATE exhibition_holds SET exhibition_id = %s, slots = %s, status = 'converted' WHERE booking_id = %s",
+            (exhibition_id, slots, booking_id)
+        )
+    else:
+        cursor.execute(
+            """
+            INSERT INTO exhibition_holds (booking_id, exhibition_id, slots, status, expires_at)
+            VALUES (%s, %s, %s, 'converted', %s)
+            """,
+            (booking_id, exhibition_id, slots, datetime.now())
+        )
+    return True
+
+def take_slot_hold(cursor, booking_id, exhibition_id, slots, expires_at):
+    """Take the slots of a booking and record the hold on the caller's transaction.
+    
+    Returns None on success or an error message. On error the caller must
+    roll back so a partial decrement is undone.
+    """
+    if not _take_slots(cursor, exhibition_id, slots):
+        return "Not enough slots available"
+    
+    # Reuse the row of an earlier expired or released hold for this booking
+    cursor.execute(
+        """
+        UPDATE exhibition_holds
+        SET exhibition_id = %s, slots = %s, status = 'active', expires_at = %s
+        WHERE booking_id = %s AND status IN ('expired', 'released')
+        """,
+        (exhibition_id, slots, expires_at, booking_id)
+    )
+    if cursor.rowcount == 0:
+        cursor.execute(
+            """
+            INSERT INTO exhibition_holds (booking_id, exhibition_id, slots, expires_at)
+            VALUES (%s, %s, %s, %s)
+            """,
+            (booking_id, exhibition_id, slots, expires_at)
+        )
+    return None
+
+def hold_slots(booking_id, ttl=SLOT_HOLD_TTL):
+    """Reserve the slots of a pending booking until its payment completes or the hold expires"""
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+    
+    cursor = connection.cursor()
+    expires_at = datetime.now() + timedelta(seconds=ttl)
+    
+    try:
+        # A retried STK push for the same booking just extends its existing hold
+        cursor.execute(
+            "UPDATE exhibition_holds SET expires_at = %s WHERE booking_id = %s AND status = 'active'",
+            (expires_at, booking_id)
+        )
+        if cursor.rowcount == 1:
+            connection.commit()
+            mark_write()
+            return {"success": True, "expiresAt": expires_at.isoformat()}
+        
+        cursor.execute(
+            "SELECT exhibition_id, slots, payment_status FROM exhibition_bookings WHERE id = %s",
+            (booking_id,)
+        )
+        booking = cursor.fetchone()
+        if not booking:
+            return {"error": "Booking not found"}
+        
+        exhibition_id, slots, payment_status = booking
+        if payment_status in ('completed', 'refund_due'):
+            return {"error": "Booking already paid"}
+        
+        error = take_slot_hold(cursor, booking_id, exhibition_id, slots, expires_at)
+        if error:
+            connection.rollback()
+            return {"error": error}
+        connection.commit()
+        mark_write()
+        
+        return {"success": True, "expiresAt": expires_at.isoformat()}
+    except Error as e:
+        # A concurrent hold for the same booking won the unique key; undo our decrement
+        connection.rollback()
+        print(f"Error holding slots: {e}")
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def release_slots(booking_id):
+    """Release the slots held for a booking whose payment failed or was abandoned"""
+    connection = get_db_connection()
+    if connection is None:
+        return False
+    
+    cursor = connection.cursor()
+    
+    try:
+        released = _release_hold(cursor, booking_id, 'released')
+        connection.commit()
+        if released:
+            mark_write()
+        return released
+    except Error as e:
+        connection.rollback()
+        print(f"Error releasing slots: {e}")
+        return False
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def sweep_expired_holds(batch_size=HOLD_SWEEP_BATCH):
+    """Return the slots of every hold whose TTL has passed"""
+    connection = get_db_connection()
+    if connection is None:
+        return 0
+    
+    cursor = connection.cursor()
+    expired = 0
+    
+    try:
+        cursor.execute(
+            """
+            SELECT booking_id FROM exhibition_holds
+            WHERE status = 'active' AND expires_at < %s
+            ORDER BY expires_at
+            LIMIT %s
+            """,
+            (datetime.now(), batch_size)
+        )
+        booking_ids = [row[0] for row in cursor.fetchall()]
+        
+        # One short transaction per hold keeps exhibition row locks brief
+        for booking_id in booking_ids:
+            if _release_hold(cursor, booking_id, 'expired'):
+                expired += 1
+            connection.commit()
+        
+        if expired:
+            mark_write()
+            print(f"Released {expired} expired slot holds")
+        return expired
+    except Error as e:
+        connection.rollback()
+        print(f"Error sweeping slot holds: {e}")
+        return expired
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def _release_artwork_hold(cursor, order_id):
+    """Drop the checkout lock an artwork order holds, if any"""
+    cursor.execute("DELETE FROM artwork_holds WHERE order_id = %s", (order_id,))
+    return cursor.rowcount > 0
+
+def take_artwork_hold(cursor, order_id, artwork_id, now, expires_at):
+    """Take the checkout lock on an artwork for an order on the caller's transaction.
+    
+    artwork_holds is keyed by artwork_id, so the INSERT itself is the atomic
+    test-and-set: of two buyers racing for the same piece exactly one row
+    lands. A lapsed hold is deleted first so an abandoned checkout cannot
+    block the piece past its TTL, even before the sweeper runs.
+    
+    Returns None on success or an error message.
+    """
+    cursor.execute(
+        "DELETE FROM artwork_holds WHERE artwork_id = %s AND expires_at < %s",
+        (artwork_id, now)
+    )
+    cursor.execute(
+        """
+        INSERT IGNORE INTO artwork_holds (artwork_id, order_id, expires_at)
+        SELECT id, %s, %s FROM artworks
+        WHERE id = %s AND status = 'available'
+        """,
+        (order_id, expires_at, artwork_id)
+    )
+    if cursor.rowcount == 1:
+        return None
+    
+    # A retried STK push for the same order just extends its own hold
+    cursor.execute(
+        "UPDATE artwork_holds SET expires_at = %s WHERE artwork_id = %s AND order_id = %s",
+        (expires_at, artwork_id, order_id)
+    )
+    if cursor.rowcount == 1:
+        return None
+    
+    cursor.execute("SELECT status FROM artworks WHERE id = %s", (artwork_id,))
+    artwork = cursor.fetchone()
+    if not artwork or artwork[0] != 'available':
+        return "Artwork is no longer available"
+    return "Artwork is reserved by another buyer"
+
+def hold_artwork(order_id, ttl=ARTWORK_HOLD_TTL):
+    """Lock the artwork of a pending order to its buyer for the duration of checkout"""
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+    
+    cursor = connection.cursor()
+    now = datetime.now()
+    expires_at = now + timedelta(seconds=ttl)
+    
+    try:
+        cursor.execute("SELECT artwork_id FROM artwork_orders WHERE id = %s", (order_id,))
+        order = cursor.fetchone()
+        if not order:
+            return {"error": "Order not found"}
+        
+        error = take_artwork_hold(cursor, order_id, order[0], now, expires_at)
+        if error:
+            connection.rollback()
+            return {"error": error}
+        connection.commit()
+        mark_write()
+        
+        return {"success": True, "expiresAt": expires_at.isoformat()}
+    except Error as e:
+        connection.rollback()
+        print(f"Error holding artwork: {e}")
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def release_artwork(order_id):
+    """Release the checkout lock of an artwork order whose payment failed or was abandoned"""
+    connection = get_db_connection()
+    if connection is None:
+        return False
+    
+    cursor = connection.cursor()
+    
+    try:
+        released = _release_artwork_hold(cursor, order_id)
+        connection.commit()
+        if released:
+            mark_write()
+        return released
+    except Error as e:
+        connection.rollback()
+        print(f"Error releasing artwork: {e}")
+        return False
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def sweep_expired_artwork_holds(batch_size=HOLD_SWEEP_BATCH):
+    """Delete artwork holds whose TTL has passed.
+    
+    Expired holds no longer block anyone (hold_artwork and get_artwork both
+    ignore them), so this only keeps the table small.
+    """
+    connection = get_db_connection()
+    if connection is None:
+        return 0
+    
+    cursor = connection.cursor()
+    
+    try:
+        # DELETE ... LIMIT is MySQL-only; bound the batch with a derived table instead
+        cursor.execute(
+            """
+            DELETE FROM artwork_holds WHERE artwork_id IN (
+                SELECT artwork_id FROM (
+                    SELECT artwork_id FROM artwork_holds WHERE expires_at < %s LIMIT %s
+                ) AS expired
+            )
+            """,
+            (datetime.now(), batch_size)
+        )
+        deleted = cursor.rowcount
+        connection.commit()
+        if deleted:
+            mark_write()
+        return deleted
+    except Error as e:
+        connection.rollback()
+        print(f"Error sweeping artwork holds: {e}")
+        return 0
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def _sell_artwork(cursor, order_id):
+    """Mark the artwork of a paid order sold and drop its checkout lock.
+    
+    The sale only lands while the artwork is still available and no other
+    order holds it. The buyer's own lock may have lapsed and been swept,
+    which is fine as long as nobody else has taken the piece since; once
+    another buyer holds it or has bought it, this payment cannot be honoured.
+    
+    Returns False if the artwork went to someone else.
+    """
+    cursor.execute("SELECT artwork_id FROM artwork_orders WHERE id = %s", (order_id,))
+    order = cursor.fetchone()
+    if not order:
+        return False
+    
+    artwork_id = order[0]
+    cursor.execute(
+        """
+        UPDATE artworks
+        SET status = 'sold'
+        WHERE id = %s AND status = 'available'
+        AND NOT EXISTS (SELECT 1 FROM artwork_holds WHERE artwork_id = %s AND order_id <> %s)
+        """,
+        (artwork_id, artwork_id, order_id)
+    )
+    sold = cursor.rowcount == 1
+    _release_artwork_hold(cursor, order_id)
+    return sold
+
+def apply_payment_to_hold(cursor, order_type, order_id, payment_status):
+    """Settle what an artwork order or exhibition booking holds once its payment outcome is known.
+    
+    Runs on the caller's transaction, after the caller has moved the order's
+    payment_status with a conditional UPDATE. That UPDATE serialises
+    concurrent callbacks for the same order, so each outcome is applied once.
+    
+    Returns False when a completed payment cannot be honoured because the
+    item was lost while the payment was pending; the caller must then flag
+    the order for a refund instead of completing it.
+    """
+    if order_type == "artwork":
+        if payment_status == "completed":
+            return _sell_artwork(cursor, order_id)
+        _release_artwork_hold(cursor, order_id)
+        return True
+    
+    if payment_status == "completed":
+        return _convert_hold(cursor, order_id)
+    _release_hold(cursor, order_id, 'released')
+    return True
+
+def _sweep_loop(interval):
+    while not _sweeper_stop.wait(interval):
+        try:
+            # Keep draining while full batches come back
+            while sweep_expired_holds() == HOLD_SWEEP_BATCH:
+                pass
+            while sweep_expired_artwork_holds() == HOLD_SWEEP_BATCH:
+                pass
+        except Exception as e:
+            print(f"Hold sweeper error: {e}")
+
+def start_hold_sweeper(interval=HOLD_SWEEP_INTERVAL):
+    """Start the background thread that expires stale holds"""
+    global _sweeper_thread
+    if _sweeper_thread is not None and _sweeper_thread.is_alive():
+        return _sweeper_thread
+    
+    _sweeper_stop.clear()
+    _sweeper_thread = threading.Thread(target=_sweep_loop, args=(interval,), name="hold-sweeper", daemon=True)
+    _sweeper_thread.start()
+    return _sweeper_thread
+
+def stop_hold_sweeper():
+    """Stop the background hold sweeper"""
+    _sweeper_stop.set()
@@ -0,0 +1,85 @@
+"""Compiled row-to-dict mappers for query results.
+
+A RowMapper describes how the columns of a query become response fields:
+the key each column is renamed to and an optional converter (Decimal to
+float, date to ISO string, id to str). For each distinct column list it
+generates one specialised function, e.g.
+
+    lambda row: {'id': _c0(row[0]), 'title': row[1], 'startDate': _c4(row[4])}
+
+so every row is turned into its final dict in a single pass, with no
+per-row column-name lookups, key renames or second conversion loop.
+
+    EXHIBITION_ROW = RowMapper({
+        'start_date': ('startDate', isoformat),
+        'ticket_price': ('ticketPrice', to_float),
+    })
+    exhibitions = EXHIBITION_ROW.all(cursor, cursor.fetchall())
+"""
+from decimal import Decimal
+
+def to_float(value):
+    """Decimal (or any number) to float, keeping NULL"""
+    return None if value is None else float(value)
+
+def to_str(value):
+    """Value to str, keeping NULL (ids are sent to the frontend as strings)"""
+    return None if value is None else str(value)
+
+def isoformat(value):
+    """date/datetime to ISO 8601 string, keeping NULL"""
+    return None if value is None else value.isoformat()
+
+def plain(value):
+    """Decimal to float, anything else unchanged"""
+    return float(value) if isinstance(value, Decimal) else value
+
+class RowMapper:
+    """Maps result rows to dicts using a per-column list compiled converter.
+
+    fields maps a column name to either the output key (a rename) or a
+    (key, converter) tuple. Columns not listed keep their name and are
+    passed through default, if given.
+    """
+
+    def __init__(self, fields=None, default=None):
+        self.fields = fields or {}
+        self.default = default
+        self._compiled = {}
+
+    def _field(self, column):
+        spec = self.fields.get(column, column)
+        if isinstance(spec, tuple):
+            return spec
+        return spec, self.default
+
+    def compile(self, columns):
+        """Return the row function for this column list, building it on first use"""
+        columns = tuple(columns)
+        convert = self._compiled.get(columns)
+        if convert is not None:
+            return convert
+
+        namespace = {}
+        items = []
+        for index, column in enumerate(columns):
+            key, converter = self._field(column)
+            if converter is None:
+                items.append(f"{key!r}: row[{index}]")
+            else:
+                namespace[f"_c{index}"] = converter
+                items.append(f"{key!r}: _c{index}(row[{index}])")
+
+        convert = eval(f"lambda row: {{{', '.join(items)}}}", namespace)
+        self._compiled[columns] = convert
+        return convert
+
+    def one(self, cursor, row):
+        """Map a single row of cursor's result, or None"""
+        if row is None:
+            return None
+        return self.compile(cursor.column_names)(row)
+
+    def all(self, cursor, rows):
+        """Map every row of cursor's result"""
+        return list(map(self.compile(cursor.column_names), rows))
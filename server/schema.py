@@ -0,0 +1,345 @@
+"""Single source of truth for the AfriArt database schema.
+
+Tables are declared once here and rendered as MySQL or SQLite DDL.
+database.initialize_database, db_setup.py and the checked-in schema.sql /
+schema.sqlite.sql files are all generated from these definitions:
+
+    python schema.py mysql > schema.sql
+    python schema.py sqlite > schema.sqlite.sql
+
+Changes to tables that already exist in deployed databases also need a
+migration in migrations/ (see migrate.py).
+"""
+import sys
+import hashlib
+
+class Column:
+    """A table column with a dialect-neutral type"""
+
+    def __init__(self, name, type, nullable=True, default=None, primary_key=False,
+                 auto_increment=False, unique=False, values=None):
+        self.name = name
+        self.type = type
+        self.nullable = nullable
+        self.default = default
+        self.primary_key = primary_key
+        self.auto_increment = auto_increment
+        self.unique = unique
+        self.values = values
+
+class Index:
+    """A secondary index"""
+
+    def __init__(self, name, columns):
+        self.name = name
+        self.columns = columns
+
+class ForeignKey:
+    """A foreign key that cascades deletes"""
+
+    def __init__(self, column, references):
+        self.column = column
+        self.references = references
+
+class Table:
+    """A table with its columns, secondary indexes and foreign keys"""
+
+    def __init__(self, name, columns, indexes=(), foreign_keys=()):
+        self.name = name
+        self.columns = columns
+        self.indexes = indexes
+        self.foreign_keys = foreign_keys
+
+def id_column():
+    return Column('id', 'int', nullable=False, primary_key=True, auto_increment=True)
+
+def created_at_column():
+    return Column('created_at', 'timestamp', default='CURRENT_TIMESTAMP')
+
+PAYMENT_STATUSES = ('pending', 'completed', 'failed')
+
+# An order or booking whose payment completed after its item was lost waits for a refund
+ORDER_PAYMENT_STATUSES = PAYMENT_STATUSES + ('refund_due',)
+
+# Tables in creation order (referenced tables first)
+TABLES = [
+    Table('users', [
+        id_column(),
+        Column('name', 'varchar(255)', nullable=False),
+        Column('email', 'varchar(255)', nullable=False, unique=True),
+        Column('password', 'varchar(255)', nullable=False),
+        Column('phone', 'varchar(20)'),
+        created_at_column(),
+    ]),
+    Table('admins', [
+        id_column(),
+        Column('name', 'varchar(255)', nullable=False),
+        Column('email', 'varchar(255)', nullable=False, unique=True),
+        Column('password', 'varchar(255)', nullable=False),
+        created_at_column(),
+    ]),
+    Table('artworks', [
+        id_column(),
+        Column('title', 'varchar(255)', nullable=False),
+        Column('artist', 'varchar(255)', nullable=False),
+        Column('description', 'text'),
+        Column('price', 'decimal(10, 2)', nullable=False),
+        Column('image_url', 'varchar(255)'),
+        Column('dimensions', 'varchar(100)'),
+        Column('medium', 'varchar(100)'),
+        Column('year', 'int'),
+        Column('status', 'enum', nullable=False, default="'available'", values=('available', 'sold')),
+        created_at_column(),
+    ]),
+    Table('exhibitions', [
+        id_column(),
+        Column('title', 'varchar(255)', nullable=False),
+        Column('description', 'text'),
+        Column('location', 'varchar(255)', nullable=False),
+        Column('start_date', 'date', nullable=False),
+        Column('end_date', 'date', nullable=False),
+        Column('ticket_price', 'decimal(10, 2)', nullable=False),
+        Column('image_url', 'varchar(255)'),
+        Column('total_slots', 'int', nullable=False),
+        Column('available_slots', 'int', nullable=False),
+        Column('status', 'enum', nullable=False, values=('upcoming', 'ongoing', 'past')),
+        created_at_column(),
+    ]),
+    Table('checkouts', [
+        id_column(),
+        Column('user_id', 'int', nullable=False),
+        Column('total_amount', 'decimal(10, 2)', nullable=False),
+        Column('payment_status', 'enum', nullable=False, default="'pending'", values=PAYMENT_STATUSES),
+        created_at_column(),
+    ], foreign_keys=[
+        ForeignKey('user_id', 'users(id)'),
+    ]),
+    Table('artwork_orders', [
+        id_column(),
+        Column('user_id', 'int', nullable=False),
+        Column('artwork_id', 'int', nullable=False),
+        Column('name', 'varchar(255)', nullable=False),
+        Column('email', 'varchar(255)', nullable=False),
+        Column('phone', 'varchar(20)', nullable=False),
+        Column('delivery_address', 'text', nullable=False),
+        Column('payment_method', 'enum', nullable=False, values=('mpesa',)),
+        Column('payment_status', 'enum', nullable=False, default="'pending'", values=ORDER_PAYMENT_STATUSES),
+        Column('mpesa_transaction_id', 'varchar(50)'),
+        Column('order_date', 'timestamp', default='CURRENT_TIMESTAMP'),
+        Column('total_amount', 'decimal(10, 2)', nullable=False),
+        Column('checkout_id', 'int'),
+        Column('paid_at', 'datetime'),
+    ], indexes=[
+        Index('idx_artwork_orders_checkout', ['checkout_id']),
+        Index('idx_artwork_orders_user_date', ['user_id', 'order_date']),
+        Index('idx_artwork_orders_status_date', ['payment_status', 'order_date']),
+        Index('idx_artwork_orders_date', ['order_date']),
+    ], foreign_keys=[
+        ForeignKey('user_id', 'users(id)'),
+        ForeignKey('artwork_id', 'artworks(id)'),
+    ]),
+    Table('exhibition_bookings', [
+        id_column(),
+        Column('user_id', 'int', nullable=False),
+        Column('exhibition_id', 'int', nullable=False),
+        Column('name', 'varchar(255)', nullable=False),
+        Column('email', 'varchar(255)', nullable=False),
+        Column('phone', 'varchar(20)', nullable=False),
+        Column('slots', 'int', nullable=False),
+        Column('payment_method', 'enum', nullable=False, values=('mpesa',)),
+        Column('payment_status', 'enum', nullable=False, default="'pending'", values=ORDER_PAYMENT_STATUSES),
+        Column('mpesa_transaction_id', 'varchar(50)'),
+        Column('booking_date', 'timestamp', default='CURRENT_TIMESTAMP'),
+        Column('total_amount', 'decimal(10, 2)', nullable=False),
+        Column('checkout_id', 'int'),
+        Column('paid_at', 'datetime'),
+    ], indexes=[
+        Index('idx_exhibition_bookings_checkout', ['checkout_id']),
+        Index('idx_exhibition_bookings_user_date', ['user_id', 'booking_date']),
+        Index('idx_exhibition_bookings_status_date', ['payment_status', 'booking_date']),
+        Index('idx_exhibition_bookings_date', ['booking_date']),
+    ], foreign_keys=[
+        ForeignKey('user_id', 'users(id)'),
+        ForeignKey('exhibition_id', 'exhibitions(id)'),
+    ]),
+    Table('contact_messages', [
+        id_column(),
+        Column('name', 'varchar(255)', nullable=False),
+        Column('email', 'varchar(255)', nullable=False),
+        Column('phone', 'varchar(20)'),
+        Column('message', 'text', nullable=False),
+        Column('date', 'timestamp', default='CURRENT_TIMESTAMP'),
+        Column('status', 'enum', nullable=False, default="'new'", values=('new', 'read', 'replied')),
+        Column('source', 'varchar(50)', default="'contact_form'"),
+    ]),
+    Table('mpesa_transactions', [
+        id_column(),
+        Column('checkout_request_id', 'varchar(100)', nullable=False),
+        Column('merchant_request_id', 'varchar(100)', nullable=False),
+        Column('order_type', 'varchar(20)', nullable=False),
+        Column('order_id', 'int', nullable=False),
+        Column('user_id', 'int', nullable=False),
+        Column('amount', 'decimal(10, 2)', nullable=False),
+        Column('phone_number', 'varchar(20)', nullable=False),
+        Column('result_code', 'varchar(10)'),
+        Column('result_desc', 'varchar(255)'),
+        Column('transaction_date', 'timestamp', default='CURRENT_TIMESTAMP'),
+        Column('status', 'enum', nullable=False, default="'pending'", values=PAYMENT_STATUSES),
+    ], indexes=[
+        Index('idx_mpesa_transactions_checkout', ['checkout_request_id']),
+        Index('idx_mpesa_transactions_date', ['transaction_date']),
+    ], foreign_keys=[
+        ForeignKey('user_id', 'users(id)'),
+    ]),
+    Table('exhibition_holds', [
+        id_column(),
+        Column('booking_id', 'int', nullable=False, unique=True),
+        Column('exhibition_id', 'int', nullable=False),
+        Column('slots', 'int', nullable=False),
+        Column('status', 'enum', nullable=False, default="'active'",
+               values=('active', 'converted', 'released', 'expired')),
+        Column('expires_at', 'datetime', nullable=False),
+        created_at_column(),
+    ], indexes=[
+        Index('idx_exhibition_holds_sweep', ['status', 'expires_at']),
+    ], foreign_keys=[
+        ForeignKey('exhibition_id', 'exhibitions(id)'),
+    ]),
+    Table('artwork_holds', [
+        Column('artwork_id', 'int', nullable=False, primary_key=True),
+        Column('order_id', 'int', nullable=False),
+        Column('expires_at', 'datetime', nullable=False),
+        created_at_column(),
+    ], indexes=[
+        Index('idx_artwork_holds_expires', ['expires_at']),
+    ], foreign_keys=[
+        ForeignKey('artwork_id', 'artworks(id)'),
+    ]),
+    Table('sales_daily', [
+        Column('day', 'date', nullable=False, primary_key=True),
+        Column('artwork_orders', 'int', nullable=False, default='0'),
+        Column('artwork_revenue', 'decimal(14, 2)', nullable=False, default='0'),
+        Column('bookings', 'int', nullable=False, default='0'),
+        Column('tickets', 'int', nullable=False, default='0'),
+        Column('ticket_revenue', 'decimal(14, 2)', nullable=False, default='0'),
+    ]),
+    Table('artist_sales', [
+        Column('artist', 'varchar(255)', nullable=False, primary_key=True),
+        Column('orders', 'int', nullable=False, default='0'),
+        Column('revenue', 'decimal(14, 2)', nullable=False, default='0'),
+    ]),
+    Table('exhibition_attendance', [
+        Column('exhibition_id', 'int', nullable=False, primary_key=True),
+        Column('bookings', 'int', nullable=False, default='0'),
+        Column('tickets', 'int', nullable=False, default='0'),
+        Column('revenue', 'decimal(14, 2)', nullable=False, default='0'),
+    ], foreign_keys=[
+        ForeignKey('exhibition_id', 'exhibitions(id)'),
+    ]),
+    # Fingerprint of the DDL last applied, per dialect (see database.initialize_database)
+    Table('schema_fingerprint', [
+        Column('dialect', 'varchar(10)', nullable=False, primary_key=True),
+        Column('fingerprint', 'char(64)', nullable=False),
+        Column('updated_at', 'timestamp', default='CURRENT_TIMESTAMP'),
+    ]),
+]
+
+DIALECTS = ('mysql', 'sqlite')
+
+def _column_type(column, dialect):
+    if dialect == 'mysql':
+        if column.type == 'enum':
+            return "ENUM(" + ", ".join(f"'{value}'" for value in column.values) + ")"
+        return column.type.upper()
+
+    # SQLite has no ENUM, DECIMAL or VARCHAR length limits; use the matching affinities
+    if column.type == 'int':
+        return 'INTEGER'
+    if column.type.startswith('decimal'):
+        return 'NUMERIC'
+    if column.type in ('date', 'datetime', 'timestamp'):
+        return column.type.upper()
+    return 'TEXT'
+
+def _column_ddl(column, dialect):
+    parts = [column.name, _column_type(column, dialect)]
+
+    if column.primary_key and column.auto_increment:
+        parts.append('PRIMARY KEY AUTOINCREMENT' if dialect == 'sqlite' else 'AUTO_INCREMENT PRIMARY KEY')
+    elif column.primary_key:
+        parts.append('PRIMARY KEY')
+
+    if not column.nullable and not column.primary_key:
+        parts.append('NOT NULL')
+    if column.unique:
+        parts.append('UNIQUE')
+    if column.default == 'CURRENT_TIMESTAMP' and dialect == 'sqlite':
+        # SQLite's CURRENT_TIMESTAMP is UTC; MySQL stores the server's local time
+        parts.append("DEFAULT (datetime('now', 'localtime'))")
+    elif column.default is not None:
+        parts.append(f"DEFAULT {column.default}")
+    if column.type == 'enum' and dialect == 'sqlite':
+        parts.append(f"CHECK ({column.name} IN (" + ", ".join(f"'{value}'" for value in column.values) + "))")
+
+    return ' '.join(parts)
+
+def find_table(name):
+    """The definition of a table by name"""
+    for table in TABLES:
+        if table.name == name:
+            return table
+    raise KeyError(name)
+
+def column_definition(table_name, column_name, dialect='mysql'):
+    """Render one column of a table as it appears in CREATE TABLE (e.g. for ALTER TABLE ... MODIFY)"""
+    for column in find_table(table_name).columns:
+        if column.name == column_name:
+            return _column_ddl(column, dialect)
+    raise KeyError(f"{table_name}.{column_name}")
+
+def create_table_statements(table, dialect='mysql'):
+    """Render the CREATE TABLE (and, for SQLite, CREATE INDEX) statements of a table"""
+    if dialect not in DIALECTS:
+        raise ValueError(f"Unsupported dialect: {dialect}")
+
+    lines = [_column_ddl(column, dialect) for column in table.columns]
+    if dialect == 'mysql':
+        lines += [f"INDEX {index.name} ({', '.join(index.columns)})" for index in table.indexes]
+    lines += [
+        f"FOREIGN KEY ({fk.column}) REFERENCES {fk.references} ON DELETE CASCADE"
+        for fk in table.foreign_keys
+    ]
+
+    body = ',\n    '.join(lines)
+    statements = [f"CREATE TABLE IF NOT EXISTS {table.name} (\n    {body}\n)"]
+
+    # SQLite only supports indexes as separate statements
+    if dialect == 'sqlite':
+        statements += [
+            f"CREATE INDEX IF NOT EXISTS {index.name} ON {table.name} ({', '.join(index.columns)})"
+            for index in table.indexes
+        ]
+    return statements
+
+def create_statements(dialect='mysql'):
+    """Render the DDL of every table, in creation order"""
+    statements = []
+    for table in TABLES:
+        statements += create_table_statements(table, dialect)
+    return statements
+
+def fingerprint(dialect='mysql'):
+    """Hash of the rendered DDL, used to skip table creation when nothing has changed"""
+    return hashlib.sha256(';\n'.join(create_statements(dialect)).encode()).hexdigest()
+
+def render_sql(dialect='mysql'):
+    """Render the full schema as a SQL script"""
+    header = f"-- Generated by schema.py ({dialect}); do not edit by hand.\n"
+    return header + ''.join(f"\n{statement};\n" for statement in create_statements(dialect))
+
+if __name__ == "__main__":
+    dialect = sys.argv[1] if len(sys.argv) > 1 else 'mysql'
+    if dialect not in DIALECTS:
+        print(f"Usage: python schema.py [{'|'.join(DIALECTS)}]")
+        sys.exit(2)
+    sys.stdout.write(render_sql(dialect))
@@ -1,106 +1,181 @@
+-- Generated by schema.py (mysql); do not edit by hand.
 
--- Users table
 CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    email TEXT UNIQUE NOT NULL,
-    password TEXT NOT NULL,
-    phone TEXT,
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    password VARCHAR(255) NOT NULL,
+    phone VARCHAR(20),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Admins table
 CREATE TABLE IF NOT EXISTS admins (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    email TEXT UNIQUE NOT NULL,
-    password TEXT NOT NULL,
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    password VARCHAR(255) NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Artworks table
 CREATE TABLE IF NOT EXISTS artworks (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    title TEXT NOT NULL,
-    artist TEXT NOT NULL,
-    description TEXT NOT NULL,
-    price REAL NOT NULL,
-    image_url TEXT NOT NULL,
-    dimensions TEXT,
-    medium TEXT,
-    year INTEGER,
-    status TEXT NOT NULL DEFAULT 'available',
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    artist VARCHAR(255) NOT NULL,
+    description TEXT,
+    price DECIMAL(10, 2) NOT NULL,
+    image_url VARCHAR(255),
+    dimensions VARCHAR(100),
+    medium VARCHAR(100),
+    year INT,
+    status ENUM('available', 'sold') NOT NULL DEFAULT 'available',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Exhibitions table
 CREATE TABLE IF NOT EXISTS exhibitions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    title TEXT NOT NULL,
-    description TEXT NOT NULL,
-    location TEXT NOT NULL,
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    description TEXT,
+    location VARCHAR(255) NOT NULL,
     start_date DATE NOT NULL,
     end_date DATE NOT NULL,
-    ticket_price REAL NOT NULL,
-    image_url TEXT NOT NULL,
-    total_slots INTEGER NOT NULL,
-    available_slots INTEGER NOT NULL,
-    status TEXT NOT NULL DEFAULT 'upcoming',
+    ticket_price DECIMAL(10, 2) NOT NULL,
+    image_url VARCHAR(255),
+    total_slots INT NOT NULL,
+    available_slots INT NOT NULL,
+    status ENUM('upcoming', 'ongoing', 'past') NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Contact messages table
-CREATE TABLE IF NOT EXISTS messages (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    email TEXT NOT NULL,
-    phone TEXT,
-    message TEXT NOT NULL,
-    status TEXT NOT NULL DEFAULT 'new',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+CREATE TABLE IF NOT EXISTS checkouts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    total_amount DECIMAL(10, 2) NOT NULL,
+    payment_status ENUM('pending', 'completed', 'failed') NOT NULL DEFAULT 'pending',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
--- Artwork orders table
 CREATE TABLE IF NOT EXISTS artwork_orders (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER NOT NULL,
-    artwork_id INTEGER NOT NULL,
-    amount REAL NOT NULL,
-    delivery_fee REAL NOT NULL,
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    artwork_id INT NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    phone VARCHAR(20) NOT NULL,
     delivery_address TEXT NOT NULL,
-    status TEXT NOT NULL DEFAULT 'pending',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users (id),
-    FOREIGN KEY (artwork_id) REFERENCES artworks (id)
+    payment_method ENUM('mpesa') NOT NULL,
+    payment_status ENUM('pending', 'completed', 'failed', 'refund_due') NOT NULL DEFAULT 'pending',
+    mpesa_transaction_id VARCHAR(50),
+    order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    total_amount DECIMAL(10, 2) NOT NULL,
+    checkout_id INT,
+    paid_at DATETIME,
+    INDEX idx_artwork_orders_checkout (checkout_id),
+    INDEX idx_artwork_orders_user_date (user_id, order_date),
+    INDEX idx_artwork_orders_status_date (payment_status, order_date),
+    INDEX idx_artwork_orders_date (order_date),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (artwork_id) REFERENCES artworks(id) ON DELETE CASCADE
 );
 
--- Exhibition bookings table
 CREATE TABLE IF NOT EXISTS exhibition_bookings (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER NOT NULL,
-    exhibition_id INTEGER NOT NULL,
-    slots INTEGER NOT NULL,
-    amount REAL NOT NULL,
-    status TEXT NOT NULL DEFAULT 'pending',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users (id),
-    FOREIGN KEY (exhibition_id) REFERENCES exhibitions (id)
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    exhibition_id INT NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    phone VARCHAR(20) NOT NULL,
+    slots INT NOT NULL,
+    payment_method ENUM('mpesa') NOT NULL,
+    payment_status ENUM('pending', 'completed', 'failed', 'refund_due') NOT NULL DEFAULT 'pending',
+    mpesa_transaction_id VARCHAR(50),
+    booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    total_amount DECIMAL(10, 2) NOT NULL,
+    checkout_id INT,
+    paid_at DATETIME,
+    INDEX idx_exhibition_bookings_checkout (checkout_id),
+    INDEX idx_exhibition_bookings_user_date (user_id, booking_date),
+    INDEX idx_exhibition_bookings_status_date (payment_status, booking_date),
+    INDEX idx_exhibition_bookings_date (booking_date),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (exhibition_id) REFERENCES exhibitions(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS contact_messages (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    phone VARCHAR(20),
+    message TEXT NOT NULL,
+    date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status ENUM('new', 'read', 'replied') NOT NULL DEFAULT 'new',
+    source VARCHAR(50) DEFAULT 'contact_form'
 );
 
--- M-Pesa transactions table
 CREATE TABLE IF NOT EXISTS mpesa_transactions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    order_type TEXT NOT NULL, -- 'artwork' or 'exhibition'
-    order_id INTEGER NOT NULL,
-    user_id INTEGER NOT NULL,
-    amount REAL NOT NULL,
-    phone_number TEXT NOT NULL,
-    transaction_id TEXT,
-    merchant_request_id TEXT,
-    checkout_request_id TEXT,
-    result_code TEXT,
-    result_desc TEXT,
-    status TEXT NOT NULL DEFAULT 'pending', -- 'pending', 'completed', 'failed'
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    checkout_request_id VARCHAR(100) NOT NULL,
+    merchant_request_id VARCHAR(100) NOT NULL,
+    order_type VARCHAR(20) NOT NULL,
+    order_id INT NOT NULL,
+    user_id INT NOT NULL,
+    amount DECIMAL(10, 2) NOT NULL,
+    phone_number VARCHAR(20) NOT NULL,
+    result_code VARCHAR(10),
+    result_desc VARCHAR(255),
+    transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status ENUM('pending', 'completed', 'failed') NOT NULL DEFAULT 'pending',
+    INDEX idx_mpesa_transactions_checkout (checkout_request_id),
+    INDEX idx_mpesa_transactions_date (transaction_date),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS exhibition_holds (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    booking_id INT NOT NULL UNIQUE,
+    exhibition_id INT NOT NULL,
+    slots INT NOT NULL,
+    status ENUM('active', 'converted', 'released', 'expired') NOT NULL DEFAULT 'active',
+    expires_at DATETIME NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users (id)
+    INDEX idx_exhibition_holds_sweep (status, expires_at),
+    FOREIGN KEY (exhibition_id) REFERENCES exhibitions(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS artwork_holds (
+    artwork_id INT PRIMARY KEY,
+    order_id INT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_artwork_holds_expires (expires_at),
+    FOREIGN KEY (artwork_id) REFERENCES artworks(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day DATE PRIMARY KEY,
+    artwork_orders INT NOT NULL DEFAULT 0,
+    artwork_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    bookings INT NOT NULL DEFAULT 0,
+    tickets INT NOT NULL DEFAULT 0,
+    ticket_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS artist_sales (
+    artist VARCHAR(255) PRIMARY KEY,
+    orders INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS exhibition_attendance (
+    exhibition_id INT PRIMARY KEY,
+    bookings INT NOT NULL DEFAULT 0,
+    tickets INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    FOREIGN KEY (exhibition_id) REFERENCES exhibitions(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS schema_fingerprint (
+    dialect VARCHAR(10) PRIMARY KEY,
+    fingerprint CHAR(64) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -0,0 +1,193 @@
+-- Generated by schema.py (sqlite); do not edit by hand.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    phone TEXT,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS admins (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS artworks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    description TEXT,
+    price NUMERIC NOT NULL,
+    image_url TEXT,
+    dimensions TEXT,
+    medium TEXT,
+    year INTEGER,
+    status TEXT NOT NULL DEFAULT 'available' CHECK (status IN ('available', 'sold')),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS exhibitions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    description TEXT,
+    location TEXT NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    ticket_price NUMERIC NOT NULL,
+    image_url TEXT,
+    total_slots INTEGER NOT NULL,
+    available_slots INTEGER NOT NULL,
+    status TEXT NOT NULL CHECK (status IN ('upcoming', 'ongoing', 'past')),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS checkouts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    total_amount NUMERIC NOT NULL,
+    payment_status TEXT NOT NULL DEFAULT 'pending' CHECK (payment_status IN ('pending', 'completed', 'failed')),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS artwork_orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    artwork_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    delivery_address TEXT NOT NULL,
+    payment_method TEXT NOT NULL CHECK (payment_method IN ('mpesa')),
+    payment_status TEXT NOT NULL DEFAULT 'pending' CHECK (payment_status IN ('pending', 'completed', 'failed', 'refund_due')),
+    mpesa_transaction_id TEXT,
+    order_date TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    total_amount NUMERIC NOT NULL,
+    checkout_id INTEGER,
+    paid_at DATETIME,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (artwork_id) REFERENCES artworks(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_artwork_orders_checkout ON artwork_orders (checkout_id);
+
+CREATE INDEX IF NOT EXISTS idx_artwork_orders_user_date ON artwork_orders (user_id, order_date);
+
+CREATE INDEX IF NOT EXISTS idx_artwork_orders_status_date ON artwork_orders (payment_status, order_date);
+
+CREATE INDEX IF NOT EXISTS idx_artwork_orders_date ON artwork_orders (order_date);
+
+CREATE TABLE IF NOT EXISTS exhibition_bookings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    exhibition_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    slots INTEGER NOT NULL,
+    payment_method TEXT NOT NULL CHECK (payment_method IN ('mpesa')),
+    payment_status TEXT NOT NULL DEFAULT 'pending' CHECK (payment_status IN ('pending', 'completed', 'failed', 'refund_due')),
+    mpesa_transaction_id TEXT,
+    booking_date TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    total_amount NUMERIC NOT NULL,
+    checkout_id INTEGER,
+    paid_at DATETIME,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (exhibition_id) REFERENCES exhibitions(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_exhibition_bookings_checkout ON exhibition_bookings (checkout_id);
+
+CREATE INDEX IF NOT EXISTS idx_exhibition_bookings_user_date ON exhibition_bookings (user_id, booking_date);
+
+CREATE INDEX IF NOT EXISTS idx_exhibition_bookings_status_date ON exhibition_bookings (payment_status, booking_date);
+
+CREATE INDEX IF NOT EXISTS idx_exhibition_bookings_date ON exhibition_bookings (booking_date);
+
+CREATE TABLE IF NOT EXISTS contact_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    phone TEXT,
+    message TEXT NOT NULL,
+    date TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    status TEXT NOT NULL DEFAULT 'new' CHECK (status IN ('new', 'read', 'replied')),
+    source TEXT DEFAULT 'contact_form'
+);
+
+CREATE TABLE IF NOT EXISTS mpesa_transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    checkout_request_id TEXT NOT NULL,
+    merchant_request_id TEXT NOT NULL,
+    order_type TEXT NOT NULL,
+    order_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    amount NUMERIC NOT NULL,
+    phone_number TEXT NOT NULL,
+    result_code TEXT,
+    result_desc TEXT,
+    transaction_date TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'completed', 'failed')),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_mpesa_transactions_checkout ON mpesa_transactions (checkout_request_id);
+
+CREATE INDEX IF NOT EXISTS idx_mpesa_transactions_date ON mpesa_transactions (transaction_date);
+
+CREATE TABLE IF NOT EXISTS exhibition_holds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    booking_id INTEGER NOT NULL UNIQUE,
+    exhibition_id INTEGER NOT NULL,
+    slots INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'active' CHECK (status IN ('active', 'converted', 'released', 'expired')),
+    expires_at DATETIME NOT NULL,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    FOREIGN KEY (exhibition_id) REFERENCES exhibitions(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_exhibition_holds_sweep ON exhibition_holds (status, expires_at);
+
+CREATE TABLE IF NOT EXISTS artwork_holds (
+    artwork_id INTEGER PRIMARY KEY,
+    order_id INTEGER NOT NULL,
+    expires_at DATETIME NOT NULL,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    FOREIGN KEY (artwork_id) REFERENCES artworks(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_artwork_holds_expires ON artwork_holds (expires_at);
+
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day DATE PRIMARY KEY,
+    artwork_orders INTEGER NOT NULL DEFAULT 0,
+    artwork_revenue NUMERIC NOT NULL DEFAULT 0,
+    bookings INTEGER NOT NULL DEFAULT 0,
+    tickets INTEGER NOT NULL DEFAULT 0,
+    ticket_revenue NUMERIC NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS artist_sales (
+    artist TEXT PRIMARY KEY,
+    orders INTEGER NOT NULL DEFAULT 0,
+    revenue NUMERIC NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS exhibition_attendance (
+    exhibition_id INTEGER PRIMARY KEY,
+    bookings INTEGER NOT NULL DEFAULT 0,
+    tickets INTEGER NOT NULL DEFAULT 0,
+    revenue NUMERIC NOT NULL DEFAULT 0,
+    FOREIGN KEY (exhibition_id) REFERENCES exhibitions(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS schema_fingerprint (
+    dialect TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
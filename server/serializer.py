@@ -0,0 +1,42 @@
+"""JSON serialization for API responses.
+
+dumps() returns UTF-8 bytes ready to write to the socket and understands
+Decimal, date and datetime values from the database. It uses orjson when
+it is installed and otherwise a single pre-built stdlib encoder (the C
+accelerated one), so no encoder object is created per response.
+
+Set AFRIART_JSON_BACKEND=stdlib to force the standard library encoder.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from config import CONFIG
+
+def _default(obj):
+    """Encode the non-JSON types the database layer returns"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+try:
+    if CONFIG.server.json_backend == 'stdlib':
+        raise ImportError
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = json.JSONEncoder(default=_default, separators=(',', ':'))
+
+def _stdlib_dumps(data):
+    return _encoder.encode(data).encode()
+
+def _orjson_dumps(data):
+    # orjson encodes date and datetime itself; default only sees Decimal
+    return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+BACKEND = 'orjson' if orjson is not None else 'stdlib'
+
+# dumps(data) -> JSON bytes; bound directly to the chosen backend to avoid an extra call per response
+dumps = _orjson_dumps if orjson is not None else _stdlib_dumps
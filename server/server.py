@@ -1,50 +1,454 @@
 import os
+import re
 import json
+import time
+import shutil
+import threading
 import http.server
 import socketserver
 import urllib.parse
 from http import HTTPStatus
-from datetime import datetime
 from urllib.parse import parse_qs, urlparse
-import cgi
 import uuid
-import base64
-from io import BytesIO
 
 # Import modules
 from auth import register_user, login_user, login_admin
 from artwork import get_all_artworks, get_artwork, create_artwork, update_artwork, delete_artwork
 from exhibition import get_all_exhibitions, get_exhibition, create_exhibition, update_exhibition, delete_exhibition
 from contact import create_contact_message, get_all_contact_messages, update_message_status
-from database import initialize_database, json_dumps
+from database import begin_request, add_write_listener
+from serializer import dumps
+from compression import CompressedVariants, ResponseCache, negotiate
+from cors import CORS
+from querylog import QUERY_STATS
+from tracing import enabled as tracing_enabled, start_span, activate, deactivate, parse_traceparent
+from health import STARTUP, start_background_startup
+from lifecycle import IN_FLIGHT, stopping, inherited_socket, install_signal_handlers, finish
+from orders import create_checkout, create_artwork_order, create_exhibition_booking, get_user_orders, get_user_bookings, get_all_orders, get_all_bookings
+from mpesa import handle_mpesa_callback, handle_stk_push_request, check_transaction_status, verify_callback_token
 from middleware import auth_required, admin_required, extract_auth_token, verify_token
+from config import CONFIG
 
 # Create uploads directory if it doesn't exist
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), '../public/uploads')
+UPLOAD_DIR = CONFIG.server.upload_dir
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # Define the port
-PORT = 8000
+PORT = CONFIG.server.port
+
+# Public catalogue listings are cached (with their compressed variants) for this many seconds
+CATALOGUE_CACHE_TTL = CONFIG.server.catalogue_cache_ttl
+CATALOGUE_CACHE = ResponseCache(CATALOGUE_CACHE_TTL)
+
+# Admin changes, holds and payments show up in the listings immediately
+add_write_listener(CATALOGUE_CACHE.clear)
+
+# Persistent connections: idle connections are closed after KEEP_ALIVE_TIMEOUT seconds,
+# and every connection after MAX_REQUESTS_PER_CONNECTION requests
+KEEP_ALIVE_TIMEOUT = CONFIG.server.keep_alive_timeout
+MAX_REQUESTS_PER_CONNECTION = CONFIG.server.max_requests_per_connection
+
+# Unread request bodies up to this size are discarded to keep the connection open;
+# larger ones close it instead
+MAX_DRAIN_BYTES = CONFIG.server.max_drain_bytes
+
+# Request bodies larger than this are refused with 413 before any of it is read (bytes)
+MAX_BODY_BYTES = CONFIG.server.max_body_bytes
+
+# Per-route exceptions, by span route: the image upload forms, plus any set in the configuration
+BODY_LIMITS = {
+    '/artworks': CONFIG.server.max_upload_bytes,
+    '/artworks/:id': CONFIG.server.max_upload_bytes,
+    '/exhibitions': CONFIG.server.max_upload_bytes,
+    '/exhibitions/:id': CONFIG.server.max_upload_bytes,
+}
+BODY_LIMITS.update(CONFIG.server.body_limits)
+
+# Once a request starts, its headers must arrive within HEADER_TIMEOUT seconds and its body
+# within BODY_TIMEOUT seconds plus one second per MIN_BODY_RATE bytes
+HEADER_TIMEOUT = CONFIG.server.header_timeout
+BODY_TIMEOUT = CONFIG.server.body_timeout
+MIN_BODY_RATE = CONFIG.server.min_body_rate
+
+# Connections handled at once, one thread each; further connections wait to be picked up
+MAX_WORKERS = CONFIG.server.max_workers
+
+class DeadlineReader:
+    """A connection's input stream, read against a deadline.
+    
+    A socket timeout starts over with every packet, so a client trickling
+    in a byte at a time could hold a thread indefinitely. Each read here
+    waits for at most one receive, and never past the deadline.
+    """
+    
+    def __init__(self, stream, sock, idle_timeout):
+        self._stream = stream
+        self._socket = sock
+        self._idle_timeout = idle_timeout
+        self._header_timeout = None
+        self.deadline = None
+    
+    def expect_request(self, header_timeout):
+        """Wait the idle timeout for the next request, then header_timeout for the rest of its headers"""
+        self.deadline = None
+        self._header_timeout = header_timeout
+    
+    def _receive(self, receive, size):
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("client too slow sending the request")
+            self._socket.settimeout(min(remaining, self._idle_timeout))
+        try:
+            data = receive(size)
+        finally:
+            if self.deadline is not None:
+                self._socket.settimeout(self._idle_timeout)
+        if data and self._header_timeout is not None:
+            self.deadline = time.monotonic() + self._header_timeout
+            self._header_timeout = None
+        return data
+    
+    def read(self, size):
+        chunks = []
+        while size > 0:
+            chunk = self._receive(self._stream.read1, size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+    
+    def readline(self, size=-1):
+        line = bytearray()
+        while size < 0 or len(line) < size:
+            # peek() receives only when nothing is buffered
+            buffered = self._receive(self._stream.peek, 1)
+            if not buffered:
+                break
+            wanted = len(buffered) if size < 0 else min(len(buffered), size - len(line))
+            end = buffered.find(b'\n', 0, wanted)
+            line += self._stream.read(end + 1 if end >= 0 else wanted)
+            if end >= 0:
+                break
+        return bytes(line)
+
+class RequestBody:
+    """The body of one request on a persistent connection.
+    
+    Reads stop at Content-Length so a handler can never consume the start
+    of the next request, and drain() discards whatever the handler left
+    unread (e.g. when it rejected the request before parsing the body).
+    """
+    
+    def __init__(self, stream, length):
+        self._stream = stream
+        self.remaining = length
+    
+    def _limit(self, size):
+        if size is None or size < 0 or size > self.remaining:
+            return self.remaining
+        return size
+    
+    def read(self, size=-1):
+        size = self._limit(size)
+        data = self._stream.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+    
+    def readline(self, size=-1):
+        size = self._limit(size)
+        data = self._stream.readline(size) if size else b''
+        self.remaining -= len(data)
+        return data
+    
+    def drain(self, limit):
+        """Discard the unread body; False if it was too large or the client went away"""
+        if self.remaining > limit:
+            return False
+        while self.remaining:
+            if not self.read(min(self.remaining, 64 * 1024)):
+                return False
+        return True
+
+# Query parameters whose values are kept out of the access log and traces
+_SECRET_PARAMETERS = re.compile(r'([?&]token=)[^&\s]*')
+
+def _redact(target):
+    return _SECRET_PARAMETERS.sub(r'\1[REDACTED]', target)
+
+def _route(path):
+    """Path with its id segments replaced, for naming request spans"""
+    return '/'.join(':id' if any(c.isdigit() for c in segment) else segment for segment in path.split('?', 1)[0].split('/'))
+
+class ThreadingServer(socketserver.ThreadingTCPServer):
+    # Threads parked on idle keep-alive connections must not hold up shutdown
+    daemon_threads = True
+    # Connections waiting to be accepted (socketserver's default of 5 refuses bursts)
+    request_queue_size = CONFIG.server.listen_backlog
+
+    def __init__(self, *args, **kwargs):
+        self._workers = threading.BoundedSemaphore(MAX_WORKERS)
+        self._closing = False
+        super().__init__(*args, **kwargs)
+
+    def process_request(self, request, client_address):
+        # Hold the accepted connection until a worker is free; the rest wait in the backlog
+        while not self._workers.acquire(timeout=0.5):
+            if self._closing:
+                self.shutdown_request(request)
+                return
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self._workers.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._workers.release()
+
+    def shutdown(self):
+        # Stop waiting for a free worker, or serve_forever() would not return until one frees up
+        self._closing = True
+        super().shutdown()
 
 class RequestHandler(http.server.BaseHTTPRequestHandler):
     
-    def _set_response(self, status_code=200, content_type='application/json'):
+    # Keep connections open between requests; socket reads time out after the idle limit
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEP_ALIVE_TIMEOUT
+    # Headers and body go out in separate writes; don't let Nagle delay the body
+    disable_nagle_algorithm = True
+    
+    def setup(self):
+        super().setup()
+        self._connection_rfile = self.rfile
+        self._reader = DeadlineReader(self.rfile, self.connection, self.timeout)
+        self.requests_handled = 0
+    
+    def handle_one_request(self):
+        self._reader.expect_request(HEADER_TIMEOUT)
+        self.rfile = self._reader
+        self._profile_id = self._profile = None
+        self._span = None
+        self._in_flight = False
+        try:
+            super().handle_one_request()
+        finally:
+            if self._in_flight:
+                IN_FLIGHT.end()
+            if self._profile is not None:
+                from profiler import REQUEST_PROFILES
+                REQUEST_PROFILES.finish(self._profile_id, self._profile, self.requestline)
+            if self._span is not None:
+                deactivate(self._span_token)
+                self._span.end()
+        
+        # Leave the stream positioned at the next request
+        if isinstance(self.rfile, RequestBody) and not self.close_connection:
+            if not self.rfile.drain(MAX_DRAIN_BYTES):
+                self.close_connection = True
+        self.rfile = self._connection_rfile
+    
+    def finish(self):
+        # A handler that raised leaves its RequestBody in place of the connection's stream
+        self.rfile = self._connection_rfile
+        super().finish()
+    
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        self.requestline = _redact(self.requestline)
+        
+        # Counted until handled, so a shutdown can wait for it
+        IN_FLIGHT.begin()
+        self._in_flight = True
+        
+        if not self._length_given():
+            return False
+        content_length = self._content_length()
+        if content_length is None:
+            self.send_error(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+            return False
+        if not self._body_allowed(content_length):
+            return False
+        self.rfile = RequestBody(self._reader, content_length)
+        if content_length:
+            self._reader.deadline = time.monotonic() + BODY_TIMEOUT + content_length / MIN_BODY_RATE
+        
+        self.requests_handled += 1
+        if self.requests_handled >= MAX_REQUESTS_PER_CONNECTION:
+            self.close_connection = True
+        
+        # While shutting down or reloading, clients are told not to reuse the connection
+        if stopping():
+            self.close_connection = True
+        
+        if not self._started_up():
+            return False
+        
+        # Route this request's reads; callers that just wrote keep reading from the primary
+        begin_request(self.headers.get('Authorization'))
+        
+        # Continue the caller's trace (W3C traceparent header) or start a new one
+        if tracing_enabled():
+            self._span = start_span(
+                f"{self.command} {_route(self.path)}", 'server',
+                {"http.method": self.command, "http.target": _redact(self.path)},
+                parse_traceparent(self.headers.get('traceparent'))
+            )
+            self._span_token = activate(self._span)
+        
+        # Admins can have a single request run under cProfile
+        if self.headers.get('X-Profile'):
+            self._start_request_profile()
+        return True
+    
+    def _started_up(self):
+        """False after answering 503 while the database is still being prepared.
+        
+        Only the probes and CORS preflights are answered before then, so no
+        request reaches tables that are still being created or migrated.
+        """
+        if STARTUP.prepared or self.command == 'OPTIONS':
+            return True
+        if urllib.parse.urlparse(self.path).path in ('/healthz', '/readyz'):
+            return True
+        self._send_json({"error": "Server is starting up"}, 503)
+        return False
+    
+    def _content_length(self):
+        try:
+            return max(int(self.headers.get('Content-Length') or 0), 0)
+        except ValueError:
+            return None
+    
+    def _length_given(self):
+        """False after answering 411 if the body is sent with a Transfer-Encoding.
+        
+        Chunked bodies are not supported: their size is unknown until they have
+        been read, so they could not be held to the route's limit.
+        """
+        if not self.headers.get('Transfer-Encoding'):
+            return True
+        # The body is never read, so the connection cannot carry another request
+        self.close_connection = True
+        self._send_json({"error": "Request bodies must be sent with Content-Length"}, 411)
+        return False
+    
+    def _body_allowed(self, content_length):
+        """False after answering 413 if the declared body is over the route's limit"""
+        limit = BODY_LIMITS.get(_route(self.path), MAX_BODY_BYTES)
+        if content_length <= limit:
+            return True
+        # The body is never read, so the connection cannot carry another request
+        self.close_connection = True
+        self._send_json({"error": f"Request body too large (limit {limit} bytes)"}, 413)
+        return False
+    
+    def handle_expect_100(self):
+        # Refuse an oversized or chunked body before the client starts sending it
+        if not self._length_given():
+            return False
+        content_length = self._content_length()
+        if content_length is not None and not self._body_allowed(content_length):
+            return False
+        return super().handle_expect_100()
+    
+    def _read_json(self):
+        """The request's JSON body ({} without one), or None after answering 400"""
+        if not self.rfile.remaining or "application/json" not in self.headers.get('Content-Type', ''):
+            return {}
+        try:
+            # The body is already known to be within the route's limit
+            return json.loads(self.rfile.read())
+        except ValueError:
+            self._send_json({"error": "Invalid JSON body"}, 400)
+            return None
+    
+    def _start_request_profile(self):
+        # Profiling support (cProfile, pstats) is only loaded once someone asks for it
+        from profiler import REQUEST_PROFILES
+        token = extract_auth_token(self)
+        payload = verify_token(token) if token else None
+        if not isinstance(payload, dict) or "error" in payload or not payload.get("is_admin", False):
+            return
+        self._profile_id, self._profile = REQUEST_PROFILES.start()
+    
+    def log_request(self, code='-', size='-'):
+        if self._span is not None and isinstance(code, int):
+            self._span.set_attribute("http.status_code", int(code))
+            if code >= 500:
+                self._span.set_error(f"HTTP {code}")
+        super().log_request(code, size)
+    
+    def _set_response(self, status_code=200, content_type='application/json', headers=None, content_length=0):
         self.send_response(status_code)
         self.send_header('Content-type', content_type)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        self.send_header('Content-Length', str(content_length))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        # Pre-rendered CORS lines go straight into the header buffer flushed by end_headers
+        if self.request_version != 'HTTP/0.9':
+            self._headers_buffer.append(CORS.response_headers(self.headers.get('Origin')))
+        if self._profile_id:
+            self.send_header('X-Profile-Id', self._profile_id)
+        if self.close_connection:
+            self.send_header('Connection', 'close')
         self.end_headers()
     
+    def _send_json(self, data, status_code=200):
+        """Send data as a JSON response"""
+        self._send_variants(CompressedVariants(dumps(data)), status_code)
+    
+    def _send_variants(self, variants, status_code=200):
+        """Send a JSON body, compressed if the client accepts an encoding we support"""
+        encoding = negotiate(self.headers.get('Accept-Encoding'), len(variants.body))
+        headers = {'Vary': 'Accept-Encoding'}
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        body = variants.encode(encoding)
+        self._set_response(status_code, headers=headers, content_length=len(body))
+        self.wfile.write(body)
+    
+    def _send_cached(self, key, load):
+        """Send a public response from the catalogue cache, loading it on a miss"""
+        variants = CATALOGUE_CACHE.get(key)
+        if variants is None:
+            generation = CATALOGUE_CACHE.generation
+            response = load()
+            variants = CompressedVariants(dumps(response))
+            if "error" not in response:
+                CATALOGUE_CACHE.put(key, variants, generation)
+        self._send_variants(variants)
+    
     def do_OPTIONS(self):
-        self._set_response()
+        """Answer CORS preflights with a pre-rendered response in a single write"""
+        status, response = CORS.preflight_response(
+            self.headers.get('Origin'), self.date_time_string(), self.close_connection
+        )
+        self.log_request(status)
+        self.wfile.write(response)
     
     def do_GET(self):
         parsed_url = urllib.parse.urlparse(self.path)
         path = parsed_url.path
         
+        # Liveness: the process is up and answering requests
+        if path == '/healthz':
+            self._send_json({"status": "ok"})
+            return
+        
+        # Readiness: the database is reachable, initialized and migrated
+        elif path == '/readyz':
+            self._send_json(STARTUP.snapshot(), 200 if STARTUP.ready else 503)
+            return
+        
         # Serve uploaded files
-        if path.startswith('/uploads/'):
+        elif path.startswith('/uploads/'):
             file_path = os.path.join(os.path.dirname(__file__), '..', 'public', path[1:])
             if os.path.exists(file_path):
                 # Determine content type based on file extension
@@ -55,81 +459,240 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
                 elif ext.lower() == '.gif':
                     content_type = 'image/gif'
                 
+                # Stream the file instead of reading it into memory
                 with open(file_path, 'rb') as file:
-                    self.send_response(200)
-                    self.send_header('Content-type', content_type)
-                    self.end_headers()
-                    self.wfile.write(file.read())
+                    self._set_response(200, content_type, content_length=os.fstat(file.fileno()).st_size)
+                    shutil.copyfileobj(file, self.wfile)
                 return
             else:
-                self._set_response(404)
-                self.wfile.write(json_dumps({"error": "File not found"}).encode())
+                self._send_json({"error": "File not found"}, 404)
                 return
         
         # Handle GET /artworks
         elif path == '/artworks':
-            response = get_all_artworks()
-            self._set_response()
-            self.wfile.write(json_dumps(response).encode())
+            self._send_cached('/artworks', get_all_artworks)
             return
         
         # Handle GET /artworks/{id}
         elif path.startswith('/artworks/') and len(path.split('/')) == 3:
             artwork_id = path.split('/')[2]
-            response = get_artwork(artwork_id)
-            self._set_response()
-            self.wfile.write(json_dumps(response).encode())
+            
+            # Signing in is optional; it lets the buyer holding the artwork get back to paying for it
+            user_id = None
+            token = extract_auth_token(self)
+            if token:
+                payload = verify_token(token)
+                if "error" not in payload and not payload.get("is_admin", False):
+                    user_id = payload.get("sub")
+            
+            response = get_artwork(artwork_id, user_id)
+            self._send_json(response)
             return
         
         # Handle GET /exhibitions
         elif path == '/exhibitions':
-            response = get_all_exhibitions()
-            self._set_response()
-            self.wfile.write(json_dumps(response).encode())
+            self._send_cached('/exhibitions', get_all_exhibitions)
             return
         
         # Handle GET /exhibitions/{id}
         elif path.startswith('/exhibitions/') and len(path.split('/')) == 3:
             exhibition_id = path.split('/')[2]
             response = get_exhibition(exhibition_id)
-            self._set_response()
-            self.wfile.write(json_dumps(response).encode())
+            self._send_json(response)
+            return
+        
+        # Handle GET /me/orders and /me/bookings (the signed-in user's history)
+        elif path in ('/me/orders', '/me/bookings'):
+            token = extract_auth_token(self)
+            if not token:
+                self._send_json({"error": "Authentication required"}, 401)
+                return
+            
+            payload = verify_token(token)
+            if isinstance(payload, dict) and "error" in payload:
+                self._send_json({"error": payload["error"]}, 401)
+                return
+            
+            # Admin ids are a separate id space from user ids
+            if payload.get("is_admin", False):
+                self._send_json({"error": "Admin accounts have no orders or bookings"}, 403)
+                return
+            
+            query_params = parse_qs(parsed_url.query)
+            page = query_params.get('page', [1])[0]
+            page_size = query_params.get('pageSize', [20])[0]
+            
+            if path == '/me/orders':
+                response = get_user_orders(payload.get("sub"), page, page_size)
+            else:
+                response = get_user_bookings(payload.get("sub"), page, page_size)
+            
+            if "error" in response:
+                self._send_json(response, 400)
+            else:
+                self._send_json(response)
+            return
+        
+        # Handle GET /admin/orders, /admin/bookings, /admin/stats and /admin/metrics (admin only)
+        elif path in ('/admin/orders', '/admin/bookings', '/admin/stats', '/admin/metrics'):
+            token = extract_auth_token(self)
+            if not token:
+                self._send_json({"error": "Authentication required"}, 401)
+                return
+            
+            payload = verify_token(token)
+            if isinstance(payload, dict) and "error" in payload:
+                self._send_json({"error": payload["error"]}, 401)
+                return
+            
+            # Check if user is admin
+            if not payload.get("is_admin", False):
+                self._send_json({"error": "Unauthorized access: Admin privileges required"}, 403)
+                return
+            
+            query_params = parse_qs(parsed_url.query)
+            page = query_params.get('page', [1])[0]
+            page_size = query_params.get('pageSize', [20])[0]
+            status = query_params.get('status', [None])[0]
+            
+            if path == '/admin/orders':
+                response = get_all_orders(page, page_size, status)
+            elif path == '/admin/bookings':
+                response = get_all_bookings(page, page_size, status)
+            elif path == '/admin/metrics':
+                try:
+                    limit = int(query_params.get('limit', [50])[0])
+                except ValueError:
+                    limit = 50
+                response = {"database": QUERY_STATS.snapshot(limit)}
+            else:
+                from reports import get_sales_stats
+                response = get_sales_stats(query_params.get('days', [30])[0])
+            
+            if "error" in response:
+                self._send_json(response, 400)
+            else:
+                self._send_json(response)
+            return
+        
+        # Handle GET /admin/profile and /admin/profile/requests/{id} (admin only)
+        elif path == '/admin/profile' or path.startswith('/admin/profile/requests/'):
+            token = extract_auth_token(self)
+            if not token:
+                self._send_json({"error": "Authentication required"}, 401)
+                return
+            
+            payload = verify_token(token)
+            if isinstance(payload, dict) and "error" in payload:
+                self._send_json({"error": payload["error"]}, 401)
+                return
+            
+            # Check if user is admin
+            if not payload.get("is_admin", False):
+                self._send_json({"error": "Unauthorized access: Admin privileges required"}, 403)
+                return
+            
+            from profiler import REQUEST_PROFILES, sample_stacks, collapsed
+            query_params = parse_qs(parsed_url.query)
+            output_format = query_params.get('format', [None])[0]
+            
+            if path == '/admin/profile':
+                # Sample all threads for a few seconds; this request blocks until done
+                response = sample_stacks(
+                    query_params.get('seconds', [10])[0],
+                    query_params.get('interval', [0.01])[0],
+                    query_params.get('idle', ['0'])[0] == '1'
+                )
+                if "error" in response:
+                    self._send_json(response, 409 if "already running" in response["error"] else 400)
+                elif output_format == 'json':
+                    self._send_json({
+                        "samples": response["samples"],
+                        "stacks": [{"stack": stack, "count": count} for stack, count in response["stacks"].most_common()]
+                    })
+                else:
+                    body = collapsed(response["stacks"]).encode()
+                    self._set_response(200, 'text/plain; charset=utf-8', content_length=len(body))
+                    self.wfile.write(body)
+                return
+            
+            profile_id = path.split('/')[4]
+            if output_format == 'pstats':
+                body = REQUEST_PROFILES.raw(profile_id)
+                content_type = 'application/octet-stream'
+            else:
+                try:
+                    limit = int(query_params.get('limit', [40])[0])
+                except ValueError:
+                    limit = 40
+                report = REQUEST_PROFILES.report(profile_id, query_params.get('sort', ['cumulative'])[0], limit)
+                body = report.encode() if report is not None else None
+                content_type = 'text/plain; charset=utf-8'
+            
+            if body is None:
+                self._send_json({"error": "Profile not found"}, 404)
+            else:
+                self._set_response(200, content_type, content_length=len(body))
+                self.wfile.write(body)
+            return
+        
+        # Handle GET /mpesa/status/{checkoutRequestId} (the signed-in user's own payments)
+        elif path.startswith('/mpesa/status/') and len(path.split('/')) == 4:
+            token = extract_auth_token(self)
+            if not token:
+                self._send_json({"error": "Authentication required"}, 401)
+                return
+            
+            payload = verify_token(token)
+            if isinstance(payload, dict) and "error" in payload:
+                self._send_json({"error": payload["error"]}, 401)
+                return
+            
+            # Admin ids are a separate id space from user ids
+            if payload.get("is_admin", False):
+                self._send_json({"error": "Admin accounts have no payments"}, 403)
+                return
+            
+            checkout_request_id = path.split('/')[3]
+            response = check_transaction_status(checkout_request_id, payload.get("sub"))
+            
+            if "error" in response:
+                self._send_json(response, 404 if "not found" in response["error"] else 400)
+            else:
+                self._send_json(response)
             return
         
         # Handle GET /messages (admin only)
         elif path == '/messages':
             token = extract_auth_token(self)
             if not token:
-                self._set_response(401)
-                self.wfile.write(json_dumps({"error": "Authentication required"}).encode())
+                self._send_json({"error": "Authentication required"}, 401)
                 return
             
             payload = verify_token(token)
             if isinstance(payload, dict) and "error" in payload:
-                self._set_response(401)
-                self.wfile.write(json_dumps({"error": payload["error"]}).encode())
+                self._send_json({"error": payload["error"]}, 401)
                 return
             
             # Check if user is admin
             if not payload.get("is_admin", False):
-                self._set_response(403)
-                self.wfile.write(json_dumps({"error": "Unauthorized access: Admin privileges required"}).encode())
+                self._send_json({"error": "Unauthorized access: Admin privileges required"}, 403)
                 return
             
             response = get_all_contact_messages()
-            self._set_response()
-            self.wfile.write(json_dumps(response).encode())
+            self._send_json(response)
             return
         
         # Default 404 response
-        self._set_response(404)
-        self.wfile.write(json_dumps({"error": "Resource not found"}).encode())
+        self._send_json({"error": "Resource not found"}, 404)
     
     def do_POST(self):
-        path = self.path
+        parsed_url = urllib.parse.urlparse(self.path)
+        path = parsed_url.path
         
         # Parse form data (for multipart/form-data)
         if "multipart/form-data" in self.headers.get('Content-Type', ''):
+            import cgi
             form = cgi.FieldStorage(
                 fp=self.rfile,
                 headers=self.headers,
@@ -146,20 +709,17 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
                 # Check if admin is authenticated
                 token = extract_auth_token(self)
                 if not token:
-                    self._set_response(401)
-                    self.wfile.write(json_dumps({"error": "Authentication required"}).encode())
+                    self._send_json({"error": "Authentication required"}, 401)
                     return
                 
                 payload = verify_token(token)
                 if isinstance(payload, dict) and "error" in payload:
-                    self._set_response(401)
-                    self.wfile.write(json_dumps({"error": payload["error"]}).encode())
+                    self._send_json({"error": payload["error"]}, 401)
                     return
                 
                 # Check if user is admin
                 if not payload.get("is_admin", False):
-                    self._set_response(403)
-                    self.wfile.write(json_dumps({"error": "Unauthorized access: Admin privileges required"}).encode())
+                    self._send_json({"error": "Unauthorized access: Admin privileges required"}, 403)
                     return
                 
                 # Process form data
@@ -187,11 +747,9 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
                 response = create_artwork(auth_header, post_data)
                 
                 if "error" in response:
-                    self._set_response(400)
+                    self._send_json(response, 400)
                 else:
-                    self._set_response(201)
-                
-                self.wfile.write(json_dumps(response).encode())
+                    self._send_json(response, 201)
                 return
             
             # Create exhibition with file upload (admin only)
@@ -201,20 +759,17 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
                 # Check if admin is authenticated
                 token = extract_auth_token(self)
                 if not token:
-                    self._set_response(401)
-                    self.wfile.write(json_dumps({"error": "Authentication required"}).encode())
+                    self._send_json({"error": "Authentication required"}, 401)
                     return
                 
                 payload = verify_token(token)
                 if isinstance(payload, dict) and "error" in payload:
-                    self._set_response(401)
-                    self.wfile.write(json_dumps({"error": payload["error"]}).encode())
+                    self._send_json({"error": payload["error"]}, 401)
                     return
                 
                 # Check if user is admin
                 if not payload.get("is_admin", False):
-                    self._set_response(403)
-                    self.wfile.write(json_dumps({"error": "Unauthorized access: Admin privileges required"}).encode())
+                    self._send_json({"error": "Unauthorized access: Admin privileges required"}, 403)
                     return
                 
                 # Process form data
@@ -242,38 +797,28 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
                 response = create_exhibition(auth_header, post_data)
                 
                 if "error" in response:
-                    self._set_response(400)
+                    self._send_json(response, 400)
                 else:
-                    self._set_response(201)
-                
-                self.wfile.write(json_dumps(response).encode())
+                    self._send_json(response, 201)
                 return
         
-        # Get content length for regular JSON data
-        content_length = int(self.headers.get('Content-Length', 0))
-        
         # Parse JSON data
-        post_data = {}
-        if content_length > 0 and "application/json" in self.headers.get('Content-Type', ''):
-            post_data = json.loads(self.rfile.read(content_length).decode('utf-8'))
-            print(f"Parsed JSON data: {post_data}")
+        post_data = self._read_json()
+        if post_data is None:
+            return
         
         # Register user
         if path == '/register':
             if not post_data:
-                self._set_response(400)
-                self.wfile.write(json_dumps({"error": "Missing registration data"}).encode())
+                self._send_json({"error": "Missing registration data"}, 400)
                 return
             
-            print(f"Registration data: {post_data}")
-            
             # Check required fields
             required_fields = ['name', 'email', 'password']
             missing_fields = [field for field in required_fields if field not in post_data]
             
             if missing_fields:
-                self._set_response(400)
-                self.wfile.write(json_dumps({"error": f"Missing required fields: {', '.join(missing_fields)}"}).encode())
+                self._send_json({"error": f"Missing required fields: {', '.join(missing_fields)}"}, 400)
                 return
             
             # Register the user
@@ -285,63 +830,53 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
             )
             
             if "error" in response:
-                self._set_response(400)
+                self._send_json(response, 400)
             else:
-                self._set_response(201)
-            
-            self.wfile.write(json_dumps(response).encode())
+                self._send_json(response, 201)
             return
         
         # User login
         elif path == '/login':
             if not post_data:
-                self._set_response(400)
-                self.wfile.write(json_dumps({"error": "Missing login data"}).encode())
+                self._send_json({"error": "Missing login data"}, 400)
                 return
             
             # Check required fields
             if 'email' not in post_data or 'password' not in post_data:
-                self._set_response(400)
-                self.wfile.write(json_dumps({"error": "Email and password required"}).encode())
+                self._send_json({"error": "Email and password required"}, 400)
                 return
             
             # Login the user
             response = login_user(post_data['email'], post_data['password'])
             
             if "error" in response:
-                self._set_response(401)
-                self.wfile.write(json_dumps(response).encode())
+                self._send_json(response, 401)
                 return
             
-            self._set_response(200)
-            self.wfile.write(json_dumps(response).encode())
+            self._send_json(response)
             return
         
         # Admin login - handle both URL formats
         elif path == '/admin/login' or path == '/admin-login':
             if not post_data:
-                self._set_response(400)
-                self.wfile.write(json_dumps({"error": "Missing login data"}).encode())
+                self._send_json({"error": "Missing login data"}, 400)
                 return
             
             # Check required fields
             if 'email' not in post_data or 'password' not in post_data:
-                self._set_response(400)
-                self.wfile.write(json_dumps({"error": "Email and password required"}).encode())
+                self._send_json({"error": "Email and password required"}, 400)
                 return
             
-            print(f"POST to {path} with content type: {self.headers.get('Content-Type')}, length: {content_length}")
+            print(f"POST to {path} with content type: {self.headers.get('Content-Type')}, length: {self.headers.get('Content-Length')}")
             
             # Login as admin
             response = login_admin(post_data['email'], post_data['password'])
             
             if "error" in response:
-                self._set_response(401)
-                self.wfile.write(json_dumps(response).encode())
+                self._send_json(response, 401)
                 return
             
-            self._set_response(200)
-            self.wfile.write(json_dumps(response).encode())
+            self._send_json(response)
             return
         
         # Create contact message
@@ -351,56 +886,114 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
             missing_fields = [field for field in required_fields if field not in post_data]
             
             if missing_fields:
-                self._set_response(400)
-                self.wfile.write(json_dumps({"error": f"Missing required fields: {', '.join(missing_fields)}"}).encode())
+                self._send_json({"error": f"Missing required fields: {', '.join(missing_fields)}"}, 400)
                 return
             
             response = create_contact_message(post_data)
             
             if "error" in response:
-                self._set_response(400)
+                self._send_json(response, 400)
             else:
-                self._set_response(201)
+                self._send_json(response, 201)
+            return
+        
+        # Checkout a cart, or order a single artwork or exhibition booking
+        elif path in ('/checkout', '/orders/artwork', '/orders/exhibition'):
+            token = extract_auth_token(self)
+            if not token:
+                self._send_json({"error": "Authentication required"}, 401)
+                return
             
-            self.wfile.write(json_dumps(response).encode())
+            payload = verify_token(token)
+            if isinstance(payload, dict) and "error" in payload:
+                self._send_json({"error": payload["error"]}, 401)
+                return
+            
+            # Orders belong to users, not admins
+            if payload.get("is_admin", False):
+                self._send_json({"error": "Admin accounts cannot place orders"}, 403)
+                return
+            
+            user_id = payload.get("sub")
+            
+            if path == '/checkout':
+                response = create_checkout(user_id, post_data)
+            elif path == '/orders/artwork':
+                response = create_artwork_order(user_id, post_data)
+            else:
+                response = create_exhibition_booking(user_id, post_data)
+            
+            if "error" in response:
+                error_message = response["error"]
+                
+                if "available" in error_message or "reserved" in error_message:
+                    self._send_json(response, 409)
+                elif "not found" in error_message:
+                    self._send_json(response, 404)
+                else:
+                    self._send_json(response, 400)
+            else:
+                self._send_json(response, 201)
             return
         
-        # STK Push for M-Pesa payment
+        # STK Push for one of the signed-in user's pending orders or bookings
         elif path == '/mpesa/stk-push':
-            # Check required fields
-            required_fields = ['phoneNumber', 'amount', 'accountReference', 'orderType', 'orderId', 'userId']
+            token = extract_auth_token(self)
+            if not token:
+                self._send_json({"error": "Authentication required"}, 401)
+                return
+            
+            payload = verify_token(token)
+            if isinstance(payload, dict) and "error" in payload:
+                self._send_json({"error": payload["error"]}, 401)
+                return
+            
+            if payload.get("is_admin", False):
+                self._send_json({"error": "Admin accounts cannot place orders"}, 403)
+                return
+            
+            # Check required fields; the amount is taken from the order, not the request
+            required_fields = ['phoneNumber', 'accountReference', 'orderType', 'orderId']
             missing_fields = [field for field in required_fields if field not in post_data]
             
             if missing_fields:
-                self._set_response(400)
-                self.wfile.write(json_dumps({"error": f"Missing required fields: {', '.join(missing_fields)}"}).encode())
-                return
-            
-            # Process STK Push (simulate success for development)
-            checkout_request_id = str(uuid.uuid4())
-            merchant_request_id = str(uuid.uuid4())
-            
-            # Simulate a successful response
-            response = {
-                "success": True,
-                "checkoutRequestId": checkout_request_id,
-                "merchantRequestId": merchant_request_id,
-                "responseCode": "0",
-                "responseDescription": "Success. Request accepted for processing",
-                "customerMessage": "Success. Request accepted for processing"
-            }
-            
-            self._set_response(200)
-            self.wfile.write(json_dumps(response).encode())
+                self._send_json({"error": f"Missing required fields: {', '.join(missing_fields)}"}, 400)
+                return
+            
+            response = handle_stk_push_request(payload.get("sub"), post_data)
+            
+            if "error" in response:
+                error_message = response["error"]
+                
+                if "available" in error_message or "reserved" in error_message:
+                    self._send_json(response, 409)
+                elif "not found" in error_message:
+                    self._send_json(response, 404)
+                else:
+                    self._send_json(response, 400)
+            else:
+                self._send_json(response)
             return
         
         # M-Pesa callback (for webhook)
         elif path == '/mpesa/callback':
-            # Process M-Pesa callback data (simulate success for development)
-            response = {"success": True}
+            # Only Daraja knows the token, which it was given in the callback URL
+            callback_token = parse_qs(parsed_url.query).get('token', [None])[0]
+            if not verify_callback_token(callback_token):
+                self._send_json({"error": "Forbidden"}, 403)
+                return
             
-            self._set_response(200)
-            self.wfile.write(json_dumps(response).encode())
+            # Daraja wraps the result in Body.stkCallback
+            callback_data = post_data.get("Body", {}) if isinstance(post_data, dict) else None
+            if isinstance(callback_data, dict):
+                callback_data = callback_data.get("stkCallback", post_data)
+            if not isinstance(callback_data, dict):
+                self._send_json({"error": "Callback body must be a JSON object"}, 400)
+                return
+            response = handle_mpesa_callback(callback_data)
+            
+            # Always acknowledge so Daraja does not retry
+            self._send_json(response)
             return
         
         # Update message status (admin only)
@@ -410,47 +1003,41 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
             # Verify admin token and extract user info
             token = extract_auth_token(self)
             if not token:
-                self._set_response(401)
-                self.wfile.write(json_dumps({"error": "Authentication required"}).encode())
+                self._send_json({"error": "Authentication required"}, 401)
                 return
             
             payload = verify_token(token)
             if isinstance(payload, dict) and "error" in payload:
-                self._set_response(401)
-                self.wfile.write(json_dumps({"error": payload["error"]}).encode())
+                self._send_json({"error": payload["error"]}, 401)
                 return
             
             # Check if user is admin
             if not payload.get("is_admin", False):
-                self._set_response(403)
-                self.wfile.write(json_dumps({"error": "Unauthorized access: Admin privileges required"}).encode())
+                self._send_json({"error": "Unauthorized access: Admin privileges required"}, 403)
                 return
             
             # Check required fields
             if 'message_id' not in post_data or 'status' not in post_data:
-                self._set_response(400)
-                self.wfile.write(json_dumps({"error": "Message ID and status required"}).encode())
+                self._send_json({"error": "Message ID and status required"}, 400)
                 return
             
             response = update_message_status(post_data['message_id'], post_data['status'])
             
             if "error" in response:
-                self._set_response(400)
+                self._send_json(response, 400)
             else:
-                self._set_response(200)
-            
-            self.wfile.write(json_dumps(response).encode())
+                self._send_json(response)
             return
         
         # Default 404 response
-        self._set_response(404)
-        self.wfile.write(json_dumps({"error": "Resource not found"}).encode())
+        self._send_json({"error": "Resource not found"}, 404)
     
     def do_PUT(self):
         path = self.path
         
         # Parse form data (for multipart/form-data)
         if "multipart/form-data" in self.headers.get('Content-Type', ''):
+            import cgi
             form = cgi.FieldStorage(
                 fp=self.rfile,
                 headers=self.headers,
@@ -468,20 +1055,17 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
                 # Check if admin is authenticated
                 token = extract_auth_token(self)
                 if not token:
-                    self._set_response(401)
-                    self.wfile.write(json_dumps({"error": "Authentication required"}).encode())
+                    self._send_json({"error": "Authentication required"}, 401)
                     return
                 
                 payload = verify_token(token)
                 if isinstance(payload, dict) and "error" in payload:
-                    self._set_response(401)
-                    self.wfile.write(json_dumps({"error": payload["error"]}).encode())
+                    self._send_json({"error": payload["error"]}, 401)
                     return
                 
                 # Check if user is admin
                 if not payload.get("is_admin", False):
-                    self._set_response(403)
-                    self.wfile.write(json_dumps({"error": "Unauthorized access: Admin privileges required"}).encode())
+                    self._send_json({"error": "Unauthorized access: Admin privileges required"}, 403)
                     return
                 
                 # Process form data
@@ -512,19 +1096,16 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
                     error_message = response["error"]
                     
                     if "Authentication" in error_message or "authorized" in error_message:
-                        self._set_response(401)
+                        self._send_json({"error": error_message}, 401)
                     elif "Admin" in error_message:
-                        self._set_response(403)
+                        self._send_json({"error": error_message}, 403)
                     elif "not found" in error_message:
-                        self._set_response(404)
+                        self._send_json({"error": error_message}, 404)
                     else:
-                        self._set_response(400)
-                        
-                    self.wfile.write(json_dumps({"error": error_message}).encode())
+                        self._send_json({"error": error_message}, 400)
                     return
                 
-                self._set_response(200)
-                self.wfile.write(json_dumps(response).encode())
+                self._send_json(response)
                 return
             
             # Update exhibition with file upload (admin only)
@@ -535,20 +1116,17 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
                 # Check if admin is authenticated
                 token = extract_auth_token(self)
                 if not token:
-                    self._set_response(401)
-                    self.wfile.write(json_dumps({"error": "Authentication required"}).encode())
+                    self._send_json({"error": "Authentication required"}, 401)
                     return
                 
                 payload = verify_token(token)
                 if isinstance(payload, dict) and "error" in payload:
-                    self._set_response(401)
-                    self.wfile.write(json_dumps({"error": payload["error"]}).encode())
+                    self._send_json({"error": payload["error"]}, 401)
                     return
                 
                 # Check if user is admin
                 if not payload.get("is_admin", False):
-                    self._set_response(403)
-                    self.wfile.write(json_dumps({"error": "Unauthorized access: Admin privileges required"}).encode())
+                    self._send_json({"error": "Unauthorized access: Admin privileges required"}, 403)
                     return
                 
                 # Process form data
@@ -579,32 +1157,25 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
                     error_message = response["error"]
                     
                     if "Authentication" in error_message or "authorized" in error_message:
-                        self._set_response(401)
+                        self._send_json({"error": error_message}, 401)
                     elif "Admin" in error_message:
-                        self._set_response(403)
+                        self._send_json({"error": error_message}, 403)
                     elif "not found" in error_message:
-                        self._set_response(404)
+                        self._send_json({"error": error_message}, 404)
                     else:
-                        self._set_response(400)
-                        
-                    self.wfile.write(json_dumps({"error": error_message}).encode())
+                        self._send_json({"error": error_message}, 400)
                     return
                 
-                self._set_response(200)
-                self.wfile.write(json_dumps(response).encode())
+                self._send_json(response)
                 return
         
-        # Get content length for regular JSON data
-        content_length = int(self.headers.get('Content-Length', 0))
-        
         # Parse JSON data
-        post_data = {}
-        if content_length > 0 and "application/json" in self.headers.get('Content-Type', ''):
-            post_data = json.loads(self.rfile.read(content_length).decode('utf-8'))
+        post_data = self._read_json()
+        if post_data is None:
+            return
         
         # Default 404 response
-        self._set_response(404)
-        self.wfile.write(json_dumps({"error": "Resource not found"}).encode())
+        self._send_json({"error": "Resource not found"}, 404)
     
     def do_DELETE(self):
         # Process based on path
@@ -621,19 +1192,16 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
                 error_message = response["error"]
                 
                 if "Authentication" in error_message or "authorized" in error_message:
-                    self._set_response(401)
+                    self._send_json({"error": error_message}, 401)
                 elif "Admin" in error_message:
-                    self._set_response(403)
+                    self._send_json({"error": error_message}, 403)
                 elif "not found" in error_message:
-                    self._set_response(404)
+                    self._send_json({"error": error_message}, 404)
                 else:
-                    self._set_response(400)
-                    
-                self.wfile.write(json_dumps({"error": error_message}).encode())
+                    self._send_json({"error": error_message}, 400)
                 return
             
-            self._set_response(200)
-            self.wfile.write(json_dumps(response).encode())
+            self._send_json(response)
             return
         
         # Delete exhibition (admin only)
@@ -647,47 +1215,48 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
                 error_message = response["error"]
                 
                 if "Authentication" in error_message or "authorized" in error_message:
-                    self._set_response(401)
+                    self._send_json({"error": error_message}, 401)
                 elif "Admin" in error_message:
-                    self._set_response(403)
+                    self._send_json({"error": error_message}, 403)
                 elif "not found" in error_message:
-                    self._set_response(404)
+                    self._send_json({"error": error_message}, 404)
                 else:
-                    self._set_response(400)
-                    
-                self.wfile.write(json_dumps({"error": error_message}).encode())
+                    self._send_json({"error": error_message}, 400)
                 return
             
-            self._set_response(200)
-            self.wfile.write(json_dumps(response).encode())
+            self._send_json(response)
             return
         
         # Default 404 response
-        self._set_response(404)
-        self.wfile.write(json_dumps({"error": "Resource not found"}).encode())
+        self._send_json({"error": "Resource not found"}, 404)
 
 def main():
     """Start the server"""
-    # Initialize the database
-    print("Initializing database...")
-    initialize_database()
-    
     # Create uploads directory
     print(f"Ensuring uploads directory exists at: {UPLOAD_DIR}")
     os.makedirs(UPLOAD_DIR, exist_ok=True)
     
-    # Create an HTTP server
-    print(f"Starting server on port {PORT}...")
-    httpd = socketserver.ThreadingTCPServer(("", PORT), RequestHandler)
-    print(f"Server running on port {PORT}")
+    # Create an HTTP server, or take over the socket of the process that reloaded into this one
+    listener = inherited_socket()
+    if listener is None:
+        print(f"Starting server on port {PORT}...")
+        httpd = ThreadingServer(("", PORT), RequestHandler)
+    else:
+        httpd = ThreadingServer(listener.getsockname()[:2], RequestHandler, bind_and_activate=False)
+        httpd.socket.close()
+        httpd.socket = listener
+    print(f"Server running on port {httpd.server_address[1]}")
+    
+    # SIGTERM drains in-flight requests before exiting, SIGHUP reloads without closing the socket
+    install_signal_handlers(httpd)
+    
+    # Check and migrate the schema without holding up the listening socket; /readyz reports progress
+    start_background_startup()
     
     try:
         httpd.serve_forever()
-    except KeyboardInterrupt:
-        print("\nShutting down server...")
     finally:
-        httpd.server_close()
-        print("Server closed")
+        finish(httpd)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,222 @@
+"""Embedded SQLite storage backend.
+
+Exposes the small part of the mysql.connector interface the rest of the
+server uses (connection.cursor/commit/rollback/is_connected/close and
+cursor.execute/executemany/fetchone/fetchall/rowcount/lastrowid/column_names)
+on top of the standard library sqlite3 module, so a gallery can run without
+a MySQL server and the test and benchmark suites can run hermetically.
+
+- Open connections are pooled per database file and shared by all threads,
+  so a new client thread does not reopen the file and rerun the PRAGMAs.
+  A thread that connects again while it already holds a connection gets
+  the same one (and its transaction); the connection goes back to the
+  pool, rolled back, when the outermost handle is closed.
+- The database runs in WAL mode so readers never block the writer.
+- Queries are written for MySQL (%s placeholders, INSERT IGNORE,
+  ON DUPLICATE KEY UPDATE ... VALUES()). They are translated once and
+  cached, and sqlite3 keeps the compiled statements of each connection in
+  its own statement cache.
+"""
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from config import CONFIG
+
+Error = sqlite3.Error
+
+# Compiled statements kept per connection by sqlite3
+STATEMENT_CACHE_SIZE = CONFIG.database.sqlite_statement_cache
+
+# Seconds a writer waits for the database lock before failing
+BUSY_TIMEOUT = CONFIG.database.sqlite_busy_timeout
+
+# Idle connections kept open per database file; busy threads beyond it open their own
+POOL_SIZE = CONFIG.database.pool_size
+
+def _parse_date(value):
+    return date.fromisoformat(value.decode()[:10])
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value.decode())
+
+# Store dates and amounts the way MySQL returns them to Python
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATE', _parse_date)
+sqlite3.register_converter('DATETIME', _parse_datetime)
+sqlite3.register_converter('TIMESTAMP', _parse_datetime)
+
+_INSERT_IGNORE = re.compile(r'\bINSERT\s+IGNORE\b', re.IGNORECASE)
+_ON_DUPLICATE_KEY = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.IGNORECASE)
+_VALUES_REFERENCE = re.compile(r'\bVALUES\((\w+)\)', re.IGNORECASE)
+
+@lru_cache(maxsize=512)
+def translate(query):
+    """Rewrite a MySQL-flavoured query for SQLite"""
+    query = query.replace('%s', '?')
+    query = _INSERT_IGNORE.sub('INSERT OR IGNORE', query)
+    if _ON_DUPLICATE_KEY.search(query):
+        query = _ON_DUPLICATE_KEY.sub('ON CONFLICT DO UPDATE SET', query)
+        query = _VALUES_REFERENCE.sub(r'excluded.\1', query)
+    return query
+
+class SQLiteCursor:
+    """mysql.connector style cursor over a sqlite3 cursor"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        self._cursor.execute(translate(query), params or ())
+        return self
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(translate(query), seq_of_params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    def close(self):
+        self._cursor.close()
+
+class SQLiteConnection:
+    """A handle on the SQLite connection the calling thread has borrowed"""
+
+    def __init__(self, path, connection):
+        self._path = path
+        self._connection = connection
+        self._open = True
+
+    def cursor(self):
+        return SQLiteCursor(self._connection.cursor())
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def is_connected(self):
+        return self._open
+
+    def close(self):
+        if self._open:
+            self._open = False
+            _release(self._path)
+
+class ConnectionPool:
+    """Open connections to one database file, shared by all threads"""
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def get_connection(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return _open(self.path)
+
+    def put_connection(self, connection):
+        # Like closing a MySQL connection, discard anything left uncommitted
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except Error as e:
+            print(f"Error rolling back SQLite connection: {e}")
+            connection.close()
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# The connection each thread has borrowed per path, and how many handles it has open on it
+_leases = threading.local()
+
+def _open(path):
+    connection = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        # Take the write lock when the first write of a transaction starts
+        # so concurrent writers queue on busy_timeout instead of deadlocking
+        isolation_level='IMMEDIATE',
+        # Pooled connections move between threads, one borrower at a time
+        check_same_thread=False
+    )
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA foreign_keys=ON")
+    return connection
+
+def _pool(path):
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(path, ConnectionPool(path, POOL_SIZE))
+    return pool
+
+def _borrowed():
+    borrowed = getattr(_leases, 'borrowed', None)
+    if borrowed is None:
+        borrowed = _leases.borrowed = {}
+    return borrowed
+
+def _release(path):
+    borrowed = _borrowed()
+    lease = borrowed[path]
+    lease[1] -= 1
+    if lease[1] == 0:
+        del borrowed[path]
+        _pool(path).put_connection(lease[0])
+
+def connect(path):
+    """Return a handle on a pooled connection to the database at path"""
+    borrowed = _borrowed()
+    lease = borrowed.get(path)
+    if lease is None:
+        lease = borrowed[path] = [_pool(path).get_connection(), 0]
+    lease[1] += 1
+    return SQLiteConnection(path, lease[0])
+
+def close_pools():
+    """Close the idle connections; called at shutdown once requests have drained"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
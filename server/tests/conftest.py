@@ -0,0 +1,120 @@
+"""Shared fixtures: every test runs against a fresh embedded SQLite database.
+
+Settings are read once when config.py is imported, so the environment is
+prepared here, before any server module is loaded.
+"""
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+TEST_DIR = tempfile.mkdtemp(prefix='afriart-tests-')
+CALLBACK_TOKEN = 'test-callback-token-0123456789'
+
+os.environ.pop('AFRIART_CONFIG', None)
+os.environ['AFRIART_DB_BACKEND'] = 'sqlite'
+os.environ['AFRIART_SQLITE_PATH'] = os.path.join(TEST_DIR, 'test.db')
+os.environ['AFRIART_UPLOAD_DIR'] = os.path.join(TEST_DIR, 'uploads')
+os.environ['AFRIART_MPESA_CALLBACK_TOKEN'] = CALLBACK_TOKEN
+os.environ['AFRIART_MPESA_CONSUMER_KEY'] = 'test-consumer-key'
+os.environ['AFRIART_MPESA_CONSUMER_SECRET'] = 'test-consumer-secret'
+os.environ['AFRIART_MPESA_PASSKEY'] = 'test-passkey'
+os.environ['AFRIART_DB_REPLICAS'] = ''
+
+import schema
+import database
+import migrate
+
+@pytest.fixture(scope='session')
+def schema_ready():
+    assert database.initialize_database()
+    assert migrate.apply_migrations()
+
+@pytest.fixture
+def db(schema_ready):
+    """An open connection on an emptied database"""
+    connection = database.get_db_connection()
+    cursor = connection.cursor()
+    for table in reversed(schema.TABLES):
+        if table.name != 'schema_fingerprint':
+            cursor.execute(f"DELETE FROM {table.name}")
+    connection.commit()
+    yield Rows(connection, cursor)
+    connection.rollback()
+
+class Rows:
+    """Inserts the rows a test needs and reads back what the code under test wrote"""
+
+    def __init__(self, connection, cursor):
+        self.connection = connection
+        self.cursor = cursor
+
+    def insert(self, query, params):
+        self.cursor.execute(query, params)
+        self.connection.commit()
+        return self.cursor.lastrowid
+
+    def user(self, email='buyer@example.com'):
+        return self.insert(
+            "INSERT INTO users (name, email, password) VALUES (%s, %s, %s)",
+            ('Buyer', email, 'x')
+        )
+
+    def artwork(self, artist='Wanjiru', price=1000, status='available'):
+        return self.insert(
+            "INSERT INTO artworks (title, artist, price, status) VALUES (%s, %s, %s, %s)",
+            ('Sunrise', artist, price, status)
+        )
+
+    def exhibition(self, slots=10, ticket_price=500):
+        return self.insert(
+            """
+            INSERT INTO exhibitions (title, location, start_date, end_date, ticket_price,
+                                     total_slots, available_slots, status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            ('Nairobi Now', 'Nairobi', date.today(), date.today() + timedelta(days=30),
+             ticket_price, slots, slots, 'ongoing')
+        )
+
+    def order(self, user_id, artwork_id, amount=1000):
+        return self.insert(
+            """
+            INSERT INTO artwork_orders (user_id, artwork_id, name, email, phone, delivery_address,
+                                        payment_method, total_amount)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (user_id, artwork_id, 'Buyer', 'buyer@example.com', '0712345678', 'Nairobi', 'mpesa', amount)
+        )
+
+    def booking(self, user_id, exhibition_id, slots=1, amount=500):
+        return self.insert(
+            """
+            INSERT INTO exhibition_bookings (user_id, exhibition_id, name, email, phone, slots,
+                                             payment_method, total_amount)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (user_id, exhibition_id, 'Buyer', 'buyer@example.com', '0712345678', slots, 'mpesa', amount)
+        )
+
+    def value(self, query, params=()):
+        self.connection.commit()
+        self.cursor.execute(query, params)
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def all(self, query, params=()):
+        self.connection.commit()
+        self.cursor.execute(query, params)
+        return self.cursor.fetchall()
+
+    def available_slots(self, exhibition_id):
+        return self.value("SELECT available_slots FROM exhibitions WHERE id = %s", (exhibition_id,))
+
+    def payment_status(self, table, row_id):
+        return self.value(f"SELECT payment_status FROM {table} WHERE id = %s", (row_id,))
@@ -0,0 +1,37 @@
+import gzip
+
+from compression import CompressedVariants, ResponseCache
+
+def test_variants_compress_once_per_encoding():
+    variants = CompressedVariants(b'{"artworks": []}' * 100)
+
+    encoded = variants.encode('gzip')
+
+    assert gzip.decompress(encoded) == variants.body
+    assert variants.encode('gzip') is encoded
+    assert variants.encode(None) is variants.body
+
+def test_cache_serves_until_cleared():
+    cache = ResponseCache(ttl=60)
+    variants = CompressedVariants(b'[]')
+    cache.put('/api/artworks', variants, cache.generation)
+
+    assert cache.get('/api/artworks') is variants
+    cache.clear()
+    assert cache.get('/api/artworks') is None
+
+def test_response_loaded_before_a_write_is_not_cached():
+    cache = ResponseCache(ttl=60)
+    generation = cache.generation
+    # A write lands while the listing is being loaded
+    cache.clear()
+
+    cache.put('/api/artworks', CompressedVariants(b'[]'), generation)
+
+    assert cache.get('/api/artworks') is None
+
+def test_zero_ttl_disables_the_cache():
+    cache = ResponseCache(ttl=0)
+    cache.put('/api/artworks', CompressedVariants(b'[]'))
+
+    assert cache.get('/api/artworks') is None
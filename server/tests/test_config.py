@@ -0,0 +1,72 @@
+import pytest
+
+import config
+
+def test_defaults_apply_without_a_file_or_environment():
+    settings = config.load(environ={'AFRIART_MPESA_ENABLED': '0'})
+
+    assert settings.server.port == 8000
+    assert settings.database.backend == 'mysql'
+    assert settings.database.pool_warm == settings.database.pool_size
+    assert settings.server.max_workers == 256
+    assert settings.mpesa.callback_token is None
+    assert settings.mpesa.consumer_key is None
+
+def test_environment_overrides_the_file(tmp_path):
+    path = tmp_path / 'afriart.toml'
+    path.write_text('[server]\nport = 9000\nkeep_alive_timeout = 30\n')
+
+    settings = config.load(environ={'AFRIART_PORT': '9100', 'AFRIART_MPESA_ENABLED': 'false'}, path=str(path))
+
+    assert settings.server.port == 9100
+    assert settings.server.keep_alive_timeout == 30.0
+    assert settings.source == str(path)
+
+def test_every_problem_is_reported_at_once(tmp_path):
+    path = tmp_path / 'afriart.toml'
+    path.write_text('[server]\nprot = 9000\n')
+
+    with pytest.raises(config.ConfigError) as raised:
+        config.load(environ={
+            'AFRIART_DB_POOL_SIZE': '64',
+            'AFRIART_GZIP_LEVEL': 'fast',
+            'AFRIART_MPESA_CALLBACK_TOKEN': 'short',
+        }, path=str(path))
+
+    message = str(raised.value)
+    for problem in ("unknown setting 'server.prot'", "database.pool_size", "compression.gzip_level",
+                    "mpesa.callback_token"):
+        assert problem in message
+
+def test_payments_need_a_callback_token():
+    with pytest.raises(config.ConfigError) as raised:
+        config.load(environ={})
+
+    assert "mpesa.callback_token must be set (AFRIART_MPESA_CALLBACK_TOKEN)" in str(raised.value)
+
+def test_payments_need_daraja_credentials(tmp_path):
+    path = tmp_path / 'afriart.toml'
+    path.write_text('[mpesa]\nconsumer_key = "from-the-file"\n')
+
+    with pytest.raises(config.ConfigError) as raised:
+        config.load(environ={'AFRIART_MPESA_CALLBACK_TOKEN': 'a-long-enough-callback-token'}, path=str(path))
+
+    message = str(raised.value)
+    assert "mpesa.consumer_key" not in message
+    assert "mpesa.consumer_secret must be set (AFRIART_MPESA_CONSUMER_SECRET)" in message
+    assert "mpesa.passkey must be set (AFRIART_MPESA_PASSKEY)" in message
+
+def test_describe_masks_secrets():
+    settings = config.load(environ={
+        'AFRIART_MPESA_CALLBACK_TOKEN': 'a-long-enough-callback-token',
+        'AFRIART_MPESA_CONSUMER_KEY': 'the-consumer-key',
+        'AFRIART_MPESA_CONSUMER_SECRET': 'the-consumer-secret',
+        'AFRIART_MPESA_PASSKEY': 'the-passkey',
+    })
+
+    lines = config.describe(settings)
+
+    assert "mpesa.callback_token = ********" in lines
+    assert "mpesa.passkey = ********" in lines
+    assert "database.backend = 'mysql'" in lines
+    assert not any('a-long-enough-callback-token' in line or 'the-passkey' in line for line in lines)
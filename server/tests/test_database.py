@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+import database
+from querylog import unwrap
+
+@pytest.fixture
+def replicas(monkeypatch):
+    """Route reads as a MySQL primary with one healthy replica would"""
+    primary, replica = object(), object()
+    monkeypatch.setattr(database, 'DB_BACKEND', 'mysql')
+    monkeypatch.setattr(database, 'DB_REPLICAS', ['replica1'])
+    monkeypatch.setattr(database, '_replica_lag', {'replica1': (time.monotonic(), 0)})
+    monkeypatch.setattr(database, '_pooled_connection', lambda name, config: replica)
+    monkeypatch.setattr(database, 'get_db_connection', lambda: primary)
+    monkeypatch.setattr(database, '_recent_writers', {})
+    monkeypatch.setattr(database, '_write_listeners', [])
+    return primary, replica
+
+def test_reads_go_to_the_replica_until_the_caller_writes(replicas):
+    primary, replica = replicas
+    database.begin_request('Bearer buyer')
+
+    assert unwrap(database.get_read_connection()) is replica
+    database.mark_write()
+    assert database.get_read_connection() is primary
+
+def test_writer_stays_pinned_across_requests_within_the_window(replicas, monkeypatch):
+    primary, replica = replicas
+    database.begin_request('Bearer buyer')
+    database.mark_write()
+
+    database.begin_request('Bearer buyer')
+    assert database.get_read_connection() is primary
+    database.begin_request('Bearer other')
+    assert unwrap(database.get_read_connection()) is replica
+
+    monkeypatch.setattr(database, 'READ_YOUR_WRITES_WINDOW', 0)
+    database.begin_request('Bearer buyer')
+    assert unwrap(database.get_read_connection()) is replica
+
+def test_anonymous_writes_pin_only_the_current_request(replicas):
+    primary, replica = replicas
+    database.begin_request(None)
+    database.mark_write()
+
+    assert database.get_read_connection() is primary
+    assert database._recent_writers == {}
+    database.begin_request(None)
+    assert unwrap(database.get_read_connection()) is replica
+
+def test_writes_notify_the_listeners(replicas):
+    calls = []
+    database.add_write_listener(lambda: calls.append(1))
+    database.begin_request(None)
+
+    database.mark_write()
+
+    assert calls == [1]
+
+def test_concurrent_writers_are_all_recorded(replicas):
+    start = threading.Barrier(16)
+
+    def write(index):
+        database.begin_request(f'Bearer user{index}')
+        start.wait()
+        for _ in range(50):
+            database.mark_write()
+
+    threads = [threading.Thread(target=write, args=(index,)) for index in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(database._recent_writers) == {f'Bearer user{index}' for index in range(16)}
@@ -0,0 +1,35 @@
+import database
+import health
+import migrate
+import reservations
+
+def test_startup_retries_a_check_that_raised(monkeypatch):
+    startup = health.Readiness(['database', 'schema', 'migrations', 'pool'])
+    attempts = []
+
+    def apply_migrations():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("lock wait timeout")
+        return True
+
+    monkeypatch.setattr(health, 'STARTUP', startup)
+    monkeypatch.setattr(health, 'STARTUP_RETRY_INTERVAL', 0)
+    monkeypatch.setattr(migrate, 'apply_migrations', apply_migrations)
+    monkeypatch.setattr(database, 'warm_pool', lambda: {"connections": 0, "statements": 0})
+    monkeypatch.setattr(reservations, 'start_hold_sweeper', lambda: None)
+
+    health.start_background_startup().join(timeout=10)
+
+    assert len(attempts) == 2
+    assert startup.ready and startup.prepared
+    assert startup.snapshot()["checks"]["migrations"]["ok"]
+
+def test_draining_keeps_the_server_prepared():
+    startup = health.Readiness(['schema'])
+    startup.mark('schema', True)
+
+    startup.drain()
+
+    assert not startup.ready
+    assert startup.prepared
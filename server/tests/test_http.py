@@ -0,0 +1,210 @@
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+pytest.importorskip('jwt', reason="install requirements-dev.txt to run the HTTP tests")
+
+import auth
+import health
+import mpesa
+import orders
+import reservations
+import server
+from conftest import CALLBACK_TOKEN
+
+@pytest.fixture(scope='module')
+def address(schema_ready):
+    # The schema is prepared by schema_ready rather than the background startup
+    for name in health.STARTUP.snapshot()["checks"]:
+        health.STARTUP.mark(name, True)
+    httpd = server.ThreadingServer(('127.0.0.1', 0), server.RequestHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def request_(address):
+    """Send one request on a fresh connection; returns (status, decoded JSON body)"""
+    def send(method, path, body=None, headers=None, token=None):
+        headers = dict(headers or {})
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if isinstance(body, dict):
+            body = json.dumps(body)
+            headers.setdefault('Content-Type', 'application/json')
+        connection = http.client.HTTPConnection(*address, timeout=10)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        finally:
+            connection.close()
+        return response.status, json.loads(data) if data else None
+    return send
+
+@pytest.fixture
+def stk_push(monkeypatch):
+    calls = []
+
+    def initiate(phone_number, amount, account_reference, order_type, order_id, user_id):
+        calls.append(amount)
+        mpesa.save_transaction_request(f"ws_CO_{len(calls)}", "merchant", order_type, order_id,
+                                       user_id, amount, phone_number)
+        return {"success": True, "checkoutRequestId": f"ws_CO_{len(calls)}", "merchantRequestId": "merchant"}
+
+    monkeypatch.setattr(mpesa, 'initiate_stk_push', initiate)
+    monkeypatch.setattr(orders, 'initiate_stk_push', initiate)
+    return calls
+
+def _user_token(user_id):
+    return auth.generate_token(user_id, 'Buyer', False)
+
+def test_oversized_body_is_refused_before_it_is_read(db, request_):
+    status, body = request_('POST', '/contact', body='x' * (server.MAX_BODY_BYTES + 1),
+                            headers={'Content-Type': 'application/json'})
+
+    assert status == 413
+    assert body == {"error": f"Request body too large (limit {server.MAX_BODY_BYTES} bytes)"}
+
+def test_chunked_body_is_refused(db, address):
+    # One write: the server answers and closes without reading the body
+    with socket.create_connection(address, timeout=10) as connection:
+        connection.sendall(b"POST /contact HTTP/1.1\r\nHost: test\r\nContent-Type: application/json\r\n"
+                           b"Transfer-Encoding: chunked\r\n\r\n2\r\n{}\r\n0\r\n\r\n")
+        response = http.client.HTTPResponse(connection)
+        response.begin()
+
+        assert response.status == 411
+        assert response.getheader('Connection') == 'close'
+
+def test_malformed_json_is_a_bad_request(db, request_):
+    status, body = request_('POST', '/contact', body='{"name":', headers={'Content-Type': 'application/json'})
+
+    assert status == 400
+
+def test_routes_are_refused_until_startup_finishes(db, request_, monkeypatch):
+    monkeypatch.setattr(server, 'STARTUP', health.Readiness(['schema']))
+
+    assert request_('GET', '/exhibitions') == (503, {"error": "Server is starting up"})
+    assert request_('POST', '/contact', body={"name": "A"})[0] == 503
+    assert request_('GET', '/healthz')[0] == 200
+    assert request_('GET', '/readyz')[0] == 503
+
+    server.STARTUP.mark('schema', True)
+    assert request_('GET', '/exhibitions')[0] == 200
+
+def test_admin_token_has_no_orders(db, request_):
+    status, body = request_('GET', '/me/orders', token=auth.generate_token(1, 'Admin', True))
+
+    assert status == 403
+
+def test_callback_needs_the_shared_token(db, request_, stk_push):
+    user = db.user()
+    booking = db.booking(user, db.exhibition(slots=5), slots=2)
+    status, _ = request_('POST', '/mpesa/stk-push', token=_user_token(user), body={
+        "phoneNumber": "0712345678", "orderType": "exhibition", "orderId": booking, "accountReference": "Tickets"
+    })
+    assert status == 200
+    callback = {"Body": {"stkCallback": {"CheckoutRequestID": "ws_CO_1", "ResultCode": 0}}}
+
+    assert request_('POST', '/mpesa/callback', body=callback)[0] == 403
+    assert request_('POST', '/mpesa/callback?token=wrong-token-0123456789', body=callback)[0] == 403
+    assert db.payment_status('exhibition_bookings', booking) == 'pending'
+
+    assert request_('POST', f'/mpesa/callback?token={CALLBACK_TOKEN}', body=callback) == (200, {"success": True})
+    assert db.payment_status('exhibition_bookings', booking) == 'completed'
+
+@pytest.mark.parametrize('body', ['[]', '"x"', '{"Body": []}', '{"Body": {"stkCallback": 1}}'])
+def test_callback_that_is_not_an_object_is_a_bad_request(db, request_, body):
+    status, response = request_('POST', f'/mpesa/callback?token={CALLBACK_TOKEN}', body=body,
+                                headers={'Content-Type': 'application/json'})
+
+    assert status == 400
+    assert response == {"error": "Callback body must be a JSON object"}
+
+def test_stk_push_requires_the_order_owner_and_charges_the_order_total(db, request_, stk_push):
+    owner = db.user()
+    stranger = db.user(email='stranger@example.com')
+    order = db.order(owner, db.artwork(), amount=1000)
+    request = {"phoneNumber": "0712345678", "orderType": "artwork", "orderId": order,
+               "accountReference": "Artwork", "amount": 1}
+
+    assert request_('POST', '/mpesa/stk-push', body=request)[0] == 401
+    assert request_('POST', '/mpesa/stk-push', body=request, token=_user_token(stranger))[0] == 404
+    assert request_('POST', '/mpesa/stk-push', body=request, token=_user_token(owner))[0] == 200
+    assert stk_push == [1000]
+
+def test_payment_status_is_only_shown_to_the_payer(db, request_, stk_push):
+    owner = db.user()
+    stranger = db.user(email='stranger@example.com')
+    order = db.order(owner, db.artwork(), amount=1000)
+    request_('POST', '/mpesa/stk-push', token=_user_token(owner), body={
+        "phoneNumber": "0712345678", "orderType": "artwork", "orderId": order, "accountReference": "Artwork"
+    })
+    request_('POST', f'/mpesa/callback?token={CALLBACK_TOKEN}',
+             body={"Body": {"stkCallback": {"CheckoutRequestID": "ws_CO_1", "ResultCode": 0}}})
+
+    assert request_('GET', '/mpesa/status/ws_CO_1')[0] == 401
+    assert request_('GET', '/mpesa/status/ws_CO_1', token=_user_token(stranger))[0] == 404
+    status, body = request_('GET', '/mpesa/status/ws_CO_1', token=_user_token(owner))
+    assert (status, body["status"]) == (200, "completed")
+
+def test_only_the_holder_is_told_the_artwork_hold_is_theirs(db, request_):
+    owner = db.user()
+    stranger = db.user(email='stranger@example.com')
+    artwork = db.artwork(price=1000)
+    order = db.order(owner, artwork, amount=1500)
+    reservations.hold_artwork(order)
+
+    status, body = request_('GET', f'/artworks/{artwork}', token=_user_token(owner))
+    assert status == 200
+    assert (body["onHold"], body["heldByMe"], body["heldOrderId"], body["heldOrderAmount"]) == (True, True, str(order), 1500.0)
+
+    for token in (_user_token(stranger), None):
+        status, body = request_('GET', f'/artworks/{artwork}', token=token)
+        assert (body["onHold"], body["heldByMe"]) == (True, False)
+        assert "heldOrderId" not in body and "holdUserId" not in body
+
+def test_listing_shows_slots_held_by_a_checkout(db, request_, stk_push):
+    user = db.user()
+    exhibition = db.exhibition(slots=10)
+
+    def available():
+        status, body = request_('GET', '/exhibitions')
+        assert status == 200
+        return next(item["availableSlots"] for item in body["exhibitions"] if item["id"] == str(exhibition))
+
+    assert available() == 10
+    status, _ = request_('POST', '/checkout', token=_user_token(user), body={
+        "name": "Buyer", "email": "buyer@example.com", "phone": "0712345678",
+        "items": [{"type": "exhibition", "id": str(exhibition), "slots": 3}]
+    })
+    assert status == 201
+    assert available() == 7
+
+def test_connections_beyond_max_workers_wait_for_a_free_thread(schema_ready, monkeypatch):
+    monkeypatch.setattr(server, 'MAX_WORKERS', 1)
+    httpd = server.ThreadingServer(('127.0.0.1', 0), server.RequestHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        first = http.client.HTTPConnection(*httpd.server_address, timeout=10)
+        first.request('GET', '/healthz')
+        assert first.getresponse().read()
+
+        # The first connection is kept alive, so the only worker is still busy with it
+        second = http.client.HTTPConnection(*httpd.server_address, timeout=0.5)
+        second.request('GET', '/healthz')
+        with pytest.raises(socket.timeout):
+            second.getresponse()
+
+        first.close()
+        second.sock.settimeout(10)
+        assert second.getresponse().status == 200
+        second.close()
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
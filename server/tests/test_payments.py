@@ -0,0 +1,255 @@
+import threading
+
+import pytest
+
+import mpesa
+import orders
+import reservations
+
+@pytest.fixture
+def stk_push(monkeypatch):
+    """Record STK pushes instead of calling Daraja"""
+    calls = []
+
+    def initiate(phone_number, amount, account_reference, order_type, order_id, user_id):
+        calls.append({"amount": amount, "order_type": order_type, "order_id": order_id, "user_id": user_id})
+        checkout_request_id = f"ws_CO_{len(calls)}"
+        mpesa.save_transaction_request(checkout_request_id, "merchant", order_type, order_id,
+                                       user_id, amount, phone_number)
+        return {"success": True, "checkoutRequestId": checkout_request_id, "merchantRequestId": "merchant"}
+
+    monkeypatch.setattr(mpesa, 'initiate_stk_push', initiate)
+    monkeypatch.setattr(orders, 'initiate_stk_push', initiate)
+    return calls
+
+def _callback(checkout_request_id, result_code=0):
+    return mpesa.handle_mpesa_callback({"CheckoutRequestID": checkout_request_id, "ResultCode": result_code})
+
+def test_repeated_callback_completes_a_booking_once(db, stk_push):
+    user = db.user()
+    exhibition = db.exhibition(slots=10)
+    booking = db.booking(user, exhibition, slots=3, amount=1500)
+    result = mpesa.handle_stk_push_request(user, {
+        "phoneNumber": "0712345678", "orderType": "exhibition", "orderId": booking, "accountReference": "Tickets"
+    })
+
+    for _ in range(3):
+        assert _callback(result["checkoutRequestId"]) == {"success": True}
+
+    assert db.payment_status('exhibition_bookings', booking) == 'completed'
+    assert db.available_slots(exhibition) == 7
+    assert db.all("SELECT bookings, tickets, revenue FROM exhibition_attendance") == [(1, 3, 1500)]
+
+def test_concurrent_callbacks_count_a_payment_once(db):
+    user = db.user()
+    exhibition = db.exhibition(slots=10)
+    booking = db.booking(user, exhibition, slots=2)
+    reservations.hold_slots(booking)
+    start = threading.Barrier(6)
+
+    def complete():
+        start.wait()
+        mpesa.update_order_status("exhibition", booking, "completed")
+
+    threads = [threading.Thread(target=complete) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert db.available_slots(exhibition) == 8
+    assert db.all("SELECT bookings, tickets FROM sales_daily") == [(1, 2)]
+
+def test_failed_payment_releases_the_hold(db):
+    user = db.user()
+    exhibition = db.exhibition(slots=5)
+    booking = db.booking(user, exhibition, slots=2)
+    reservations.hold_slots(booking)
+
+    mpesa.update_order_status("exhibition", booking, "failed")
+
+    assert db.payment_status('exhibition_bookings', booking) == 'failed'
+    assert db.available_slots(exhibition) == 5
+
+def test_payment_after_a_failure_takes_the_slots_again(db):
+    user = db.user()
+    exhibition = db.exhibition(slots=5)
+    booking = db.booking(user, exhibition, slots=2)
+    reservations.hold_slots(booking)
+    mpesa.update_order_status("exhibition", booking, "failed")
+
+    mpesa.update_order_status("exhibition", booking, "completed")
+    mpesa.update_order_status("exhibition", booking, "completed")
+
+    assert db.payment_status('exhibition_bookings', booking) == 'completed'
+    assert db.available_slots(exhibition) == 3
+
+def test_completed_payment_is_not_failed_afterwards(db):
+    user = db.user()
+    exhibition = db.exhibition(slots=5)
+    booking = db.booking(user, exhibition)
+    reservations.hold_slots(booking)
+    mpesa.update_order_status("exhibition", booking, "completed")
+
+    mpesa.update_order_status("exhibition", booking, "failed")
+
+    assert db.payment_status('exhibition_bookings', booking) == 'completed'
+    assert db.available_slots(exhibition) == 4
+
+def test_payment_for_a_full_exhibition_is_flagged_for_refund(db):
+    user = db.user()
+    exhibition = db.exhibition(slots=2)
+    late = db.booking(user, exhibition, slots=2)
+    other = db.booking(user, exhibition, slots=2)
+    reservations.hold_slots(late, ttl=-1)
+    reservations.sweep_expired_holds()
+    reservations.hold_slots(other)
+    mpesa.update_order_status("exhibition", other, "completed")
+
+    mpesa.update_order_status("exhibition", late, "completed")
+
+    assert db.payment_status('exhibition_bookings', late) == 'refund_due'
+    assert db.available_slots(exhibition) == 0
+    assert db.all("SELECT bookings FROM exhibition_attendance") == [(1,)]
+
+def test_artwork_is_sold_once_and_the_loser_is_refunded(db):
+    user = db.user()
+    artwork = db.artwork(artist='Kamau', price=900)
+    first = db.order(user, artwork, amount=900)
+    second = db.order(user, artwork, amount=900)
+    reservations.hold_artwork(first, ttl=-1)
+    reservations.hold_artwork(second)
+
+    mpesa.update_order_status("artwork", first, "completed")
+    mpesa.update_order_status("artwork", second, "completed")
+
+    assert db.payment_status('artwork_orders', first) == 'refund_due'
+    assert db.payment_status('artwork_orders', second) == 'completed'
+    assert db.value("SELECT status FROM artworks WHERE id = %s", (artwork,)) == 'sold'
+    assert db.all("SELECT artist, orders, revenue FROM artist_sales") == [('Kamau', 1, 900)]
+    assert db.all("SELECT * FROM artwork_holds") == []
+
+def test_artwork_whose_own_hold_lapsed_is_still_sold(db):
+    user = db.user()
+    artwork = db.artwork()
+    order = db.order(user, artwork)
+    reservations.hold_artwork(order, ttl=-1)
+    reservations.sweep_expired_artwork_holds()
+
+    mpesa.update_order_status("artwork", order, "completed")
+
+    assert db.payment_status('artwork_orders', order) == 'completed'
+    assert db.value("SELECT status FROM artworks WHERE id = %s", (artwork,)) == 'sold'
+
+def test_checkout_holds_every_item_and_pays_the_total_once(db, stk_push):
+    user = db.user()
+    artwork = db.artwork(price=2000)
+    exhibition = db.exhibition(slots=10, ticket_price=300)
+
+    result = orders.create_checkout(user, {
+        "name": "Buyer", "email": "buyer@example.com", "phone": "0712345678", "deliveryAddress": "Nairobi",
+        "items": [{"type": "artwork", "id": str(artwork)}, {"type": "exhibition", "id": str(exhibition), "slots": 2}]
+    })
+
+    assert result["success"] and result["totalAmount"] == 2600
+    assert [call["amount"] for call in stk_push] == [2600]
+    assert db.available_slots(exhibition) == 8
+    assert db.value("SELECT COUNT(*) FROM artwork_holds WHERE artwork_id = %s", (artwork,)) == 1
+
+    assert _callback(result["checkoutRequestId"]) == {"success": True}
+
+    assert db.value("SELECT payment_status FROM checkouts WHERE id = %s", (int(result["checkoutId"]),)) == 'completed'
+    assert db.value("SELECT status FROM artworks WHERE id = %s", (artwork,)) == 'sold'
+    assert db.available_slots(exhibition) == 8
+
+def test_checkout_with_an_unavailable_item_writes_nothing(db, stk_push):
+    user = db.user()
+    artwork = db.artwork()
+    exhibition = db.exhibition(slots=1)
+
+    result = orders.create_checkout(user, {
+        "name": "Buyer", "email": "buyer@example.com", "phone": "0712345678", "deliveryAddress": "Nairobi",
+        "items": [{"type": "artwork", "id": str(artwork)}, {"type": "exhibition", "id": str(exhibition), "slots": 2}]
+    })
+
+    assert result["error"] == "Not enough slots available"
+    assert stk_push == []
+    assert db.value("SELECT COUNT(*) FROM artwork_orders") == 0
+    assert db.value("SELECT COUNT(*) FROM artwork_holds") == 0
+    assert db.available_slots(exhibition) == 1
+
+def test_stk_push_charges_the_order_total_for_its_owner_only(db, stk_push):
+    owner = db.user()
+    stranger = db.user(email='stranger@example.com')
+    order = db.order(owner, db.artwork(), amount=1000)
+    request = {"phoneNumber": "0712345678", "orderType": "artwork", "orderId": order,
+               "accountReference": "Artwork", "amount": 1}
+
+    assert mpesa.handle_stk_push_request(stranger, request) == {"error": "Order not found"}
+    assert mpesa.handle_stk_push_request(owner, request)["success"]
+    assert [call["amount"] for call in stk_push] == [1000]
+
+def test_disabled_payments_release_the_hold(db, monkeypatch):
+    monkeypatch.setattr(mpesa, 'ENABLED', False)
+    user = db.user()
+    exhibition = db.exhibition(slots=5)
+    booking = db.booking(user, exhibition, slots=2)
+
+    result = mpesa.handle_stk_push_request(user, {
+        "phoneNumber": "0712345678", "orderType": "exhibition", "orderId": booking, "accountReference": "Tickets"
+    })
+
+    assert result == {"error": "M-Pesa payments are disabled"}
+    assert db.available_slots(exhibition) == 5
+    assert mpesa.verify_callback_token(mpesa.CALLBACK_TOKEN) is False
+
+@pytest.fixture
+def status_query(monkeypatch):
+    """Answer Daraja status queries with the result code the test sets"""
+    class Response:
+        def __init__(self, result):
+            self._result = result
+
+        def json(self):
+            return self._result
+
+    query = {"result": {}}
+    monkeypatch.setattr(mpesa, 'get_access_token', lambda: "token")
+    monkeypatch.setattr(mpesa, '_daraja', lambda method, url, **kwargs: Response(query["result"]))
+    return query
+
+def _pending_booking_payment(db, stk_push):
+    user = db.user()
+    exhibition = db.exhibition(slots=5)
+    booking = db.booking(user, exhibition, slots=2)
+    result = mpesa.handle_stk_push_request(user, {
+        "phoneNumber": "0712345678", "orderType": "exhibition", "orderId": booking, "accountReference": "Tickets"
+    })
+    return user, exhibition, booking, result["checkoutRequestId"]
+
+def test_status_of_another_users_payment_is_not_found(db, stk_push, status_query):
+    user, exhibition, booking, checkout_request_id = _pending_booking_payment(db, stk_push)
+    stranger = db.user(email='stranger@example.com')
+    status_query["result"] = {"ResultCode": "1032", "ResultDesc": "Request cancelled by user"}
+
+    assert mpesa.check_transaction_status(checkout_request_id, stranger) == {"error": "Transaction not found"}
+    assert db.available_slots(exhibition) == 3
+
+def test_status_query_still_processing_keeps_the_hold(db, stk_push, status_query):
+    user, exhibition, booking, checkout_request_id = _pending_booking_payment(db, stk_push)
+
+    for result in ({"errorCode": "500.001.1001", "errorMessage": "The transaction is being processed"},
+                   {"ResultCode": "1001", "ResultDesc": "Unable to lock subscriber"}):
+        status_query["result"] = result
+        assert mpesa.check_transaction_status(checkout_request_id, user)["status"] == "pending"
+
+    assert db.payment_status('exhibition_bookings', booking) == 'pending'
+    assert db.available_slots(exhibition) == 3
+
+def test_status_query_definitive_failure_releases_the_hold(db, stk_push, status_query):
+    user, exhibition, booking, checkout_request_id = _pending_booking_payment(db, stk_push)
+    status_query["result"] = {"ResultCode": "1032", "ResultDesc": "Request cancelled by user"}
+
+    assert mpesa.check_transaction_status(checkout_request_id, user)["status"] == "failed"
+    assert db.payment_status('exhibition_bookings', booking) == 'failed'
+    assert db.available_slots(exhibition) == 5
@@ -0,0 +1,90 @@
+from datetime import date, datetime
+
+import database
+import mpesa
+import reports
+import reservations
+
+SUMMARIES = (
+    "SELECT day, artwork_orders, artwork_revenue, bookings, tickets, ticket_revenue FROM sales_daily ORDER BY day",
+    "SELECT artist, orders, revenue FROM artist_sales ORDER BY artist",
+    "SELECT exhibition_id, bookings, tickets, revenue FROM exhibition_attendance ORDER BY exhibition_id",
+)
+
+def _summaries(db):
+    return [db.all(query) for query in SUMMARIES]
+
+def _sell(db, user):
+    for artist, price in (('Wanjiru', 1200), ('Kamau', 800), ('Wanjiru', 300)):
+        order = db.order(user, db.artwork(artist=artist, price=price), amount=price)
+        reservations.hold_artwork(order)
+        mpesa.update_order_status("artwork", order, "completed")
+    exhibition = db.exhibition(slots=10)
+    for slots in (1, 3):
+        booking = db.booking(user, exhibition, slots=slots, amount=slots * 500)
+        reservations.hold_slots(booking)
+        mpesa.update_order_status("exhibition", booking, "completed")
+    # Pending orders are not sales
+    db.order(user, db.artwork(artist='Otieno'))
+
+def test_sale_counts_towards_the_day_it_was_paid(db):
+    user = db.user()
+    order = db.order(user, db.artwork())
+    db.insert("UPDATE artwork_orders SET order_date = %s WHERE id = %s", (datetime(2020, 1, 31, 23, 0), order))
+    reservations.hold_artwork(order)
+
+    mpesa.update_order_status("artwork", order, "completed")
+
+    assert db.all("SELECT day, artwork_orders FROM sales_daily") == [(date.today(), 1)]
+    assert db.value("SELECT paid_at FROM artwork_orders WHERE id = %s", (order,)).date() == date.today()
+
+def test_rebuild_matches_the_incremental_summaries(db):
+    _sell(db, db.user())
+    incremental = _summaries(db)
+
+    assert reports.rebuild_summaries(batch_size=2)
+
+    assert _summaries(db) == incremental
+    assert incremental[1] == [('Kamau', 1, 800), ('Wanjiru', 2, 1500)]
+
+def test_failed_rebuild_keeps_the_previous_summaries(db, monkeypatch):
+    _sell(db, db.user())
+    before = _summaries(db)
+
+    class FailingCursor:
+        def __init__(self, cursor):
+            self._cursor = cursor
+
+        def executemany(self, query, seq_of_params):
+            if 'exhibition_attendance' in query:
+                raise database.Error("disk I/O error")
+            return self._cursor.executemany(query, seq_of_params)
+
+        def __getattr__(self, name):
+            return getattr(self._cursor, name)
+
+    class FailingConnection:
+        def __init__(self, connection):
+            self._connection = connection
+
+        def cursor(self):
+            return FailingCursor(self._connection.cursor())
+
+        def __getattr__(self, name):
+            return getattr(self._connection, name)
+
+    monkeypatch.setattr(reports, 'get_db_connection', lambda: FailingConnection(database.get_db_connection()))
+
+    assert reports.rebuild_summaries() is False
+    assert _summaries(db) == before
+
+def test_sales_stats_report_the_summaries(db):
+    _sell(db, db.user())
+
+    stats = reports.get_sales_stats(days=7)
+
+    assert stats["revenueByDay"] == [{
+        "date": date.today().isoformat(), "artworkOrders": 3, "artworkRevenue": 2300.0,
+        "bookings": 2, "tickets": 4, "ticketRevenue": 2000.0, "totalRevenue": 4300.0
+    }]
+    assert stats["topArtists"][0] == {"artist": "Wanjiru", "orders": 2, "revenue": 1500.0}
@@ -0,0 +1,105 @@
+import threading
+
+import reservations
+
+def _run_concurrently(target, args_list):
+    results = [None] * len(args_list)
+    start = threading.Barrier(len(args_list))
+
+    def run(index, args):
+        start.wait()
+        results[index] = target(*args)
+
+    threads = [threading.Thread(target=run, args=(i, args)) for i, args in enumerate(args_list)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_hold_slots_takes_slots_until_the_exhibition_is_full(db):
+    user = db.user()
+    exhibition = db.exhibition(slots=3)
+    first = db.booking(user, exhibition, slots=2)
+    second = db.booking(user, exhibition, slots=2)
+
+    assert reservations.hold_slots(first)["success"]
+    assert reservations.hold_slots(second) == {"error": "Not enough slots available"}
+    assert db.available_slots(exhibition) == 1
+
+def test_retried_hold_extends_instead_of_taking_more_slots(db):
+    user = db.user()
+    exhibition = db.exhibition(slots=5)
+    booking = db.booking(user, exhibition, slots=2)
+
+    assert reservations.hold_slots(booking)["success"]
+    assert reservations.hold_slots(booking)["success"]
+    assert db.available_slots(exhibition) == 3
+
+def test_concurrent_holds_never_oversell(db):
+    user = db.user()
+    exhibition = db.exhibition(slots=5)
+    bookings = [db.booking(user, exhibition) for _ in range(12)]
+
+    results = _run_concurrently(reservations.hold_slots, [(booking,) for booking in bookings])
+
+    assert sum(1 for result in results if result.get("success")) == 5
+    assert db.available_slots(exhibition) == 0
+
+def test_release_returns_slots_once(db):
+    user = db.user()
+    exhibition = db.exhibition(slots=4)
+    booking = db.booking(user, exhibition, slots=3)
+    reservations.hold_slots(booking)
+
+    assert reservations.release_slots(booking) is True
+    assert reservations.release_slots(booking) is False
+    assert db.available_slots(exhibition) == 4
+
+def test_sweeper_expires_lapsed_holds(db):
+    user = db.user()
+    exhibition = db.exhibition(slots=4)
+    lapsed = db.booking(user, exhibition, slots=1)
+    live = db.booking(user, exhibition, slots=1)
+    reservations.hold_slots(lapsed, ttl=-1)
+    reservations.hold_slots(live)
+
+    assert reservations.sweep_expired_holds() == 1
+    assert db.available_slots(exhibition) == 3
+    assert db.value("SELECT status FROM exhibition_holds WHERE booking_id = %s", (lapsed,)) == 'expired'
+
+def test_artwork_hold_is_exclusive(db):
+    user = db.user()
+    artwork = db.artwork()
+    first = db.order(user, artwork)
+    second = db.order(user, artwork)
+
+    assert reservations.hold_artwork(first)["success"]
+    assert reservations.hold_artwork(second) == {"error": "Artwork is reserved by another buyer"}
+    # The holder can retry its payment
+    assert reservations.hold_artwork(first)["success"]
+
+def test_concurrent_artwork_holds_have_one_winner(db):
+    user = db.user()
+    artwork = db.artwork()
+    orders = [db.order(user, artwork) for _ in range(8)]
+
+    results = _run_concurrently(reservations.hold_artwork, [(order,) for order in orders])
+
+    assert sum(1 for result in results if result.get("success")) == 1
+
+def test_lapsed_artwork_hold_can_be_taken_over(db):
+    user = db.user()
+    artwork = db.artwork()
+    first = db.order(user, artwork)
+    second = db.order(user, artwork)
+    reservations.hold_artwork(first, ttl=-1)
+
+    assert reservations.hold_artwork(second)["success"]
+    assert db.value("SELECT order_id FROM artwork_holds WHERE artwork_id = %s", (artwork,)) == second
+
+def test_sold_artwork_cannot_be_held(db):
+    user = db.user()
+    artwork = db.artwork(status='sold')
+
+    assert reservations.hold_artwork(db.order(user, artwork)) == {"error": "Artwork is no longer available"}
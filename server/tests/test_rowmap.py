@@ -0,0 +1,41 @@
+from datetime import date
+from decimal import Decimal
+
+from rowmap import RowMapper, isoformat, plain, to_float, to_str
+
+class FakeCursor:
+    def __init__(self, *column_names):
+        self.column_names = column_names
+
+EXHIBITION_ROW = RowMapper({
+    'id': ('id', to_str),
+    'start_date': ('startDate', isoformat),
+    'ticket_price': ('ticketPrice', to_float),
+    'total_slots': 'totalSlots',
+})
+
+def test_columns_are_renamed_and_converted():
+    cursor = FakeCursor('id', 'title', 'start_date', 'ticket_price', 'total_slots')
+
+    assert EXHIBITION_ROW.one(cursor, (7, 'Nairobi Now', date(2025, 3, 1), Decimal('500.00'), 40)) == {
+        'id': '7', 'title': 'Nairobi Now', 'startDate': '2025-03-01', 'ticketPrice': 500.0, 'totalSlots': 40
+    }
+
+def test_converters_keep_null():
+    cursor = FakeCursor('id', 'start_date', 'ticket_price')
+
+    assert EXHIBITION_ROW.all(cursor, [(None, None, None)]) == [{'id': None, 'startDate': None, 'ticketPrice': None}]
+
+def test_unlisted_columns_use_the_default_converter():
+    mapper = RowMapper(default=plain)
+
+    assert mapper.one(FakeCursor('revenue', 'artist'), (Decimal('12.5'), 'Kamau')) == {'revenue': 12.5, 'artist': 'Kamau'}
+
+def test_one_maps_a_missing_row_to_none():
+    assert EXHIBITION_ROW.one(FakeCursor('id'), None) is None
+
+def test_each_column_list_is_compiled_once():
+    mapper = RowMapper({'a': 'b'})
+
+    assert mapper.compile(['a', 'c']) is mapper.compile(('a', 'c'))
+    assert mapper.compile(['a']) is not mapper.compile(['a', 'c'])
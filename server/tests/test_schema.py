@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import database
+import migrate
+import schema
+import sqlite_backend
+from conftest import TEST_DIR
+
+def test_fingerprint_is_stable_and_differs_per_dialect():
+    assert schema.fingerprint('mysql') == schema.fingerprint('mysql')
+    assert schema.fingerprint('mysql') != schema.fingerprint('sqlite')
+
+def test_unknown_dialect_is_refused():
+    with pytest.raises(ValueError):
+        schema.create_statements('postgres')
+
+@pytest.mark.parametrize('dialect', schema.DIALECTS)
+def test_checked_in_schema_matches_the_definitions(dialect):
+    filename = 'schema.sql' if dialect == 'mysql' else f'schema.{dialect}.sql'
+    with open(os.path.join(os.path.dirname(schema.__file__), filename)) as f:
+        assert f.read() == schema.render_sql(dialect)
+
+def test_initialize_database_skips_ddl_once_the_fingerprint_matches(schema_ready, capsys):
+    assert database.initialize_database()
+
+    assert capsys.readouterr().out == "Database schema is up to date\n"
+
+def test_every_migration_is_applied(schema_ready):
+    assert migrate.apply_migrations()
+    status = migrate.verify_migrations()
+
+    assert status["ok"]
+    assert status["applied"] == len(migrate.discover_migrations())
+
+def test_column_definition_renders_order_statuses():
+    definition = schema.column_definition('artwork_orders', 'payment_status', 'sqlite')
+
+    assert "'refund_due'" in definition
+    with pytest.raises(KeyError):
+        schema.column_definition('artwork_orders', 'no_such_column')
+
+def test_redefine_column_widens_an_enum_and_keeps_the_rows():
+    connection = sqlite_backend.connect(os.path.join(TEST_DIR, 'redefine.db'))
+    cursor = connection.cursor()
+    for statement in schema.create_statements('sqlite'):
+        # Recreate artwork_orders the way it was before refund_due existed
+        if 'TABLE IF NOT EXISTS artwork_orders' in statement:
+            statement = statement.replace(", 'refund_due'", "")
+        cursor.execute(statement)
+    cursor.execute("INSERT INTO users (name, email, password) VALUES ('Buyer', 'buyer@example.com', 'x')")
+    cursor.execute("INSERT INTO artworks (title, artist, price) VALUES ('Sunrise', 'Wanjiru', 1000)")
+    cursor.execute("""
+    INSERT INTO artwork_orders (user_id, artwork_id, name, email, phone, delivery_address,
+                                payment_method, total_amount, payment_status)
+    VALUES (1, 1, 'Buyer', 'buyer@example.com', '0712345678', 'Nairobi', 'mpesa', 1000, 'completed')
+    """)
+
+    database.redefine_column(cursor, 'artwork_orders', 'payment_status')
+    # A second run finds the column up to date
+    database.redefine_column(cursor, 'artwork_orders', 'payment_status')
+    cursor.execute("UPDATE artwork_orders SET payment_status = 'refund_due' WHERE id = 1")
+    connection.commit()
+
+    cursor.execute("SELECT id, total_amount, payment_status FROM artwork_orders")
+    assert cursor.fetchall() == [(1, 1000, 'refund_due')]
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'artwork_orders'")
+    assert {index.name for index in schema.find_table('artwork_orders').indexes} <= {row[0] for row in cursor.fetchall()}
+    connection.close()
@@ -0,0 +1,84 @@
+import os
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+import sqlite_backend
+from conftest import TEST_DIR
+from sqlite_backend import translate
+
+@pytest.mark.parametrize('query, expected', [
+    ("SELECT * FROM artworks WHERE id = %s AND status = %s",
+     "SELECT * FROM artworks WHERE id = ? AND status = ?"),
+    ("INSERT IGNORE INTO artwork_holds (artwork_id) VALUES (%s)",
+     "INSERT OR IGNORE INTO artwork_holds (artwork_id) VALUES (?)"),
+    ("INSERT INTO artist_sales (artist, orders) VALUES (%s, %s) ON DUPLICATE KEY UPDATE orders = orders + VALUES(orders)",
+     "INSERT INTO artist_sales (artist, orders) VALUES (?, ?) ON CONFLICT DO UPDATE SET orders = orders + excluded.orders"),
+    # VALUES (...) is only rewritten in the update clause of an upsert
+    ("INSERT INTO users (name) VALUES(%s)", "INSERT INTO users (name) VALUES(?)"),
+])
+def test_translate(query, expected):
+    assert translate(query) == expected
+
+def test_values_round_trip_as_mysql_returns_them(db):
+    exhibition = db.exhibition(ticket_price=Decimal('750.50'))
+    db.insert("UPDATE exhibitions SET created_at = %s WHERE id = %s", (datetime(2024, 5, 1, 9, 30), exhibition))
+
+    start_date, created_at, ticket_price = db.all(
+        "SELECT start_date, created_at, ticket_price FROM exhibitions WHERE id = %s", (exhibition,)
+    )[0]
+
+    assert start_date == date.today()
+    assert created_at == datetime(2024, 5, 1, 9, 30)
+    assert Decimal(str(ticket_price)) == Decimal('750.50')
+
+def test_upsert_adds_to_the_existing_row(db):
+    for amount in (100, 250):
+        db.insert("""
+        INSERT INTO artist_sales (artist, orders, revenue) VALUES (%s, 1, %s)
+        ON DUPLICATE KEY UPDATE orders = orders + VALUES(orders), revenue = revenue + VALUES(revenue)
+        """, ('Wanjiru', amount))
+
+    assert db.all("SELECT artist, orders, revenue FROM artist_sales") == [('Wanjiru', 2, 350)]
+
+def _underlying(handle):
+    return handle._connection
+
+def test_threads_share_pooled_connections():
+    path = os.path.join(TEST_DIR, 'pool.db')
+    handle = sqlite_backend.connect(path)
+    first = _underlying(handle)
+    handle.close()
+    seen = []
+
+    def borrow():
+        handle = sqlite_backend.connect(path)
+        seen.append(_underlying(handle))
+        handle.close()
+
+    thread = threading.Thread(target=borrow)
+    thread.start()
+    thread.join()
+
+    assert seen == [first]
+
+def test_nested_handle_shares_the_transaction_until_the_outer_one_closes():
+    path = os.path.join(TEST_DIR, 'nested.db')
+    outer = sqlite_backend.connect(path)
+    cursor = outer.cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS notes (body TEXT)")
+    outer.commit()
+    cursor.execute("INSERT INTO notes (body) VALUES (%s)", ('draft',))
+
+    inner = sqlite_backend.connect(path)
+    assert _underlying(inner) is _underlying(outer)
+    inner.close()
+    assert cursor.execute("SELECT COUNT(*) FROM notes").fetchone() == (1,)
+
+    # Closing the outer handle rolls back what it left uncommitted
+    outer.close()
+    check = sqlite_backend.connect(path)
+    assert check.cursor().execute("SELECT COUNT(*) FROM notes").fetchone() == (0,)
+    check.close()
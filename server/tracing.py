@@ -0,0 +1,357 @@
+"""Distributed tracing with W3C trace context.
+
+Spans follow the OpenTelemetry data model and are exported as OTLP/JSON,
+either appended to a file (one export request per line, the format of
+the collector's file exporter) or POSTed to an OTLP/HTTP endpoint such as
+a local collector. Incoming `traceparent` headers are continued and
+outgoing Daraja calls carry one, so a checkout shows up as one trace:
+the request, its queries, the Daraja calls and the transaction insert.
+
+    export AFRIART_TRACE_EXPORTER=file        # or otlp; none (default) disables tracing
+    export AFRIART_TRACE_SAMPLE_RATIO=0.1     # share of new traces recorded
+
+With tracing disabled span() returns a shared no-op and nothing is
+recorded. `python tracing.py show traces.jsonl` prints the slowest
+traces in a file as span trees.
+"""
+import re
+import sys
+import json
+import time
+import random
+import threading
+import contextvars
+from functools import wraps
+from config import CONFIG
+
+TRACE_EXPORTER = CONFIG.tracing.exporter
+TRACE_FILE = CONFIG.tracing.file
+OTLP_ENDPOINT = CONFIG.tracing.otlp_endpoint
+
+# Share of new traces that are recorded; traces started elsewhere follow the caller's decision
+TRACE_SAMPLE_RATIO = CONFIG.tracing.sample_ratio
+
+SERVICE_NAME = CONFIG.tracing.service_name
+
+# Finished spans are exported in batches every EXPORT_INTERVAL seconds or EXPORT_BATCH_SIZE spans
+EXPORT_INTERVAL = CONFIG.tracing.export_interval
+EXPORT_BATCH_SIZE = CONFIG.tracing.export_batch_size
+# Spans beyond this many waiting for export are dropped
+MAX_QUEUED_SPANS = CONFIG.tracing.max_queued_spans
+
+# OTLP SpanKind values
+SPAN_KINDS = {'internal': 1, 'server': 2, 'client': 3}
+
+STATUS_ERROR = 2
+
+_TRACEPARENT = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$')
+
+class SpanContext:
+    """The identity of a span as carried in a traceparent header"""
+    __slots__ = ('trace_id', 'span_id', 'sampled')
+
+    def __init__(self, trace_id, span_id, sampled):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+def parse_traceparent(header):
+    """SpanContext from a W3C traceparent header, or None if it is missing or invalid"""
+    match = _TRACEPARENT.match(header.strip().lower()) if header else None
+    if match is None:
+        return None
+    version, trace_id, span_id, flags, rest = match.groups()
+    if version == 'ff' or (version == '00' and rest) or trace_id == '0' * 32 or span_id == '0' * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+def _attribute_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class Span:
+    """A recorded operation; end() hands it to the exporter"""
+
+    def __init__(self, name, context, parent_id, kind, attributes):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = None
+        self.start_time = time.time_ns()
+        self.end_time = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, message):
+        self.status = message
+
+    def end(self):
+        if self.end_time is None:
+            self.end_time = time.time_ns()
+            _exporter.submit(self)
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS[self.kind],
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time),
+            "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in self.attributes.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status is not None:
+            span["status"] = {"code": STATUS_ERROR, "message": self.status}
+        return span
+
+class NonRecordingSpan:
+    """A span that is propagated but not recorded (unsampled trace, or tracing off)"""
+
+    def __init__(self, context):
+        self.context = context
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, message):
+        pass
+
+    def end(self):
+        pass
+
+NOOP_SPAN = NonRecordingSpan(None)
+
+_current = contextvars.ContextVar('afriart_current_span', default=None)
+
+def enabled():
+    return _exporter is not None
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+def is_recording():
+    """Whether the current span is being recorded, so children are worth creating"""
+    return isinstance(_current.get(), Span)
+
+def _sampled(trace_id):
+    # Decide from the trace id so every service sampling at the same ratio agrees
+    return int(trace_id[16:], 16) < TRACE_SAMPLE_RATIO * 2 ** 64
+
+def start_span(name, kind='internal', attributes=None, parent=None):
+    """Start a span under parent (a SpanContext; default: the current span); call end() when done"""
+    if _exporter is None:
+        return NOOP_SPAN
+
+    if parent is None:
+        current = _current.get()
+        parent = current.context if current is not None else None
+    if parent is None:
+        trace_id = f"{random.getrandbits(128):032x}"
+        sampled, parent_id = _sampled(trace_id), None
+    else:
+        trace_id, sampled, parent_id = parent.trace_id, parent.sampled, parent.span_id
+
+    context = SpanContext(trace_id, f"{random.getrandbits(64):016x}", sampled)
+    if not sampled:
+        return NonRecordingSpan(context)
+    return Span(name, context, parent_id, kind, attributes)
+
+def activate(span):
+    """Make span the current span; returns a token for deactivate()"""
+    return _current.set(span)
+
+def deactivate(token):
+    _current.reset(token)
+
+class _SpanScope:
+    def __init__(self, name, kind, attributes):
+        self.span = start_span(name, kind, attributes)
+
+    def __enter__(self):
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        if exc is not None:
+            self.span.set_error(f"{exc_type.__name__}: {exc}")
+        self.span.end()
+        return False
+
+class _NoopScope:
+    def __enter__(self):
+        return NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SCOPE = _NoopScope()
+
+def span(name, kind='internal', attributes=None):
+    """Context manager running its block in a child span of the current one"""
+    if _exporter is None:
+        return _NOOP_SCOPE
+    return _SpanScope(name, kind, attributes)
+
+def traced(name=None):
+    """Decorator running every call of the function in its own span"""
+    def decorate(func):
+        span_name = name or f"{func.__module__}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _exporter is None:
+                return func(*args, **kwargs)
+            with _SpanScope(span_name, 'internal', None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def inject(headers):
+    """Add the current trace context to outgoing HTTP headers (returns headers)"""
+    current = _current.get()
+    if current is not None and current.context is not None:
+        headers['traceparent'] = current.context.traceparent()
+    return headers
+
+def _export_request(spans):
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "afriart"}, "spans": [span.to_otlp() for span in spans]}],
+    }]}
+
+def export_to_file(path):
+    def export(request):
+        with open(path, 'a') as f:
+            f.write(json.dumps(request, separators=(',', ':')) + "\n")
+    return export
+
+def export_to_otlp(endpoint):
+    import urllib.request
+
+    def export(request):
+        body = json.dumps(request, separators=(',', ':')).encode()
+        http_request = urllib.request.Request(endpoint, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(http_request, timeout=5) as response:
+            response.read()
+    return export
+
+class BatchExporter:
+    """Collects finished spans and exports them from a background thread"""
+
+    def __init__(self, export):
+        self._export = export
+        self._spans = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self.dropped = 0
+        threading.Thread(target=self._run, name='trace-exporter', daemon=True).start()
+
+    def submit(self, span):
+        with self._lock:
+            if len(self._spans) >= MAX_QUEUED_SPANS:
+                self.dropped += 1
+                return
+            self._spans.append(span)
+            full = len(self._spans) >= EXPORT_BATCH_SIZE
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(EXPORT_INTERVAL)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Export everything finished so far"""
+        with self._lock:
+            spans, self._spans = self._spans, []
+        for start in range(0, len(spans), EXPORT_BATCH_SIZE):
+            try:
+                self._export(_export_request(spans[start:start + EXPORT_BATCH_SIZE]))
+            except Exception as e:
+                print(f"Error exporting traces: {e}")
+
+def _create_exporter():
+    if TRACE_EXPORTER == 'file':
+        return BatchExporter(export_to_file(TRACE_FILE))
+    if TRACE_EXPORTER == 'otlp':
+        return BatchExporter(export_to_otlp(OTLP_ENDPOINT))
+    if TRACE_EXPORTER != 'none':
+        print(f"Unknown AFRIART_TRACE_EXPORTER '{TRACE_EXPORTER}', tracing disabled")
+    return None
+
+_exporter = _create_exporter()
+
+def flush():
+    """Export spans that are still queued (e.g. before the process exits)"""
+    if _exporter is not None:
+        _exporter.flush()
+
+def _load_traces(path):
+    traces = {}
+    with open(path) as f:
+        for line in f:
+            request = json.loads(line)
+            for resource in request.get("resourceSpans", []):
+                for scope in resource.get("scopeSpans", []):
+                    for span_data in scope.get("spans", []):
+                        traces.setdefault(span_data["traceId"], []).append(span_data)
+    return traces
+
+def _print_trace(spans):
+    children = {}
+    for span_data in spans:
+        children.setdefault(span_data.get("parentSpanId"), []).append(span_data)
+    span_ids = {span_data["spanId"] for span_data in spans}
+    # Spans whose parent was recorded by another service are printed as roots
+    roots = [span_data for span_data in spans if span_data.get("parentSpanId") not in span_ids]
+    trace_start = min(int(span_data["startTimeUnixNano"]) for span_data in spans)
+
+    def show(span_data, depth):
+        start = (int(span_data["startTimeUnixNano"]) - trace_start) / 1e6
+        duration = (int(span_data["endTimeUnixNano"]) - int(span_data["startTimeUnixNano"])) / 1e6
+        error = " ERROR" if span_data.get("status", {}).get("code") == STATUS_ERROR else ""
+        print(f"  {start:9.2f} ms {duration:9.2f} ms  {'  ' * depth}{span_data['name']}{error}")
+        for child in sorted(children.get(span_data["spanId"], []), key=lambda item: int(item["startTimeUnixNano"])):
+            show(child, depth + 1)
+
+    for root in sorted(roots, key=lambda item: int(item["startTimeUnixNano"])):
+        show(root, 0)
+
+def show_traces(path, name=None, limit=5):
+    """Print the slowest traces in an exported file, optionally only those with a span called name"""
+    traces = _load_traces(path)
+    if name:
+        traces = {trace_id: spans for trace_id, spans in traces.items() if any(s["name"] == name for s in spans)}
+
+    def duration(spans):
+        return max(int(s["endTimeUnixNano"]) for s in spans) - min(int(s["startTimeUnixNano"]) for s in spans)
+
+    slowest = sorted(traces.items(), key=lambda item: duration(item[1]), reverse=True)[:limit]
+    for trace_id, spans in slowest:
+        print(f"Trace {trace_id} ({duration(spans) / 1e6:.2f} ms, {len(spans)} spans)")
+        print(f"  {'start':>12} {'duration':>12}  span")
+        _print_trace(spans)
+        print()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "show":
+        show_traces(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None,
+                    int(sys.argv[4]) if len(sys.argv) > 4 else 5)
+    else:
+        print("Usage: python tracing.py show <traces.jsonl> [span name] [count]")
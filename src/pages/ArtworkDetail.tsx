@@ -62,6 +62,21 @@ const ArtworkDetail = () => {
       return;
     }
     
+    // The buyer's own order holds the artwork: pay for that order again instead of starting a new one
+    if (artwork?.heldByMe && artwork.heldOrderId) {
+      navigate('/payment', {
+        state: {
+          orderInfo: {
+            type: 'artwork',
+            id: artwork.heldOrderId,
+            title: artwork.title,
+            amount: artwork.heldOrderAmount ?? artwork.price,
+          },
+        },
+      });
+      return;
+    }
+    
     navigate(`/checkout/artwork/${id}`);
   };
 
@@ -87,6 +102,9 @@ const ArtworkDetail = () => {
   }
 
   const isSold = artwork.status === 'sold';
+  const isHeldByMe = !isSold && !!artwork.heldByMe;
+  const isOnHold = !isSold && !!artwork.onHold && !isHeldByMe;
+  const isUnavailable = isSold || isOnHold;
 
   return (
     <div className="py-12 px-4 md:px-6 bg-secondary min-h-screen">
@@ -150,13 +168,13 @@ const ArtworkDetail = () => {
                 <Button 
                   onClick={handleBuyNow}
                   className={`w-full py-6 text-lg ${
-                    isSold 
+                    isUnavailable 
                       ? 'bg-gray-400 hover:bg-gray-400 text-white cursor-not-allowed' 
                       : 'bg-gold hover:bg-gold-dark text-white'
                   }`}
-                  disabled={isSold}
+                  disabled={isUnavailable}
                 >
-                  {isSold ? 'Sold Out' : 'Buy Now'}
+                  {isSold ? 'Sold Out' : isOnHold ? 'Reserved' : isHeldByMe ? 'Complete Payment' : 'Buy Now'}
                 </Button>
               </div>
             </div>
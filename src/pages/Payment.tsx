@@ -74,7 +74,8 @@ const Payment: React.FC<PaymentProps> = () => {
       const response = await fetch(`${API_URL}/mpesa/stk-push`, {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json'
+          'Content-Type': 'application/json',
+          'Authorization': `Bearer ${localStorage.getItem('token')}`
         },
         body: JSON.stringify(paymentData)
       });
@@ -357,7 +357,11 @@ export const getAllArtworks = async () => {
 // Get a single artwork
 export const getArtwork = async (id: string) => {
   try {
-    const response = await fetch(`${API_URL}/artworks/${id}`);
+    // Signed-in buyers learn whether the artwork is held for their own order
+    const token = getToken();
+    const response = await fetch(`${API_URL}/artworks/${id}`, {
+      headers: token ? { 'Authorization': `Bearer ${token}` } : {},
+    });
     if (!response.ok) {
       throw new Error('Failed to fetch artwork');
     }
@@ -453,6 +457,25 @@ export const getAllTickets = async () => {
   return await authFetch('/tickets');
 };
 
+// Get a page of artwork orders (admin only)
+export const getAdminOrders = async (page = 1, pageSize = 20, status?: string) => {
+  const query = new URLSearchParams({ page: String(page), pageSize: String(pageSize) });
+  if (status) query.set('status', status);
+  return await authFetch(`/admin/orders?${query}`);
+};
+
+// Get a page of exhibition bookings (admin only)
+export const getAdminBookings = async (page = 1, pageSize = 20, status?: string) => {
+  const query = new URLSearchParams({ page: String(page), pageSize: String(pageSize) });
+  if (status) query.set('status', status);
+  return await authFetch(`/admin/bookings?${query}`);
+};
+
+// Get aggregated sales statistics (admin only)
+export const getSalesStats = async (days = 30) => {
+  return await authFetch(`/admin/stats?days=${days}`);
+};
+
 // Generate exhibition ticket
 export const generateExhibitionTicket = async (bookingId: string) => {
   try {
@@ -492,6 +515,7 @@ export const initiateMpesaPayment = async (
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        'Authorization': `Bearer ${getToken()}`,
       },
       body: JSON.stringify({
         phoneNumber,
@@ -518,7 +542,11 @@ export const initiateMpesaPayment = async (
 // Check M-Pesa transaction status
 export const checkPaymentStatus = async (checkoutRequestId: string) => {
   try {
-    const response = await fetch(`${API_URL}/mpesa/status/${checkoutRequestId}`);
+    const response = await fetch(`${API_URL}/mpesa/status/${checkoutRequestId}`, {
+      headers: {
+        'Authorization': `Bearer ${getToken()}`,
+      },
+    });
     
     if (!response.ok) {
       const errorData = await response.json();
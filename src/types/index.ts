@@ -20,6 +20,11 @@ export interface Artwork {
   medium?: string;
   year?: number;
   status: 'available' | 'sold';
+  onHold?: boolean; // A buyer is completing payment for this artwork
+  holdExpiresAt?: string | null;
+  heldByMe?: boolean; // The hold belongs to one of the signed-in user's orders
+  heldOrderId?: string;
+  heldOrderAmount?: number;
   size?: string; // Adding this field to avoid errors
 }
 
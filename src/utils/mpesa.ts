@@ -1,9 +1,7 @@
 
 // M-Pesa API utilities
 
-// M-Pesa credentials
-const CONSUMER_KEY = "sMwMwGZ8oOiSkNrUIrPbcCeWIO8UiQ3SV4CyX739uAyZVs1F";
-const CONSUMER_SECRET = "A3Hs5zRY3nDCn7XpxPuc1iAKpfy6UDdetiCalIAfuAIpgTROI5yCqqOewDfThh2o";
+// Daraja credentials live on the server only
 const API_URL = 'http://localhost:8000';
 const CALLBACK_URL = "https://webhook.site/3c1f62b5-4214-47d6-9f26-71c1f4b9c8f0";
 const API_BASE_URL = "https://sandbox.safaricom.co.ke";
@@ -26,6 +24,7 @@ export const initiateSTKPush = async (
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        'Authorization': `Bearer ${localStorage.getItem('token')}`,
       },
       body: JSON.stringify({
         phoneNumber: formattedPhone,
@@ -51,6 +50,7 @@ export const checkTransactionStatus = async (checkoutRequestId: string): Promise
       method: 'GET',
       headers: {
         'Content-Type': 'application/json',
+        'Authorization': `Bearer ${localStorage.getItem('token')}`,
       },
     });
     